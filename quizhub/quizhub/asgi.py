@@ -7,6 +7,10 @@ from quizhubapi.routing import websocket_urlpatterns
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'quizhub.settings')
 
+# Live matches run in these processes. To run more than one, give them a
+# shared REDIS_URL, the same MATCH_WORKERS and each its own MATCH_WORKER_ID
+# (see "Running several match workers" in the README).
+
 application = ProtocolTypeRouter({
     "http": get_asgi_application(),
     "websocket": AllowedHostsOriginValidator(
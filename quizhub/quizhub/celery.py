@@ -0,0 +1,9 @@
+# quizhub/celery.py
+import os
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'quizhub.settings')
+
+app = Celery('quizhub')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -170,6 +170,102 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Custom user model
 AUTH_USER_MODEL = 'quizhubapi.User'
 
+# Cache - Redis when REDIS_URL is set, local memory otherwise (tests, local dev)
+REDIS_URL = os.environ.get('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_URL,
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            }
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Channel layer - Redis when REDIS_URL is set, in-process otherwise
+if REDIS_URL:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {
+                'hosts': [REDIS_URL],
+            }
+        }
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        }
+    }
+
+# Leaderboards
+LEADERBOARD_INDEX_TTL = 300  # Seconds before a worker reloads its in-memory rank index; also how long index changes stay in the shared log
+LEADERBOARD_INDEX_SYNC_LIMIT = 1000  # Most shared index changes a worker replays before reloading the board instead
+LEADERBOARD_CACHE_TIMEOUT = 300  # Seconds a rendered leaderboard page is kept
+QUIZ_LEADERBOARD_SIZE = 50  # Best attempts kept per quiz board
+
+# Quiz play
+ANSWER_KEY_CACHE_TIMEOUT = 3600  # Seconds a quiz answer key is cached; edits invalidate it
+QUESTION_POOL_CACHE_TIMEOUT = 3600  # Seconds the approved question ids of a quiz/topic are cached
+QUESTION_BUNDLE_CACHE_TIMEOUT = 3600  # Seconds a serialized play question is cached
+
+# Live matches
+MATCH_QUESTION_SECONDS = 20  # Answer window for questions without their own duration
+MATCH_BROADCAST_WINDOW = 0.03  # Seconds match events are held to be coalesced into one frame
+MATCH_INTERMISSION_SECONDS = 5  # Pause between a question closing and the next opening
+MATCH_TIMER_TICK = 0.05  # Resolution of the match timer wheel; idle timers fire up to one tick late, loaded loops later (see utils/timer_wheel.py)
+MATCH_WORKER_ID = os.environ.get('MATCH_WORKER_ID')  # This process on the match hash ring; hostname-pid when unset
+MATCH_WORKERS = [w for w in os.environ.get('MATCH_WORKERS', '').split(',') if w]  # Ring members; empty runs every match locally
+MATCH_WORKER_HEARTBEAT = 2  # Seconds between worker heartbeats; a worker silent for three is dropped from the ring
+MATCH_CHECKPOINT_TIMEOUT = 86400  # Seconds a match's resume point is kept for a worker taking it over
+SPECTATOR_TICK = 1  # Seconds between the match snapshots sent to spectators
+ROOM_CODE_LENGTH = 6  # Characters in a new room code
+ROOM_CODE_CACHE_TIMEOUT = 86400  # Seconds a room code -> match id mapping is cached; misses fall back to the database
+
+# Match chat
+CHAT_MAX_LENGTH = 500  # Characters per message, as LiveChat.message allows
+CHAT_RATE = 1  # Messages per second a sender may keep up
+CHAT_BURST = 5  # Messages a sender may post at once before the rate applies
+CHAT_HISTORY_SIZE = 50  # Recent messages kept in memory per match for late joiners
+CHAT_FLUSH_SECONDS = 1  # Seconds chat is buffered before its bulk write
+CHAT_FLUSH_SIZE = 200  # Buffered messages that trigger an early write
+
+# Moderation
+BANNED_WORDS_CHECK_SECONDS = 5  # How stale a process's compiled banned-word filter may get before it checks for edits
+
+# Matchmaking
+MATCHMAKING_TICK = 1  # Seconds between pairing passes over the quick-play queue
+MATCHMAKING_MATCH_SIZE = 2  # Players per quick-play match
+MATCHMAKING_SKILL_BAND = 500  # Points per skill band; players are paired within their band first
+MATCHMAKING_WIDEN_SECONDS = 10  # Each period waited lets a player match one band further out
+
+# Friend suggestions
+FRIEND_SUGGESTIONS_LIMIT = 20  # Suggestions kept per user
+FRIEND_SUGGESTION_CATEGORY_WEIGHT = 0.5  # Score of a shared quiz category, against 1 per mutual friend
+FRIEND_SUGGESTIONS_TIMEOUT = 172800  # Seconds suggestions are served; update_friend_suggestions runs more often
+
+# Notifications
+# 'celery' hands events to Celery workers and is the default once a broker is
+# configured. 'thread' delivers them from a thread pool in this process, so
+# pending events are lost on restart and no work is shared between processes:
+# notify() refuses it unless NOTIFICATION_ALLOW_THREAD is on, as it is with
+# DEBUG. Tests turn it on with override_settings.
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', REDIS_URL)
+CELERY_TASK_IGNORE_RESULT = True
+NOTIFICATION_QUEUE = os.environ.get('NOTIFICATION_QUEUE', 'celery' if CELERY_BROKER_URL else 'thread')
+NOTIFICATION_ALLOW_THREAD = DEBUG
+NOTIFICATION_WORKERS = 2  # Threads delivering notifications when NOTIFICATION_QUEUE is 'thread'
+NOTIFICATION_BATCH_SIZE = 500  # Rows per bulk insert when an event fans out
+
 # Security
 SECURE_BROWSER_XSS_FILTER = True
 SECURE_CONTENT_TYPE_NOSNIFF = True
\ No newline at end of file
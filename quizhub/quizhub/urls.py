@@ -18,7 +18,8 @@ from quizhubapi.views.solo import QuizAttemptViewSet, LeaderboardViewSet
 from quizhubapi.views.auth import RegisterView, LoginView, RefreshTokenView, LogoutView, ProfileView
 from quizhubapi.views.social import (
     FriendListView, FriendRequestListView, SendFriendRequestView, 
-    RespondFriendRequestView, FollowUserView, UnfollowUserView
+    RespondFriendRequestView, FollowUserView, UnfollowUserView, MutualFriendsView,
+    FriendSuggestionsView
 )
 from quizhubapi.views.match import (
     JoinMatchView, LeaveMatchView, SupportPlayerView, 
@@ -43,6 +44,9 @@ router.register(r'leaderboards', LeaderboardViewSet, basename='leaderboard')
 urlpatterns = [
     path('admin/', admin.site.urls),
     
+    # Ahead of the router, whose matches/<pk>/ route would swallow it
+    path('api/matches/join-by-code/', JoinMatchByCodeView.as_view(), name='join-by-code'),
+    
     # Include router URLs under /api/
     path('api/', include(router.urls)),
     
@@ -60,12 +64,13 @@ urlpatterns = [
     path('api/social/respond-friend-request/<int:pk>/', RespondFriendRequestView.as_view(), name='respond-friend-request'),
     path('api/social/follow/<int:user_id>/', FollowUserView.as_view(), name='follow-user'),
     path('api/social/unfollow/<int:user_id>/', UnfollowUserView.as_view(), name='unfollow-user'),
+    path('api/social/mutual-friends/<int:user_id>/', MutualFriendsView.as_view(), name='mutual-friends'),
+    path('api/social/suggestions/', FriendSuggestionsView.as_view(), name='friend-suggestions'),
     
     # Match endpoints
     path('api/matches/<int:match_id>/join/', JoinMatchView.as_view(), name='join-match'),
     path('api/matches/<int:match_id>/leave/', LeaveMatchView.as_view(), name='leave-match'),
     path('api/matches/<int:match_id>/support/<int:player_id>/', SupportPlayerView.as_view(), name='support-player'),
-    path('api/matches/join-by-code/', JoinMatchByCodeView.as_view(), name='join-by-code'),
     
     # Guest endpoints
     path('api/guest/create/', CreateGuestView.as_view(), name='create-guest'),
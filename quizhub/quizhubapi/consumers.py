@@ -0,0 +1,209 @@
+# quizhubapi/consumers.py
+from urllib.parse import parse_qs
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from .utils.guest_tokens import read_guest_token
+from .utils.match_worker import get_local_worker
+from .utils.matchmaking import pool_key
+from .utils.notifications import notification_group
+
+class MatchConsumer(AsyncJsonWebsocketConsumer):
+    """Live match socket.
+
+    Players send ``start``, ``answer``, ``next_question`` and ``chat`` actions; every
+    socket of the match receives the events of its ``match_<id>`` group.
+    The match itself runs on the worker that owns it (``utils.match_worker``),
+    which may be another process; this socket passes actions along and
+    relays the replies. Large audiences should use ``SpectatorConsumer``.
+
+    The socket joins the match group before asking for the snapshot, so no
+    event is missed, but holds group frames back until the snapshot (and
+    chat history) went out: clients always see ``match_state`` first.
+    """
+
+    actions = ('start', 'answer', 'next_question', 'chat')
+
+    async def connect(self):
+        try:
+            self.match_id = int(self.scope['url_route']['kwargs']['match_id'])
+        except ValueError:
+            await self.close()
+            return
+
+        self.identity = self.get_identity()
+        self.worker = await get_local_worker()
+        self.group_name = f'match_{self.match_id}'
+        self.held_frames = []  # Group frames that arrived before the snapshot
+
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        await self.route('connect')
+
+    async def disconnect(self, code):
+        if not hasattr(self, 'group_name'):
+            return
+        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        await self.route('disconnect')
+
+    def get_identity(self):
+        user = self.scope.get('user')
+        if user is not None and user.is_authenticated:
+            return {'user_id': user.id, 'name': user.username, 'role': user.role}
+        # Guests prove who they are with the token they got when created
+        token = parse_qs(self.scope.get('query_string', b'').decode()).get('guest_token')
+        guest_id = read_guest_token(token[0]) if token else None
+        if guest_id is None:
+            return {}  # Sockets without a player only watch
+        return {'guest_id': guest_id}
+
+    async def route(self, action, **content):
+        await self.worker.route(self.match_id, action, self.channel_name, self.reply,
+                                dict(self.identity, **content))
+
+    async def reply(self, frame, close=False, ready=False):
+        await self.send_json(frame)
+        if ready and self.held_frames is not None:
+            held, self.held_frames = self.held_frames, None
+            for held_frame in held:
+                await self.send_json(held_frame)
+        if close:
+            await self.close()
+
+    async def send_group_frame(self, frame):
+        if self.held_frames is not None:
+            self.held_frames.append(frame)
+        else:
+            await self.send_json(frame)
+
+    async def receive_json(self, content, **kwargs):
+        action = content.get('action')
+        if action not in self.actions:
+            await self.send_json({'type': 'error', 'data': {'message': 'Unknown action'}})
+            return
+        await self.route(action, answer_id=content.get('answer_id'), message=content.get('message'))
+
+    # Channel messages
+
+    async def match_reply(self, event):
+        """A reply from the worker that owns the match"""
+        await self.reply(event['frame'], event['close'], event.get('ready', False))
+
+    async def forward(self, event):
+        await self.send_group_frame({'type': event['type'], 'data': event['data']})
+
+    async def match_events(self, event):
+        """Send a coalesced batch as one frame"""
+        events = event['events']
+        if len(events) == 1:
+            await self.forward(events[0])
+        else:
+            await self.send_group_frame({'type': 'batch', 'data': events})
+
+    match_started = forward
+    question_opened = forward
+    question_closed = forward
+    match_ended = forward
+    chat_message = forward
+
+class SpectatorConsumer(AsyncJsonWebsocketConsumer):
+    """Watch-only match socket.
+
+    Receives ``spectator_snapshot`` frames: the match as it stands, at most
+    once per SPECTATOR_TICK, instead of every event. The frame text is
+    encoded once per tick and written as-is to every spectator socket of
+    this process.
+    """
+
+    async def connect(self):
+        try:
+            self.match_id = int(self.scope['url_route']['kwargs']['match_id'])
+        except ValueError:
+            await self.close()
+            return
+
+        self.worker = await get_local_worker()
+        await self.accept()
+        await self.worker.watch(self.match_id, self.channel_name, self.send_frame, self.reply)
+
+    async def disconnect(self, code):
+        if hasattr(self, 'worker'):
+            await self.worker.unwatch(self.match_id, self.channel_name)
+
+    async def send_frame(self, text):
+        await self.send(text_data=text)
+
+    async def reply(self, frame, close=False):
+        await self.send_json(frame)
+        if close:
+            await self.close()
+
+    async def receive_json(self, content, **kwargs):
+        await self.send_json({'type': 'error', 'data': {'message': 'Spectators cannot send actions'}})
+
+    async def match_reply(self, event):
+        """A reply from the worker that owns the match"""
+        await self.reply(event['frame'], event['close'])
+
+class MatchmakingConsumer(AsyncJsonWebsocketConsumer):
+    """Quick-play queue socket.
+
+    Connecting with ``?quiz_id=`` or ``?category_id=`` queues the user; the
+    socket receives ``match_found`` with the new match once they are paired,
+    or ``match_unavailable`` when the pool has no quiz to play, and closing
+    it leaves the queue.
+    """
+
+    async def connect(self):
+        user = self.scope.get('user')
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        try:
+            if 'quiz_id' in query:
+                self.pool = pool_key(quiz_id=int(query['quiz_id'][0]))
+            else:
+                self.pool = pool_key(category_id=int(query['category_id'][0]))
+        except (KeyError, ValueError):
+            self.pool = None
+        if user is None or not user.is_authenticated or self.pool is None:
+            await self.close()
+            return
+
+        self.user_id = user.id
+        self.group_name = f'matchmaking_{self.user_id}'
+        self.worker = await get_local_worker()
+
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        await self.worker.matchmaking('enqueue', self.pool, self.user_id, user.points)
+        await self.send_json({'type': 'queued', 'data': {'pool': self.pool}})
+
+    async def disconnect(self, code):
+        if not hasattr(self, 'group_name'):
+            return
+        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        await self.worker.matchmaking('cancel', self.pool, self.user_id)
+
+    async def match_found(self, event):
+        await self.send_json({'type': 'match_found', 'data': event['data']})
+
+    async def match_unavailable(self, event):
+        await self.send_json({'type': 'match_unavailable', 'data': event['data']})
+        await self.close()
+
+class NotificationConsumer(AsyncJsonWebsocketConsumer):
+    """Per-user socket receiving ``notification`` events as they are written"""
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close()
+            return
+
+        self.group_name = notification_group(user.id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def notification(self, event):
+        await self.send_json({'type': 'notification', 'data': event['data']})
@@ -0,0 +1,41 @@
+# quizhubapi/management/commands/benchmark_friend_suggestions.py
+import random
+import time
+from django.core.management.base import BaseCommand
+from quizhubapi.utils.friend_suggestions import FriendGraph
+
+class Command(BaseCommand):
+    help = 'Time building the friend graph and ranking suggestions on a synthetic graph'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000)
+        parser.add_argument('--edges', type=int, default=1000000, help='Directed edges, two per friendship')
+        parser.add_argument('--categories', type=int, default=12)
+        parser.add_argument('--sample', type=int, default=10000, help='Users ranked; 0 ranks everyone')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        users = options['users']
+        pairs = set()
+        while len(pairs) < options['edges'] // 2:
+            user_id, friend_id = rng.randint(1, users), rng.randint(1, users)
+            if user_id != friend_id:
+                pairs.add((min(user_id, friend_id), max(user_id, friend_id)))
+        edges = sorted([pair for pair in pairs] + [(friend_id, user_id) for user_id, friend_id in pairs])
+        categories = {user_id: rng.getrandbits(options['categories']) for user_id in range(1, users + 1)}
+
+        started = time.perf_counter()
+        graph = FriendGraph(edges, categories)
+        built = time.perf_counter() - started
+        self.stdout.write(f'Built {len(graph)} edges over {len(graph.users)} users in {built:.2f}s '
+                          f'({graph.neighbors.itemsize * len(graph.neighbors) / 2 ** 20:.1f} MB)')
+
+        ranked = graph.users if not options['sample'] else rng.sample(graph.users, options['sample'])
+        started = time.perf_counter()
+        for user_id in ranked:
+            graph.suggest(user_id)
+        seconds = time.perf_counter() - started
+        self.stdout.write(f'Ranked {len(ranked)} users in {seconds:.2f}s '
+                          f'({seconds / len(ranked) * 1e6:.0f} us/user, '
+                          f'{seconds / len(ranked) * len(graph.users):.1f}s for everyone)')
@@ -0,0 +1,62 @@
+# quizhubapi/management/commands/benchmark_leaderboard.py
+import random
+import time
+from django.core.management.base import BaseCommand
+from quizhubapi.utils.rank_index import RankIndex, entry_sort_key
+
+class Command(BaseCommand):
+    help = 'Benchmark per-submission rank maintenance against board size'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+',
+                            default=[1000, 10000, 100000, 1000000])
+        parser.add_argument('--ops', type=int, default=20000,
+                            help='Submissions to time per board size')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        ops = options['ops']
+
+        self.stdout.write(
+            f"{'entries':>10} {'build s':>9} {'submit p50 us':>14} {'submit p99 us':>14} "
+            f"{'top50 us':>9} {'full re-rank ms':>16}"
+        )
+
+        for size in options['sizes']:
+            items = [
+                (entry_id, entry_sort_key(rng.randint(0, 50000), rng.uniform(0, 100)))
+                for entry_id in range(size)
+            ]
+
+            started = time.perf_counter()
+            index = RankIndex(items)
+            build_seconds = time.perf_counter() - started
+
+            # A submission moves one entry and reads back its rank
+            timings = []
+            for _ in range(ops):
+                entry_id = rng.randrange(size)
+                key = entry_sort_key(rng.randint(0, 50000), rng.uniform(0, 100))
+                started = time.perf_counter()
+                index.update(entry_id, key)
+                timings.append(time.perf_counter() - started)
+            timings.sort()
+
+            started = time.perf_counter()
+            for _ in range(100):
+                index.top(50)
+            top_us = (time.perf_counter() - started) / 100 * 1e6
+
+            # Lower bound for the old approach: ordering the board once,
+            # before issuing one UPDATE per entry
+            started = time.perf_counter()
+            sorted((key, entry_id) for entry_id, key in items)
+            rerank_ms = (time.perf_counter() - started) * 1e3
+
+            self.stdout.write(
+                f'{size:>10} {build_seconds:>9.2f} '
+                f'{timings[len(timings) // 2] * 1e6:>14.1f} '
+                f'{timings[int(len(timings) * 0.99)] * 1e6:>14.1f} '
+                f'{top_us:>9.1f} {rerank_ms:>16.1f}'
+            )
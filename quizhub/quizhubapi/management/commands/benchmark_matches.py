@@ -0,0 +1,127 @@
+# quizhubapi/management/commands/benchmark_matches.py
+import asyncio
+import random
+import time
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from django.db import connection
+from quizhubapi.models import User, Category, Topic, Question, Answer, Quiz, Match, MatchPlayer
+from quizhubapi.routing import websocket_urlpatterns
+
+PREFIX = 'bench_match_'
+
+class Command(BaseCommand):
+    help = 'Load-test live matches through MatchConsumer on the in-memory channel layer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--matches', type=int, default=300)
+        parser.add_argument('--players', type=int, default=4, help='Players per match')
+        parser.add_argument('--questions', type=int, default=5, help='Questions per match')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        try:
+            matches = self.create_matches(options['matches'], options['players'], options['questions'])
+
+            queries = []
+            latencies = []
+            with connection.execute_wrapper(self.count_query(queries)):
+                started = time.perf_counter()
+                async_to_sync(self.play_all)(matches, latencies, rng)
+                elapsed = time.perf_counter() - started
+        finally:
+            self.cleanup()
+
+        latencies.sort()
+        answers = len(latencies)
+        self.stdout.write(
+            f"{'matches':>8} {'sockets':>8} {'answers':>8} {'seconds':>8} {'answers/s':>10} "
+            f"{'ack p50 ms':>11} {'ack p99 ms':>11} {'queries':>8} {'q/match':>8}"
+        )
+        self.stdout.write(
+            f"{len(matches):>8} {len(matches) * options['players']:>8} {answers:>8} {elapsed:>8.2f} "
+            f"{answers / elapsed:>10.0f} {latencies[answers // 2] * 1e3:>11.2f} "
+            f"{latencies[int(answers * 0.99)] * 1e3:>11.2f} {len(queries):>8} {len(queries) / len(matches):>8.1f}"
+        )
+
+    def count_query(self, queries):
+        def wrapper(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+        return wrapper
+
+    def create_matches(self, count, players, questions):
+        users = User.objects.bulk_create([
+            User(username=f'{PREFIX}{i}', email=f'{PREFIX}{i}@example.com', password='!')
+            for i in range(count * players)
+        ])
+        category = Category.objects.create(name=f'{PREFIX}category')
+        topic = Topic.objects.create(category=category, name='Benchmark', difficulty=1)
+        quiz = Quiz.objects.create(title='Benchmark', category=category, created_by=users[0],
+                                   max_questions=questions)
+        for i in range(questions):
+            question = Question.objects.create(text=f'Question {i}', type='multiple_choice', difficulty=1,
+                                               topic=topic, status='approved', created_by=users[0])
+            Answer.objects.bulk_create([
+                Answer(question=question, text=str(n), is_correct=n == 0, order=n) for n in range(4)
+            ])
+            quiz.questions.add(question)
+
+        matches = []
+        for i in range(count):
+            members = users[i * players:(i + 1) * players]
+            match = Match.objects.create(quiz=quiz, created_by=members[0], max_players=players,
+                                         player_count=players)
+            MatchPlayer.objects.bulk_create([MatchPlayer(match=match, user=user) for user in members])
+            matches.append((match.id, members))
+        return matches
+
+    def cleanup(self):
+        Category.objects.filter(name__startswith=PREFIX).delete()
+        User.objects.filter(username__startswith=PREFIX).delete()
+
+    async def play_all(self, matches, latencies, rng):
+        application = URLRouter(websocket_urlpatterns)
+        await asyncio.gather(*[
+            self.play_match(application, match_id, members, latencies, rng)
+            for match_id, members in matches
+        ])
+
+    async def play_match(self, application, match_id, members, latencies, rng):
+        sockets = []
+        for user in members:
+            communicator = WebsocketCommunicator(application, f'/ws/match/{match_id}/')
+            communicator.scope['user'] = user
+            connected, _ = await communicator.connect(timeout=30)
+            assert connected, f'Match {match_id} refused a socket'
+            await communicator.receive_json_from(timeout=30)
+            sockets.append(communicator)
+
+        await sockets[0].send_json_to({'action': 'start'})
+        await asyncio.gather(*[
+            self.play_socket(socket, socket is sockets[0], latencies, rng) for socket in sockets
+        ])
+        for socket in sockets:
+            await socket.disconnect()
+
+    async def play_socket(self, socket, is_host, latencies, rng):
+        sent_at = total = None
+        while True:
+            message = await socket.receive_json_from(timeout=30)
+            if message['type'] == 'question_opened':
+                total = message['data']['total']
+                answer = rng.choice(message['data']['question']['answers'])
+                sent_at = time.perf_counter()
+                await socket.send_json_to({'action': 'answer', 'answer_id': answer['id']})
+            elif message['type'] == 'answer_accepted':
+                latencies.append(time.perf_counter() - sent_at)
+            elif message['type'] == 'question_closed':
+                if is_host and message['data']['index'] + 1 < total:
+                    await socket.send_json_to({'action': 'next_question'})
+            elif message['type'] == 'match_ended':
+                return
+            elif message['type'] == 'error':
+                raise RuntimeError(message['data']['message'])
@@ -0,0 +1,55 @@
+# quizhubapi/management/commands/benchmark_matchmaking.py
+import random
+import time
+from django.core.management.base import BaseCommand
+from quizhubapi.utils.matchmaking import MatchmakingQueue
+
+class Command(BaseCommand):
+    help = 'Measure quick-play queue throughput and queue-wait percentiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--players', type=int, default=100000, help='Players arriving over the run')
+        parser.add_argument('--rate', type=float, default=2000, help='Arrivals per simulated second')
+        parser.add_argument('--pools', type=int, default=20, help='Quizzes/categories players queue for')
+        parser.add_argument('--cancel', type=float, default=0.1, help='Share of players who leave the queue')
+        parser.add_argument('--tick', type=float, default=1.0, help='Simulated seconds between pairing passes')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        queue = MatchmakingQueue()
+        pools = [f'quiz:{i}' for i in range(options['pools'])]
+        per_tick = int(options['rate'] * options['tick'])
+
+        operations = 0
+        groups = 0
+        tick_seconds = []
+        now = 0.0
+        started = time.perf_counter()
+        for start in range(0, options['players'], per_tick):
+            for user_id in range(start, min(start + per_tick, options['players'])):
+                # Skill follows a long tail, like User.points
+                queue.enqueue(user_id, rng.choice(pools), int(rng.expovariate(1 / 800)),
+                              enqueued_at=now + rng.random() * options['tick'])
+                operations += 1
+                if rng.random() < options['cancel']:
+                    queue.cancel(rng.randrange(max(0, user_id - per_tick), user_id + 1))
+                    operations += 1
+
+            now += options['tick']
+            tick_started = time.perf_counter()
+            groups += len(queue.take_groups(now))
+            tick_seconds.append(time.perf_counter() - tick_started)
+        elapsed = time.perf_counter() - started
+
+        waits = queue.wait_percentiles((50, 95, 99))
+        tick_seconds.sort()
+        self.stdout.write(
+            f"{'players':>8} {'ops':>8} {'ops/s':>9} {'matches':>8} {'left':>6} {'tick p99 ms':>12} "
+            f"{'wait p50 s':>11} {'wait p95 s':>11} {'wait p99 s':>11}"
+        )
+        self.stdout.write(
+            f"{options['players']:>8} {operations:>8} {operations / elapsed:>9.0f} {groups:>8} "
+            f"{len(queue):>6} {tick_seconds[int(len(tick_seconds) * 0.99)] * 1e3:>12.2f} "
+            f"{waits[50]:>11.2f} {waits[95]:>11.2f} {waits[99]:>11.2f}"
+        )
@@ -0,0 +1,61 @@
+# quizhubapi/management/commands/benchmark_rankings.py
+import random
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from quizhubapi.models import User
+from quizhubapi.utils.rankings import bulk_update_user_rankings, update_user_rankings_row_by_row
+
+COUNTRIES = ['US', 'GB', 'DE', 'FR', 'NG', 'IN', 'BR', 'JP', 'KE', 'CA']
+
+class Rollback(Exception):
+    pass
+
+class Command(BaseCommand):
+    help = 'Time bulk vs row-by-row user ranking on synthetic users (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, nargs='+', default=[100000, 1000000])
+        parser.add_argument('--row-by-row-limit', type=int, default=100000,
+                            help='Skip the row-by-row run above this many users')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'users':>10} {'mode':>12} {'seconds':>9} {'queries':>9}")
+        for size in options['users']:
+            modes = [('bulk', bulk_update_user_rankings)]
+            if size <= options['row_by_row_limit']:
+                modes.append(('row-by-row', update_user_rankings_row_by_row))
+
+            for name, rank_users in modes:
+                try:
+                    with transaction.atomic():
+                        self.create_users(size, random.Random(options['seed']))
+                        queries = []
+                        with connection.execute_wrapper(self.count_query(queries)):
+                            started = time.perf_counter()
+                            rank_users()
+                            elapsed = time.perf_counter() - started
+                        raise Rollback
+                except Rollback:
+                    pass
+                self.stdout.write(f'{size:>10} {name:>12} {elapsed:>9.2f} {len(queries):>9}')
+
+    def count_query(self, queries):
+        def wrapper(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+        return wrapper
+
+    def create_users(self, size, rng):
+        batch = []
+        for i in range(size):
+            batch.append(User(
+                username=f'bench_{i}', email=f'bench_{i}@example.com', password='!',
+                points=rng.randint(0, 100000), streak_days=rng.randint(0, 365),
+                country=rng.choice(COUNTRIES + [None]),
+            ))
+            if len(batch) == 5000:
+                User.objects.bulk_create(batch)
+                batch = []
+        User.objects.bulk_create(batch)
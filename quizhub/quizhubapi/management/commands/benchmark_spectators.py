@@ -0,0 +1,94 @@
+# quizhubapi/management/commands/benchmark_spectators.py
+import asyncio
+import json
+import time
+from asgiref.sync import async_to_sync
+from channels.layers import InMemoryChannelLayer
+from django.core.management.base import BaseCommand
+from quizhubapi.utils.match_state import MatchState
+from quizhubapi.utils.match_worker import MatchWorker
+from quizhubapi.utils.spectators import spectator_group
+
+class Command(BaseCommand):
+    help = 'Compare the per-tick cost of the spectator tier with sending every socket its own event'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--viewers', type=int, nargs='+', default=[10, 100, 1000, 10000])
+        parser.add_argument('--workers', type=int, default=4, help='Processes holding spectator sockets')
+        parser.add_argument('--players', type=int, default=8)
+        parser.add_argument('--ticks', type=int, default=20)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'viewers':>8} {'owner ms/tick':>14} {'layer msgs/tick':>16} "
+                          f"{'relay us/socket':>16} {'per-socket ms/tick':>19} {'layer msgs/tick':>16}")
+        for viewers in options['viewers']:
+            tier = async_to_sync(self.spectator_tier)(viewers, options['workers'], options['players'],
+                                                      options['ticks'])
+            legacy = async_to_sync(self.per_socket)(viewers, options['players'], options['ticks'])
+            self.stdout.write(f'{viewers:>8} {tier[0] * 1e3:>14.3f} {tier[1]:>16} {tier[2] * 1e6:>16.3f} '
+                              f'{legacy[0] * 1e3:>19.3f} {legacy[1]:>16}')
+
+    def make_state(self, players):
+        state = MatchState(1, 1, 1, status='in_progress', max_players=players)
+        for player_id in range(players):
+            state.join(player_id, f'player {player_id}')
+        state.start([{'id': 1, 'text': 'Question', 'answers': [{'id': i, 'text': str(i)} for i in range(4)]}],
+                    {1: ([0, 1, 2, 3], 1)})
+        state.open_next_question()
+        return state
+
+    async def spectator_tier(self, viewers, workers, players, ticks):
+        """The owner encodes once and sends once per worker; workers write the text to their sockets"""
+        layer = InMemoryChannelLayer(capacity=ticks + 1)
+        loop = asyncio.get_running_loop()
+        owner = MatchWorker('owner', loop)
+        relays = [MatchWorker(f'relay-{i}', loop) for i in range(workers)]
+        state = self.make_state(players)
+        owner.matches[state.match_id] = state
+        for worker in [owner] + relays:
+            worker.channel_layer = layer
+
+        written = [0]
+
+        async def send(text):
+            written[0] += 1
+
+        for i, relay in enumerate(relays):
+            held = viewers // workers + (i < viewers % workers)
+            for socket in range(held):
+                relay.spectators.add(state.match_id, f'{relay.worker_id}.{socket}', send)
+            await layer.group_add(spectator_group(state.match_id), relay.channel)
+            state.spectators[relay.worker_id] = held
+
+        owner_seconds = relay_seconds = 0
+        for tick in range(ticks):
+            state.players[tick % players].score += 10  # Something changed since the last tick
+            started = time.perf_counter()
+            await owner.publish_spectator_frames()
+            owner_seconds += time.perf_counter() - started
+
+            started = time.perf_counter()
+            for relay in relays:
+                await relay.on_spectator_frame(await layer.receive(relay.channel))
+            relay_seconds += time.perf_counter() - started
+
+        assert written[0] == viewers * ticks
+        return owner_seconds / ticks, workers, relay_seconds / (viewers * ticks)
+
+    async def per_socket(self, viewers, players, ticks):
+        """Every event goes to every socket: encoded by the layer, decoded and re-encoded by each consumer.
+
+        Modelled directly rather than through InMemoryChannelLayer, whose
+        group_send rescans every channel per recipient.
+        """
+        state = self.make_state(players)
+        seconds = 0
+        for tick in range(ticks):
+            state.players[tick % players].score += 10
+            started = time.perf_counter()
+            message = {'type': 'match_state', 'data': state.snapshot()}
+            for _ in range(viewers):
+                event = json.loads(json.dumps(message))
+                json.dumps({'type': event['type'], 'data': event['data']})
+            seconds += time.perf_counter() - started
+        return seconds / ticks, viewers
@@ -0,0 +1,92 @@
+# quizhubapi/management/commands/benchmark_timers.py
+import asyncio
+import random
+import time
+from django.core.management.base import BaseCommand
+from quizhubapi.utils.match_state import MatchState, MatchStateError
+from quizhubapi.utils.timer_wheel import get_timer_wheel
+
+class Command(BaseCommand):
+    help = 'Measure match timer skew with thousands of matches on one event loop'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--matches', type=int, nargs='+', default=[1000, 5000, 10000])
+        parser.add_argument('--players', type=int, default=4, help='Players per match')
+        parser.add_argument('--questions', type=int, default=5, help='Questions per match')
+        parser.add_argument('--seconds', type=float, default=2.0, help='Answer window per question')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'matches':>8} {'timers':>8} {'seconds':>8} {'timers/s':>9} "
+            f"{'skew p50 ms':>12} {'skew p99 ms':>12} {'skew max ms':>12}"
+        )
+        for count in options['matches']:
+            skews = []
+            started = time.perf_counter()
+            asyncio.run(self.run(count, options, skews, random.Random(options['seed'])))
+            elapsed = time.perf_counter() - started
+
+            skews.sort()
+            self.stdout.write(
+                f'{count:>8} {len(skews):>8} {elapsed:>8.2f} {len(skews) / elapsed:>9.0f} '
+                f'{skews[len(skews) // 2] * 1e3:>12.2f} {skews[int(len(skews) * 0.99)] * 1e3:>12.2f} '
+                f'{skews[-1] * 1e3:>12.2f}'
+            )
+
+    async def run(self, count, options, skews, rng):
+        wheel = get_timer_wheel()
+        loop = asyncio.get_running_loop()
+        seconds = options['seconds']
+        finished = asyncio.Event()
+        remaining = [count]
+
+        def timed(callback):
+            # Record how late each timer fires against the time it was due
+            def fire(due, *args):
+                skews.append(loop.time() - due)
+                callback(*args)
+            return lambda delay, *args: wheel.schedule(delay, fire, loop.time() + delay, *args)
+
+        def answer(state, player_id, answer_id):
+            try:
+                state.submit_answer(player_id, answer_id)
+            except MatchStateError:
+                pass  # Landed after the deadline
+
+        def close(state):
+            state.close_question()
+            if state.has_next_question():
+                open_question(state)
+            else:
+                state.finish()
+                remaining[0] -= 1
+                if not remaining[0]:
+                    finished.set()
+
+        def open_question(state):
+            question = state.open_next_question()
+            answers = [a['id'] for a in question['question']['answers']]
+            for player_id in state.players:
+                schedule_answer(rng.uniform(0, seconds * 1.1), state, player_id, rng.choice(answers))
+            schedule_close(question['seconds'], state)
+
+        schedule_answer = timed(answer)
+        schedule_close = timed(close)
+
+        questions = [
+            {'id': i, 'duration': seconds, 'answers': [{'id': i * 4 + n} for n in range(4)]}
+            for i in range(options['questions'])
+        ]
+        # The first answer of each question is the correct one
+        answer_key = {i: (tuple(i * 4 + n for n in range(4)), 1) for i in range(options['questions'])}
+
+        for match_id in range(count):
+            state = MatchState(match_id, created_by_id=0, quiz_id=0)
+            for player_id in range(options['players']):
+                state.join(player_id, f'player {player_id}')
+            state.start(questions, answer_key)
+            # Spread match starts over one answer window
+            wheel.schedule(rng.uniform(0, seconds), open_question, state)
+
+        await finished.wait()
@@ -0,0 +1,59 @@
+# quizhubapi/management/commands/benchmark_word_filter.py
+import random
+import re
+import string
+import time
+from django.core.management.base import BaseCommand
+from quizhubapi.utils.word_filter import WordFilter
+
+class Command(BaseCommand):
+    help = 'Compare the compiled banned-word filter with a per-word scan'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--words', type=int, default=10000, help='Banned words')
+        parser.add_argument('--exact', type=float, default=0.3, help='Share of exact-match words')
+        parser.add_argument('--messages', type=int, default=5000, help='Chat messages to scan')
+        parser.add_argument('--naive-messages', type=int, default=200,
+                            help='Messages for the per-word scan, which is far slower')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+
+        def word(low, high):
+            return ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(low, high)))
+
+        banned = [(word(4, 10), rng.random() < options['exact']) for _ in range(options['words'])]
+        vocabulary = [word(2, 9) for _ in range(5000)] + [w for w, _ in banned[:50]]
+        messages = [' '.join(rng.choice(vocabulary) for _ in range(rng.randint(3, 25)))
+                    for _ in range(options['messages'])]
+
+        started = time.perf_counter()
+        word_filter = WordFilter(banned)
+        compile_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        flagged = sum(1 for message in messages if word_filter.contains(message))
+        compiled_seconds = time.perf_counter() - started
+
+        # What applying BannedWord rows one by one would cost
+        patterns = [re.compile(rf'\b{re.escape(w)}\b') if exact else w for w, exact in banned]
+        sample = messages[:options['naive_messages']]
+        started = time.perf_counter()
+        naive_flagged = sum(
+            1 for message in sample
+            if any(p.search(message) if not isinstance(p, str) else p in message for p in patterns)
+        )
+        naive_seconds = time.perf_counter() - started
+
+        compiled_flagged = sum(1 for message in sample if word_filter.contains(message))
+        if compiled_flagged != naive_flagged:
+            self.stderr.write(f'Mismatch: compiled flagged {compiled_flagged}, per-word {naive_flagged}')
+
+        self.stdout.write(f"{'words':>7} {'nodes':>8} {'compile ms':>11} {'matcher':>9} "
+                          f"{'messages':>9} {'flagged':>8} {'us/message':>11}")
+        self.stdout.write(f"{options['words']:>7} {len(word_filter.goto):>8} {compile_seconds * 1e3:>11.1f} "
+                          f"{'compiled':>9} {len(messages):>9} {flagged:>8} "
+                          f"{compiled_seconds / len(messages) * 1e6:>11.1f}")
+        self.stdout.write(f"{options['words']:>7} {'':>8} {'':>11} {'per-word':>9} {len(sample):>9} "
+                          f"{naive_flagged:>8} {naive_seconds / len(sample) * 1e6:>11.1f}")
@@ -0,0 +1,20 @@
+# quizhubapi/management/commands/reconcile_counters.py
+import time
+from django.core.management.base import BaseCommand
+from quizhubapi.utils.counters import reconcile_counters
+
+class Command(BaseCommand):
+    help = 'Repair counter columns that drifted from the tables they count'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without fixing it')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        drifted = reconcile_counters(fix=not options['dry_run'])
+        for counter, rows in drifted.items():
+            self.stdout.write(f'{counter:<24} {rows:>8} rows drifted')
+        verb = 'Found' if options['dry_run'] else 'Repaired'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {sum(drifted.values())} drifted counters in {time.perf_counter() - started:.2f}s'
+        ))
@@ -0,0 +1,15 @@
+# quizhubapi/management/commands/update_friend_suggestions.py
+import time
+from django.core.management.base import BaseCommand
+from quizhubapi.utils.friend_suggestions import update_friend_suggestions
+
+class Command(BaseCommand):
+    help = 'Rank friend suggestions for every user from the friend graph and cache them'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        graph = update_friend_suggestions()
+        self.stdout.write(self.style.SUCCESS(
+            f'Ranked suggestions for {len(graph.users)} users over {len(graph)} edges '
+            f'in {time.perf_counter() - started:.2f}s'
+        ))
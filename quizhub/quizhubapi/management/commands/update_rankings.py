@@ -0,0 +1,19 @@
+# quizhubapi/management/commands/update_rankings.py
+import time
+from django.core.management.base import BaseCommand
+from quizhubapi.utils.rankings import update_user_rankings
+
+class Command(BaseCommand):
+    help = 'Update user rankings (global and country)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--row-by-row', action='store_true',
+                            help='Save each user individually instead of ranking in bulk')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Updating user rankings...')
+        started = time.perf_counter()
+        update_user_rankings(bulk=not options['row_by_row'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully updated all user rankings in {time.perf_counter() - started:.2f}s'
+        ))
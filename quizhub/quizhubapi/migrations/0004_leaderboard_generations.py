@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizhubapi', '0003_add_country_to_user'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='leaderboardentry',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='leaderboard',
+            name='active_generation',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='leaderboardentry',
+            name='generation',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterUniqueTogether(
+            name='leaderboardentry',
+            unique_together={('leaderboard', 'generation', 'user', 'guest')},
+        ),
+    ]
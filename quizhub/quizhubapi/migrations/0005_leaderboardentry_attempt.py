@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizhubapi', '0004_leaderboard_generations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='leaderboardentry',
+            name='attempt',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='quizhubapi.quizattempt'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:57
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizhubapi', '0005_leaderboardentry_attempt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('score', models.IntegerField(default=0)),
+                ('quizzes_completed', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_scores', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'user'], name='quizhubapi__day_3a17f9_idx')],
+                'unique_together': {('user', 'day')},
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:22
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def dedupe_players(apps, schema_editor):
+    # unique_together let the same user or guest join a match twice
+    MatchPlayer = apps.get_model('quizhubapi', 'MatchPlayer')
+    for field in ('user', 'guest'):
+        duplicates = (MatchPlayer.objects.filter(**{f'{field}__isnull': False})
+                      .values('match', field).annotate(keep=Min('id'), rows=Count('id'))
+                      .filter(rows__gt=1))
+        for row in duplicates:
+            MatchPlayer.objects.filter(match=row['match'], **{field: row[field]}).exclude(
+                id=row['keep']).delete()
+
+
+def count_players(apps, schema_editor):
+    Match = apps.get_model('quizhubapi', 'Match')
+    matches = list(Match.objects.annotate(players_total=Count('players')).filter(players_total__gt=0))
+    for match in matches:
+        match.player_count = match.players_total
+    Match.objects.bulk_update(matches, ['player_count'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizhubapi', '0006_dailyscore'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='player_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(dedupe_players, migrations.RunPython.noop),
+        migrations.RunPython(count_players, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='matchplayer',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', False)), fields=('match', 'user'), name='unique_match_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='matchplayer',
+            constraint=models.UniqueConstraint(condition=models.Q(('guest__isnull', False)), fields=('match', 'guest'), name='unique_match_guest'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:25
+
+from django.db import migrations, models
+
+
+def release_finished_codes(apps, schema_editor):
+    Match = apps.get_model('quizhubapi', 'Match')
+    Match.objects.exclude(status__in=['waiting', 'in_progress']).update(room_code=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizhubapi', '0007_match_player_count'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='match',
+            name='room_code',
+            field=models.CharField(blank=True, max_length=8, null=True, unique=True),
+        ),
+        migrations.RunPython(release_finished_codes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:39
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_rows(queryset, field):
+    counted = queryset.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(
+        count=Count('pk')
+    ).values('count')
+    return Coalesce(Subquery(counted, output_field=IntegerField()), Value(0))
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model('quizhubapi', 'User')
+    Quiz = apps.get_model('quizhubapi', 'Quiz')
+    Follow = apps.get_model('quizhubapi', 'Follow')
+    # friends_count is filled from the friend edges of 0010, which count a
+    # pair befriended both ways once
+    User.objects.update(
+        followers_count=count_rows(Follow.objects.all(), 'following'),
+        following_count=count_rows(Follow.objects.all(), 'follower'),
+    )
+    Quiz.objects.update(questions_count=count_rows(Quiz.questions.through.objects.all(), 'quiz'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizhubapi', '0008_release_room_codes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='questions_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='following_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='friends_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
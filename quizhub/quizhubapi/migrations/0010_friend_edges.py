@@ -0,0 +1,56 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:41
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def link_friends(apps, schema_editor):
+    User = apps.get_model('quizhubapi', 'User')
+    Friendship = apps.get_model('quizhubapi', 'Friendship')
+    FriendEdge = apps.get_model('quizhubapi', 'FriendEdge')
+    edges, pairs = [], set()
+    for friendship in Friendship.objects.filter(status='accepted').order_by('id').iterator():
+        # A pair befriended both ways keeps the edges of its first friendship;
+        # nobody is their own friend
+        pair = frozenset((friendship.user1_id, friendship.user2_id))
+        if pair in pairs or len(pair) < 2:
+            continue
+        pairs.add(pair)
+        for user_id, friend_id in ((friendship.user1_id, friendship.user2_id),
+                                   (friendship.user2_id, friendship.user1_id)):
+            edges.append(FriendEdge(user_id=user_id, friend_id=friend_id, friendship_id=friendship.id,
+                                    created_at=friendship.created_at))
+    FriendEdge.objects.bulk_create(edges, batch_size=1000)
+
+    counted = FriendEdge.objects.filter(user=OuterRef('pk')).order_by().values('user').annotate(
+        count=Count('pk')
+    ).values('count')
+    User.objects.update(friends_count=Coalesce(Subquery(counted, output_field=IntegerField()), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizhubapi', '0009_counter_columns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FriendEdge',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('friend', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('friendship', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='edges', to='quizhubapi.friendship')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='friend_edges', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='friendedge',
+            constraint=models.UniqueConstraint(fields=('user', 'friend'), name='unique_friend_edge'),
+        ),
+        migrations.RunPython(link_friends, migrations.RunPython.noop),
+    ]
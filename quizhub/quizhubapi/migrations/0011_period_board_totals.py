@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizhubapi', '0010_friend_edges'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='leaderboard',
+            name='window_start',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='leaderboardentry',
+            index=models.Index(fields=['leaderboard', 'generation', '-score'], name='quizhubapi__leaderb_0f3074_idx'),
+        ),
+    ]
@@ -1,15 +1,15 @@
 from .user import User, Guest
 from .content import (Category, Topic, Question, Answer, Quiz, MediaFile, 
-                     QuizAttempt, QuizAnswer, Leaderboard, LeaderboardEntry)
+                     QuizAttempt, QuizAnswer, Leaderboard, LeaderboardEntry, DailyScore)
 from .match import Match, MatchPlayer, MatchInvite, MatchSupport, Spectator
-from .social import Follow, Friendship, FriendRequest
+from .social import Follow, Friendship, FriendEdge, FriendRequest
 from .notification import Notification
 from .moderation import Report, ModeratorAction, BannedWord, LiveChat
 
 __all__ = [
     'User', 'Guest', 'Category', 'Topic', 'Question', 'Answer', 'Quiz', 'MediaFile',
-    'QuizAttempt', 'QuizAnswer', 'Leaderboard', 'LeaderboardEntry',
+    'QuizAttempt', 'QuizAnswer', 'Leaderboard', 'LeaderboardEntry', 'DailyScore',
     'Match', 'MatchPlayer', 'MatchInvite', 'MatchSupport', 'Spectator',
-    'Follow', 'Friendship', 'FriendRequest', 'Notification',
+    'Follow', 'Friendship', 'FriendEdge', 'FriendRequest', 'Notification',
     'Report', 'ModeratorAction', 'BannedWord', 'LiveChat'
 ]
\ No newline at end of file
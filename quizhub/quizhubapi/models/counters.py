@@ -0,0 +1,17 @@
+# quizhubapi/models/counters.py
+
+class CounterFieldsMixin:
+    """Leave ``counter_fields`` out of full saves of existing rows.
+
+    Counter columns only move through F() updates (utils/counters.py), so
+    saving an instance loaded before the last increment must not write its
+    stale value back.
+    """
+
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+                                       if not field.primary_key and field.name not in self.counter_fields]
+        super().save(*args, **kwargs)
@@ -1,10 +1,11 @@
 # quizhubapi/models/match.py
-from django.db import models
+from django.db import models, transaction, IntegrityError
 from django.utils import timezone
+from .counters import CounterFieldsMixin
 from .user import User, Guest
 import uuid
 
-class Match(models.Model):
+class Match(CounterFieldsMixin, models.Model):
     STATUSES = [
         ('waiting', 'Waiting'),
         ('in_progress', 'In Progress'),
@@ -17,19 +18,35 @@ class Match(models.Model):
     is_private = models.BooleanField(default=False)
     allow_guests = models.BooleanField(default=True)
     max_players = models.IntegerField(default=2)
+    player_count = models.IntegerField(default=0)  # Seats taken; claimed and freed in utils/match_seats.py
     status = models.CharField(max_length=15, choices=STATUSES, default='waiting')
-    room_code = models.CharField(max_length=8, unique=True, blank=True)
+    room_code = models.CharField(max_length=8, unique=True, null=True, blank=True)  # Freed when the match ends
     created_at = models.DateTimeField(auto_now_add=True)
     started_at = models.DateTimeField(null=True, blank=True)
     ended_at = models.DateTimeField(null=True, blank=True)
+    counter_fields = ('player_count',)
     
     class Meta:
         app_label = 'quizhubapi'
     
     def save(self, *args, **kwargs):
-        if not self.room_code:
-            self.room_code = str(uuid.uuid4())[:8].upper()
-        super().save(*args, **kwargs)
+        from ..utils.room_codes import allocate_room_code, bind_room_code
+        
+        if not self._state.adding or self.room_code:
+            super().save(*args, **kwargs)
+            return
+        
+        while True:
+            self.room_code = allocate_room_code()
+            try:
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+                break
+            except IntegrityError:
+                # Held by a match the code map has forgotten (e.g. a flushed cache)
+                if not type(self).objects.filter(room_code=self.room_code).exists():
+                    raise
+        bind_room_code(self.room_code, self.id)
     
     def start_match(self):
         self.status = 'in_progress'
@@ -37,8 +54,12 @@ class Match(models.Model):
         self.save()
     
     def end_match(self):
+        from ..utils.room_codes import release_room_code
+        
+        release_room_code(self.room_code)
         self.status = 'completed'
         self.ended_at = timezone.now()
+        self.room_code = None
         self.save()
 
 class MatchPlayer(models.Model):
@@ -53,6 +74,13 @@ class MatchPlayer(models.Model):
     class Meta:
         app_label = 'quizhubapi'
         unique_together = ['match', 'user', 'guest']
+        # NULLs never collide in unique_together, so each seat kind needs its own
+        constraints = [
+            models.UniqueConstraint(fields=['match', 'user'], condition=models.Q(user__isnull=False),
+                                    name='unique_match_user'),
+            models.UniqueConstraint(fields=['match', 'guest'], condition=models.Q(guest__isnull=False),
+                                    name='unique_match_guest'),
+        ]
     
     @property
     def display_name(self):
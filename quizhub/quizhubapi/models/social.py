@@ -30,6 +30,24 @@ class Friendship(models.Model):
         app_label = 'quizhubapi'
         unique_together = ['user1', 'user2']
 
+class FriendEdge(models.Model):
+    """One direction of an accepted Friendship.
+
+    Each friendship has an edge from either side, so a user's friends, an
+    are-friends check and mutual friends are all indexed lookups on ``user``
+    instead of ``user1 OR user2`` scans. Kept by utils/friends.py.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='friend_edges')
+    friend = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    friendship = models.ForeignKey(Friendship, on_delete=models.CASCADE, related_name='edges')
+    created_at = models.DateTimeField()
+    
+    class Meta:
+        app_label = 'quizhubapi'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'friend'], name='unique_friend_edge'),
+        ]
+
 class FriendRequest(models.Model):
     STATUSES = [
         ('pending', 'Pending'),
@@ -1,8 +1,9 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.utils import timezone
+from .counters import CounterFieldsMixin
 
-class User(AbstractUser):
+class User(CounterFieldsMixin, AbstractUser):
     ROLES = [
         ('owner', 'Owner'),
         ('admin', 'Admin'),
@@ -31,6 +32,12 @@ class User(AbstractUser):
     country_rank = models.IntegerField(null=True, blank=True)
     global_rank = models.IntegerField(null=True, blank=True)
     
+    # Counters, kept by utils/counters.py
+    followers_count = models.IntegerField(default=0)
+    following_count = models.IntegerField(default=0)
+    friends_count = models.IntegerField(default=0)
+    counter_fields = ('followers_count', 'following_count', 'friends_count')
+    
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
     
@@ -48,6 +55,21 @@ class User(AbstractUser):
             self.streak_days = 1
         self.last_streak_date = today
         self.save()
+    
+    def award_points(self, points):
+        """Add points and advance the daily streak in a single UPDATE"""
+        today = timezone.now().date()
+        User.objects.filter(pk=self.pk).update(
+            points=models.F('points') + points,
+            streak_days=models.Case(
+                models.When(last_streak_date=today - timezone.timedelta(days=1),
+                            then=models.F('streak_days') + 1),
+                models.When(last_streak_date=today, then=models.F('streak_days')),
+                default=models.Value(1),
+            ),
+            last_streak_date=today,
+        )
+        self.refresh_from_db(fields=['points', 'streak_days', 'last_streak_date'])
 
 class Guest(models.Model):
     session_id = models.CharField(max_length=255, unique=True)
@@ -4,4 +4,7 @@ from . import consumers
 
 websocket_urlpatterns = [
     re_path(r'ws/match/(?P<match_id>\w+)/$', consumers.MatchConsumer.as_asgi()),
+    re_path(r'ws/match/(?P<match_id>\w+)/watch/$', consumers.SpectatorConsumer.as_asgi()),
+    re_path(r'ws/matchmaking/$', consumers.MatchmakingConsumer.as_asgi()),
+    re_path(r'ws/notifications/$', consumers.NotificationConsumer.as_asgi()),
 ]
\ No newline at end of file
@@ -1,9 +1,18 @@
 # quizhubapi/serializers.py
 from rest_framework import serializers
 from django.contrib.auth import authenticate
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 from .models import *
+from .utils.grading import get_answer_key, is_valid_answer, is_correct_answer
+from .utils.counts import annotated_count
+from .utils.spectators import get_spectator_count, get_spectator_counts
+from .utils.word_filter import get_word_filter
+
+def reject_banned_words(value):
+    if value and get_word_filter().contains(value):
+        raise serializers.ValidationError('Contains a banned word')
+    return value
 
 class UserSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
@@ -14,6 +23,9 @@ class UserSerializer(serializers.ModelSerializer):
                  'points', 'streak_days', 'status', 'date_joined', 'last_login']
         read_only_fields = ['id', 'points', 'streak_days', 'date_joined', 'last_login']
     
+    def validate_username(self, value):
+        return reject_banned_words(value)
+    
     def create(self, validated_data):
         password = validated_data.pop('password')
         user = User(**validated_data)
@@ -22,26 +34,21 @@ class UserSerializer(serializers.ModelSerializer):
         return user
 
 class UserProfileSerializer(serializers.ModelSerializer):
-    followers_count = serializers.SerializerMethodField()
-    following_count = serializers.SerializerMethodField()
-    friends_count = serializers.SerializerMethodField()
-    
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'profile_image', 'points', 
                  'streak_days', 'status', 'followers_count', 'following_count', 'friends_count']
+        read_only_fields = User.counter_fields
     
-    def get_followers_count(self, obj):
-        return obj.followers.count()
-    
-    def get_following_count(self, obj):
-        return obj.following.count()
-    
-    def get_friends_count(self, obj):
-        return Friendship.objects.filter(
-            models.Q(user1=obj, status='accepted') | 
-            models.Q(user2=obj, status='accepted')
-        ).count()
+    def validate_username(self, value):
+        return reject_banned_words(value)
+
+class PublicUserSerializer(serializers.ModelSerializer):
+    """What any signed-in user may see of someone they are not friends with"""
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'profile_image']
+        read_only_fields = fields
 
 class GuestSerializer(serializers.ModelSerializer):
     class Meta:
@@ -56,7 +63,7 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description', 'image_url', 'is_active', 'topics_count']
     
     def get_topics_count(self, obj):
-        return obj.topics.filter(is_active=True).count()
+        return annotated_count(obj, 'topics_count', obj.topics.filter(is_active=True).count)
 
 class TopicSerializer(serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
@@ -68,7 +75,7 @@ class TopicSerializer(serializers.ModelSerializer):
                  'is_active', 'questions_count']
     
     def get_questions_count(self, obj):
-        return obj.questions.filter(status='approved').count()
+        return annotated_count(obj, 'questions_count', obj.questions.filter(status='approved').count)
 
 class MediaFileSerializer(serializers.ModelSerializer):
     file_url = serializers.SerializerMethodField()
@@ -99,6 +106,9 @@ class AnswerSerializer(serializers.ModelSerializer):
         fields = ['id', 'text', 'is_correct', 'order', 'media_type', 
                  'image', 'audio', 'video', 'media_url', 'media_description']
     
+    def validate_text(self, value):
+        return reject_banned_words(value)
+    
     def get_media_url(self, obj):
         return obj.get_media_url()
 
@@ -116,6 +126,9 @@ class QuestionSerializer(serializers.ModelSerializer):
                  'created_at', 'answers', 'media_type', 'image', 'audio', 'video',
                  'media_url', 'media_description', 'duration']
     
+    def validate_text(self, value):
+        return reject_banned_words(value)
+    
     def get_media_url(self, obj):
         return obj.get_media_url()
     
@@ -128,19 +141,30 @@ class QuestionSerializer(serializers.ModelSerializer):
         
         return question
 
+# Quiz play payloads: no correct flags and nothing tied to the author
+class PlayAnswerSerializer(AnswerSerializer):
+    class Meta(AnswerSerializer.Meta):
+        fields = ['id', 'text', 'order', 'media_type',
+                 'image', 'audio', 'video', 'media_url', 'media_description']
+
+class PlayQuestionSerializer(QuestionSerializer):
+    answers = PlayAnswerSerializer(many=True, read_only=True)
+    
+    class Meta(QuestionSerializer.Meta):
+        fields = ['id', 'text', 'type', 'difficulty', 'topic', 'topic_name',
+                 'category_name', 'answers', 'media_type', 'image', 'audio', 'video',
+                 'media_url', 'media_description', 'duration']
+
 class QuizSerializer(serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     creator_name = serializers.CharField(source='created_by.username', read_only=True)
-    questions_count = serializers.SerializerMethodField()
     
     class Meta:
         model = Quiz
         fields = ['id', 'title', 'description', 'category', 'category_name',
                  'creator_name', 'is_public', 'max_questions', 'time_limit',
                  'questions_count', 'created_at']
-    
-    def get_questions_count(self, obj):
-        return obj.questions.count()
+        read_only_fields = Quiz.counter_fields
 
 # Solo Play Serializers
 class QuizAnswerSerializer(serializers.ModelSerializer):
@@ -167,51 +191,68 @@ class QuizAttemptSerializer(serializers.ModelSerializer):
             return obj.guest.display_name
         return 'Anonymous'
 
+class QuizAnswerSubmitSerializer(serializers.Serializer):
+    question_id = serializers.IntegerField()
+    selected_answer_id = serializers.IntegerField(required=False, allow_null=True)
+    time_taken = serializers.IntegerField(required=False, allow_null=True)
+
 class QuizAttemptCreateSerializer(serializers.ModelSerializer):
-    answers = serializers.ListField(write_only=True)
+    answers = QuizAnswerSubmitSerializer(many=True, write_only=True)
     
     class Meta:
         model = QuizAttempt
         fields = ['quiz', 'answers', 'time_taken']
     
+    def validate(self, data):
+        answers = data['answers']
+        question_ids = [answer['question_id'] for answer in answers]
+        if len(set(question_ids)) != len(question_ids):
+            raise serializers.ValidationError({'answers': 'Each question can only be answered once'})
+        
+        answer_key = get_answer_key(data['quiz'].id)
+        for answer in answers:
+            if answer['question_id'] not in answer_key:
+                raise serializers.ValidationError({'answers': 'Answers must belong to questions of this quiz'})
+            selected = answer.get('selected_answer_id')
+            if selected is not None and not is_valid_answer(answer_key, answer['question_id'], selected):
+                raise serializers.ValidationError({'answers': 'Selected answers must belong to their question'})
+            
+            # Correctness is decided here, never by the client
+            answer['is_correct'] = is_correct_answer(answer_key, answer['question_id'], selected)
+        return data
+    
+    @transaction.atomic
     def create(self, validated_data):
         answers_data = validated_data.pop('answers')
         user = self.context['request'].user if self.context['request'].user.is_authenticated else None
         
-        # Create the attempt
-        attempt = QuizAttempt.objects.create(
+        # Stats are known up front, so the attempt is written once
+        attempt = QuizAttempt(
             user=user,
             total_questions=len(answers_data),
+            correct_answers=sum(1 for answer in answers_data if answer['is_correct']),
+            status='completed',
+            completed_at=timezone.now(),
             **validated_data
         )
+        attempt.percentage = attempt.calculate_percentage()
+        attempt.score = attempt.award_points()
+        attempt.save()
         
-        # Create individual answers
-        correct_count = 0
-        for answer_data in answers_data:
-            is_correct = answer_data.get('is_correct', False)
-            if is_correct:
-                correct_count += 1
-                
-            QuizAnswer.objects.create(
+        QuizAnswer.objects.bulk_create([
+            QuizAnswer(
                 attempt=attempt,
                 question_id=answer_data['question_id'],
                 selected_answer_id=answer_data.get('selected_answer_id'),
-                is_correct=is_correct,
+                is_correct=answer_data['is_correct'],
                 time_taken=answer_data.get('time_taken')
             )
+            for answer_data in answers_data
+        ])
         
-        # Update attempt stats
-        attempt.correct_answers = correct_count
-        attempt.percentage = attempt.calculate_percentage()
-        attempt.score = attempt.award_points()
-        attempt.status = 'completed'
-        attempt.completed_at = timezone.now()
-        attempt.save()
-        
-        # Award points to user
-        if attempt.user:
-            attempt.user.points += attempt.score
-            attempt.user.save()
+        # Award points and advance the streak
+        if user:
+            user.award_points(attempt.score)
         
         return attempt
 
@@ -228,7 +269,7 @@ class LeaderboardEntrySerializer(serializers.ModelSerializer):
         return obj.user.username if obj.user else None
 
 class LeaderboardSerializer(serializers.ModelSerializer):
-    entries = LeaderboardEntrySerializer(many=True, read_only=True)
+    entries = LeaderboardEntrySerializer(source='active_entries', many=True, read_only=True)
     category_name = serializers.CharField(source='category.name', read_only=True)
     quiz_title = serializers.CharField(source='quiz.title', read_only=True)
     
@@ -248,11 +289,20 @@ class MatchPlayerSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'guest', 'display_name', 'user_data', 'guest_data',
                  'score', 'position', 'is_ready', 'joined_at']
 
+class MatchListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        # One cache multi-get for the spectator counts of the whole page
+        matches = list(data.all() if isinstance(data, models.Manager) else data)
+        counts = get_spectator_counts([match.id for match in matches])
+        for match in matches:
+            match.spectators_count = counts[match.id]
+        return super().to_representation(matches)
+
 class MatchSerializer(serializers.ModelSerializer):
     players = MatchPlayerSerializer(many=True, read_only=True)
     creator_name = serializers.CharField(source='created_by.username', read_only=True)
     quiz_title = serializers.CharField(source='quiz.title', read_only=True)
-    players_count = serializers.SerializerMethodField()
+    players_count = serializers.IntegerField(source='player_count', read_only=True)
     spectators_count = serializers.SerializerMethodField()
     
     class Meta:
@@ -261,12 +311,10 @@ class MatchSerializer(serializers.ModelSerializer):
                  'is_private', 'allow_guests', 'max_players', 'status',
                  'room_code', 'players_count', 'spectators_count',
                  'created_at', 'started_at', 'ended_at', 'players']
-    
-    def get_players_count(self, obj):
-        return obj.players.count()
+        list_serializer_class = MatchListSerializer
     
     def get_spectators_count(self, obj):
-        return obj.spectators.count()
+        return annotated_count(obj, 'spectators_count', lambda: get_spectator_count(obj.id))
 
 class MatchSupportSerializer(serializers.ModelSerializer):
     supporter_name = serializers.SerializerMethodField()
@@ -291,17 +339,15 @@ class FriendRequestSerializer(serializers.ModelSerializer):
         fields = ['id', 'sender', 'receiver', 'sender_name', 'receiver_name',
                  'status', 'message', 'created_at']
 
-class FriendshipSerializer(serializers.ModelSerializer):
-    friend = serializers.SerializerMethodField()
+class FriendSerializer(serializers.ModelSerializer):
+    """A friend list row, read from the requesting user's FriendEdge"""
+    id = serializers.IntegerField(source='friendship_id', read_only=True)
+    friend = UserSerializer(read_only=True)
+    status = serializers.CharField(source='friendship.status', read_only=True)
     
     class Meta:
-        model = Friendship
+        model = FriendEdge
         fields = ['id', 'friend', 'status', 'created_at']
-    
-    def get_friend(self, obj):
-        user = self.context['request'].user
-        friend = obj.user2 if obj.user1 == user else obj.user1
-        return UserSerializer(friend).data
 
 # Notification Serializers
 class NotificationSerializer(serializers.ModelSerializer):
@@ -1,49 +1,138 @@
 # quizhubapi/signals.py
-from django.db.models.signals import post_save, post_delete
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete, m2m_changed
 from django.dispatch import receiver
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
-from .models import MatchPlayer, LiveChat, MatchSupport
+from .models import (Match, MatchPlayer, LiveChat, MatchSupport, Category, Topic, Question, Answer, Quiz,
+                     BannedWord, Follow, Friendship)
+from .utils.broadcast import publish_match_event
+from .utils.counters import (bump, count_follow, count_friendship, count_friendship_status, count_question_removed,
+                             recount)
+from .utils.friends import sync_friend_edges
+from .utils.grading import invalidate_answer_keys, invalidate_question_answer_keys
+from .utils.question_sampling import invalidate_question_pools, invalidate_question_pools_for
+from .utils.question_bundles import invalidate_question_bundles, invalidate_topic_bundles
+from .utils.room_codes import release_room_code
+from .utils.word_filter import invalidate_word_filter
+
+# Membership events share one key per player, so a join and a leave of the
+# same player inside one broadcast window collapse into the latest. They are
+# published once the change commits: a rolled back join must not reach the
+# worker's roster or the sockets.
+def publish_membership(instance, event_type):
+    data = {'player_id': instance.id, 'display_name': instance.display_name}
+    transaction.on_commit(lambda: publish_match_event(
+        instance.match_id, event_type, data, key=f'player:{data["player_id"]}'
+    ))
 
 @receiver(post_save, sender=MatchPlayer)
 def player_joined_match(sender, instance, created, **kwargs):
     if created:
-        channel_layer = get_channel_layer()
-        # Only send if channel layer is properly configured
-        if channel_layer is not None:
-            try:
-                async_to_sync(channel_layer.group_send)(
-                    f'match_{instance.match.id}',
-                    {
-                        'type': 'player_joined',
-                        'data': {
-                            'player_id': instance.id,
-                            'display_name': instance.display_name,
-                            'players_count': instance.match.players.count()
-                        }
-                    }
-                )
-            except Exception:
-                # Silently ignore channel layer errors during fixture loading
-                pass
+        publish_membership(instance, 'player_joined')
 
 @receiver(post_delete, sender=MatchPlayer)
 def player_left_match(sender, instance, **kwargs):
-    channel_layer = get_channel_layer()
-    # Only send if channel layer is properly configured
-    if channel_layer is not None:
-        try:
-            async_to_sync(channel_layer.group_send)(
-                f'match_{instance.match.id}',
-                {
-                    'type': 'player_left',
-                    'data': {
-                        'player_id': instance.id,
-                        'display_name': instance.display_name,
-                        'players_count': instance.match.players.count()
-                    }
-                }
-            )
-        except Exception:
-            # Silently ignore channel layer errors during fixture loading
-            pass
\ No newline at end of file
+    publish_membership(instance, 'player_left')
+
+@receiver(post_save, sender=BannedWord)
+@receiver(post_delete, sender=BannedWord)
+def banned_words_changed(sender, instance, **kwargs):
+    invalidate_word_filter()
+
+@receiver(post_delete, sender=Match)
+def match_deleted(sender, instance, **kwargs):
+    release_room_code(instance.room_code)
+
+@receiver(post_save, sender=Question)
+@receiver(pre_delete, sender=Question)  # Its quiz links are gone by post_delete
+def question_changed(sender, instance, **kwargs):
+    invalidate_question_answer_keys(instance.id)
+    invalidate_question_pools_for(instance)
+    invalidate_question_bundles([instance.id])
+
+@receiver(post_save, sender=Answer)
+@receiver(post_delete, sender=Answer)
+def answer_changed(sender, instance, **kwargs):
+    invalidate_question_answer_keys(instance.question_id)
+    invalidate_question_bundles([instance.question_id])
+
+@receiver(post_save, sender=Topic)
+def topic_changed(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_topic_bundles([instance.id])
+
+@receiver(post_save, sender=Category)
+def category_changed(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_topic_bundles(instance.topics.values_list('id', flat=True))
+
+@receiver(m2m_changed, sender=Quiz.questions.through)
+def quiz_questions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        quiz_ids = [instance.pk] if action.startswith('post_') else []
+    elif action == 'pre_clear':
+        # question.quiz_set.clear() carries no pk_set, so find the quizzes first
+        quiz_ids = list(sender.objects.filter(question_id=instance.pk).values_list('quiz_id', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        quiz_ids = pk_set
+    else:
+        quiz_ids = []
+
+    if quiz_ids:
+        invalidate_answer_keys(quiz_ids)
+        invalidate_question_pools(quiz_ids=quiz_ids)
+
+# Counter columns move with the rows they count (utils/counters.py)
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        count_follow(instance, 1)
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    count_follow(instance, -1)
+
+@receiver(pre_save, sender=Friendship)
+def friendship_saving(sender, instance, update_fields=None, **kwargs):
+    # Status changes of saved friendships (pending -> accepted, accepted ->
+    # blocked) move the counters too, so remember the stored status
+    instance._stored_status = None
+    if not instance._state.adding and (update_fields is None or 'status' in update_fields):
+        instance._stored_status = Friendship.objects.filter(pk=instance.pk).values_list(
+            'status', flat=True
+        ).first()
+
+@receiver(post_save, sender=Friendship)
+def friendship_created(sender, instance, created, **kwargs):
+    if created:
+        count_friendship(instance, 1)
+    else:
+        count_friendship_status(instance, instance._stored_status)
+
+@receiver(post_save, sender=Friendship)
+def friendship_saved(sender, instance, **kwargs):
+    # Deleted friendships take their edges with them through the foreign key
+    sync_friend_edges(instance)
+
+@receiver(post_delete, sender=Friendship)
+def friendship_deleted(sender, instance, **kwargs):
+    count_friendship(instance, -1)
+
+@receiver(m2m_changed, sender=Quiz.questions.through)
+def quiz_question_count_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'post_add' and pk_set:
+        # pk_set only holds the links that were actually added
+        if reverse:
+            bump(Quiz, pk_set, questions_count=1)
+        else:
+            bump(Quiz, [instance.pk], questions_count=len(pk_set))
+    elif action == 'post_remove' and pk_set:
+        # but for removals it is whatever was passed, so count again
+        recount(Quiz, 'questions_count', pk_set if reverse else [instance.pk])
+    elif action == 'post_clear' and not reverse:
+        recount(Quiz, 'questions_count', [instance.pk])
+    elif action == 'pre_clear' and reverse:
+        count_question_removed(instance.pk)
+
+@receiver(pre_delete, sender=Question)  # Its quiz links are deleted without m2m_changed
+def question_leaves_quizzes(sender, instance, **kwargs):
+    count_question_removed(instance.pk)
@@ -0,0 +1,7 @@
+# quizhubapi/tasks.py
+from celery import shared_task
+from .utils.notifications import deliver_notifications
+
+@shared_task(name='quizhubapi.deliver_notifications', ignore_result=True)
+def deliver_notifications_task(event):
+    deliver_notifications(event)
@@ -1,3 +1,1259 @@
-from django.test import TestCase
+import asyncio
+import io
+from importlib import import_module
+import random
+from unittest import mock
+import threading
+import time
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.apps import apps as django_apps
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection, transaction, OperationalError
+from django.db.models import Avg, F, Sum
+from django.utils import timezone
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from rest_framework.test import APIClient
 
-# Create your tests here.
\ No newline at end of file
+from .models import (User, Category, Topic, Question, Answer, Quiz, QuizAttempt, QuizAnswer,
+                     Match, MatchPlayer, LiveChat, BannedWord, Follow, Friendship, FriendEdge,
+                     Notification, Leaderboard, LeaderboardEntry, DailyScore, Guest)
+from .routing import websocket_urlpatterns
+from .serializers import QuestionSerializer, CategorySerializer
+from .utils.broadcast import publish_match_event
+from .utils.counters import reconcile_counters
+from .utils.friend_suggestions import FriendGraph, update_friend_suggestions
+from .utils.friends import are_friends, mutual_friends, sync_friend_edges
+from .utils.guest_tokens import make_guest_token, read_guest_token
+from .utils.match_sharding import HashRing
+from .utils.match_state import MatchState
+from .utils.match_worker import MatchWorker, get_local_worker
+from .utils.matchmaking import MatchmakingQueue, create_quick_matches, pool_key
+from .utils.notifications import deliver_notifications, notify_followers, wait_for_notifications
+from .utils.match_seats import SeatError, take_seat
+from .utils.room_codes import ALPHABET, lookup_room_code, room_code_key
+from .utils.spectators import get_spectator_count
+from .utils.word_filter import WordFilter, get_word_filter, invalidate_word_filter
+from channels.routing import URLRouter
+from .utils.period_leaderboards import PERIOD_DAYS, get_period_rankings, record_daily_score, roll_period_boards
+from .utils.question_sampling import sample_ids
+from .utils.quiz_leaderboards import get_quiz_leaderboard, record_quiz_attempt
+from .utils.rank_index import (RankIndex, _change_key, _publish_change, entry_sort_key,
+                               get_top_entry_ids, invalidate_leaderboard_index)
+from .utils.rankings import (_update_user_rankings_batched, bulk_update_user_rankings,
+                             collect_leaderboard_generations, swap_leaderboard_entries, update_user_rankings_row_by_row)
+
+@override_settings(NOTIFICATION_QUEUE='thread', NOTIFICATION_ALLOW_THREAD=True)
+class QuizTestCase(TestCase):
+    QUESTION_COUNT = 50
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='player', email='player@example.com', password='pass')
+        category = Category.objects.create(name='Science')
+        topic = Topic.objects.create(category=category, name='Physics', difficulty=1)
+        cls.quiz = Quiz.objects.create(title='Physics', category=category, created_by=cls.user,
+                                       max_questions=cls.QUESTION_COUNT)
+
+        cls.answers = {}
+        for i in range(cls.QUESTION_COUNT):
+            question = Question.objects.create(text=f'Question {i}', type='multiple_choice', difficulty=1,
+                                               topic=topic, status='approved', created_by=cls.user)
+            cls.answers[question.id] = Answer.objects.create(question=question, text='Right', is_correct=True)
+            cls.quiz.questions.add(question)
+
+    def setUp(self):
+        cache.clear()
+        invalidate_leaderboard_index()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def submit(self, count):
+        answers = [
+            {'question_id': question_id, 'selected_answer_id': answer.id, 'time_taken': 3}
+            for question_id, answer in list(self.answers.items())[:count]
+        ]
+        return self.client.post('/api/quiz-attempts/', {'quiz': self.quiz.id, 'answers': answers}, format='json')
+
+class QuizSubmissionTests(QuizTestCase):
+    def test_query_count_does_not_grow_with_answers(self):
+        # The first submission creates the boards and entries
+        self.assertEqual(self.submit(1).status_code, 201)
+
+        counts = []
+        for count in (5, self.QUESTION_COUNT):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.submit(count)
+            self.assertEqual(response.status_code, 201)
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(QuizAnswer.objects.count(), 1 + 5 + self.QUESTION_COUNT)
+
+    def test_points_are_awarded_once(self):
+        response = self.submit(10)
+        self.assertEqual(response.status_code, 201)
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.points, 10 * QuizAttempt.POINTS_PER_CORRECT_ANSWER)
+        self.assertEqual(self.user.streak_days, 1)
+        self.assertEqual(response.data['score'], self.user.points)
+
+    def test_rejects_answers_outside_the_quiz(self):
+        other = Question.objects.create(text='Elsewhere', type='true_false', difficulty=1,
+                                        topic=Topic.objects.get(), created_by=self.user)
+        response = self.client.post('/api/quiz-attempts/', {
+            'quiz': self.quiz.id,
+            'answers': [{'question_id': other.id, 'is_correct': True}],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(QuizAttempt.objects.exists())
+
+    def test_grades_on_the_server(self):
+        question_id, right = next(iter(self.answers.items()))
+        wrong = Answer.objects.create(question_id=question_id, text='Wrong')
+        response = self.client.post('/api/quiz-attempts/', {
+            'quiz': self.quiz.id,
+            'answers': [{'question_id': question_id, 'selected_answer_id': wrong.id, 'is_correct': True}],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['correct_answers'], 0)
+        self.assertFalse(response.data['answers'][0]['is_correct'])
+
+    def test_answer_edits_invalidate_the_answer_key(self):
+        question_id, right = next(iter(self.answers.items()))
+        self.assertEqual(self.submit(1).data['correct_answers'], 1)
+
+        right.is_correct = False
+        right.save()
+        self.assertEqual(self.submit(1).data['correct_answers'], 0)
+
+class RankIndexTests(TestCase):
+    def test_rank_and_top_match_a_sorted_list(self):
+        rng = random.Random(7)
+        index = RankIndex()
+        index.LOAD = 4  # Force block splits and merges
+        keys = {}
+        for step in range(600):
+            member = rng.randrange(120)
+            if step % 5 == 4:
+                index.discard(member)
+                keys.pop(member, None)
+            else:
+                keys[member] = entry_sort_key(rng.randrange(30), rng.choice([None, 50.0, 75.0]))
+                index.update(member, keys[member])
+
+        reference = [member for key, member in sorted((key, member) for member, key in keys.items())]
+        self.assertEqual(len(index), len(reference))
+        self.assertEqual(index.top(10), reference[:10])
+        self.assertEqual(index.members(17, 45), reference[17:45])
+        self.assertEqual(index.members(len(reference) - 3), reference[-3:])
+        for rank, member in enumerate(reference, 1):
+            self.assertEqual(index.rank(member), rank)
+        self.assertIsNone(index.rank(1000))
+
+class UserRankingTests(TestCase):
+    def setUp(self):
+        rows = [(50, 3, 'GB'), (50, 3, 'GB'), (50, 1, None), (70, 0, 'US'), (10, 5, 'GB'),
+                (50, 3, None), (70, 0, 'US'), (0, 0, 'US')]
+        User.objects.bulk_create([
+            User(username=f'ranked{i}', email=f'ranked{i}@example.com', points=points,
+                 streak_days=streak, country=country)
+            for i, (points, streak, country) in enumerate(rows)
+        ] + [User(username='banned', email='banned@example.com', points=99, status='banned')])
+
+    def ranks(self):
+        ranks = dict((user_id, (g, c)) for user_id, g, c in
+                     User.objects.values_list('id', 'global_rank', 'country_rank'))
+        User.objects.update(global_rank=None, country_rank=None)
+        return ranks
+
+    def test_bulk_ranks_match_row_by_row(self):
+        update_user_rankings_row_by_row()
+        expected = self.ranks()
+        self.assertEqual(sorted(g for g, c in expected.values() if g), list(range(1, 9)))
+        no_country = User.objects.filter(country__isnull=True).values_list('id', flat=True)
+        self.assertEqual({expected[user_id][1] for user_id in no_country}, {None})
+
+        bulk_update_user_rankings()
+        self.assertEqual(self.ranks(), expected)
+        _update_user_rankings_batched()
+        self.assertEqual(self.ranks(), expected)
+
+class LeaderboardTests(QuizTestCase):
+    def global_entry(self):
+        return LeaderboardEntry.objects.get(leaderboard__type='global', user=self.user,
+                                            generation=F('leaderboard__active_generation'))
+
+    def test_entry_left_out_of_a_rebuild_keeps_earlier_attempts(self):
+        self.submit(10)
+        self.submit(5)
+        swap_leaderboard_entries(Leaderboard.objects.get(type='global'), [])  # Outside the top N
+        self.submit(20)
+
+        entry = self.global_entry()
+        self.assertEqual(entry.total_quizzes, 3)
+        self.assertEqual(entry.score, (10 + 5 + 20) * QuizAttempt.POINTS_PER_CORRECT_ANSWER)
+        self.assertAlmostEqual(entry.average_percentage,
+                               QuizAttempt.objects.aggregate(avg=Avg('percentage'))['avg'])
+
+    def test_submissions_invalidate_cached_pages(self):
+        self.submit(5)
+        urls = ['/api/leaderboards/global_rankings/',
+                f'/api/leaderboards/category_rankings/?category={self.quiz.category_id}',
+                f'/api/leaderboards/quiz_rankings/?quiz={self.quiz.id}']
+        for url in urls:
+            self.client.get(url)
+
+        with self.assertNumQueries(0):
+            pages = [self.client.get(url).json()['entries'] for url in urls]
+        self.assertEqual({page[0]['score'] for page in pages}, {5 * QuizAttempt.POINTS_PER_CORRECT_ANSWER})
+
+        self.submit(8)
+        # Global and category boards show total points, the quiz board the best attempt
+        pages = [self.client.get(url).json()['entries'] for url in urls]
+        self.assertEqual([page[0]['score'] for page in pages],
+                         [13 * QuizAttempt.POINTS_PER_CORRECT_ANSWER] * 2 + [8 * QuizAttempt.POINTS_PER_CORRECT_ANSWER])
+
+    @override_settings(QUIZ_LEADERBOARD_SIZE=2)
+    def test_quiz_board_keeps_the_best_attempts(self):
+        first, second, third = User.objects.bulk_create([
+            User(username=f'ranked{i}', email=f'ranked{i}@example.com') for i in range(3)
+        ])
+
+        def attempt(user, score):
+            attempt = QuizAttempt.objects.create(quiz=self.quiz, user=user, score=score, total_questions=10,
+                                                 percentage=score, status='completed')
+            record_quiz_attempt(attempt)
+            return attempt
+
+        def board():
+            return list(get_quiz_leaderboard(self.quiz.id).entries.order_by('rank')
+                        .values_list('rank', 'user_id', 'score'))
+
+        attempt(first, 30)
+        attempt(second, 20)
+        self.assertEqual(board(), [(1, first.id, 30), (2, second.id, 20)])
+
+        attempt(third, 10)  # Does not beat the last place
+        attempt(first, 25)  # Worse than the user's best
+        self.assertEqual(board(), [(1, first.id, 30), (2, second.id, 20)])
+
+        attempt(third, 25)  # Evicts the last place
+        self.assertEqual(board(), [(1, first.id, 30), (2, third.id, 25)])
+
+        best = attempt(third, 40)  # Replaces the user's own entry
+        self.assertEqual(board(), [(1, third.id, 40), (2, first.id, 30)])
+        self.assertEqual(get_quiz_leaderboard(self.quiz.id).entries.get(user=third).attempt, best)
+
+    def test_collection_keeps_one_replaced_generation(self):
+        board = Leaderboard.objects.create(type='global', name='Global Leaderboard')
+        for _ in range(3):
+            generation = swap_leaderboard_entries(board, User.objects.all())
+        self.assertEqual(Leaderboard.objects.get(id=board.id).active_generation, generation)
+        self.assertEqual(board.active_entries.get().user, self.user)
+
+        self.assertEqual(collect_leaderboard_generations(), 1)
+        self.assertEqual(sorted(board.entries.values_list('generation', flat=True)),
+                         [generation - 1, generation])
+
+    def test_index_replays_changes_from_other_workers(self):
+        others = User.objects.bulk_create([
+            User(username=f'ranked{i}', email=f'ranked{i}@example.com') for i in range(3)
+        ])
+        board = Leaderboard.objects.create(type='global', name='Global Leaderboard')
+        entries = LeaderboardEntry.objects.bulk_create([
+            LeaderboardEntry(leaderboard=board, user=user, score=score, rank=0)
+            for user, score in zip(others, (30, 20, 10))
+        ])
+        self.assertEqual(get_top_entry_ids(board), [entry.id for entry in entries])
+
+        # Another worker moved the last entry to the top
+        LeaderboardEntry.objects.filter(id=entries[2].id).update(score=40)
+        _publish_change(board.id, entries[2].id, entry_sort_key(40, 0.0))
+        with self.assertNumQueries(0):
+            self.assertEqual(get_top_entry_ids(board)[0], entries[2].id)
+
+        # A change missing from the log reloads the board from the database
+        LeaderboardEntry.objects.filter(id=entries[1].id).update(score=50)
+        version = _publish_change(board.id, entries[1].id, entry_sort_key(50, 0.0))
+        cache.delete(_change_key(board.id, version))
+        self.assertEqual(get_top_entry_ids(board), [entries[1].id, entries[2].id, entries[0].id])
+
+class PeriodLeaderboardTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.today = timezone.localdate()
+        self.other = User.objects.create(username='rival', email='rival@example.com')
+        DailyScore.objects.bulk_create([
+            DailyScore(user=user, day=self.today - timedelta(days=ago), score=score, quizzes_completed=1)
+            for user, ago, score in ((self.user, 40, 500), (self.user, 20, 70), (self.user, 5, 30),
+                                     (self.other, 6, 90), (self.other, 1, 15), (self.other, 0, 10))
+        ])
+
+    def totals(self, period):
+        return dict(LeaderboardEntry.objects.filter(leaderboard__type=period)
+                    .values_list('user_id', 'score'))
+
+    def expected(self, period, today):
+        start = today - timedelta(days=PERIOD_DAYS[period] - 1)
+        return dict(DailyScore.objects.filter(day__gte=start, day__lte=today).values('user_id')
+                    .annotate(total=Sum('score')).values_list('user_id', 'total'))
+
+    def test_scores_fold_into_daily_buckets_and_period_totals(self):
+        for score in (40, 60):
+            record_daily_score(QuizAttempt.objects.create(quiz=self.quiz, user=self.user, score=score,
+                                                          total_questions=5, status='completed'))
+        bucket = DailyScore.objects.get(user=self.user, day=self.today)
+        self.assertEqual((bucket.score, bucket.quizzes_completed), (100, 2))
+
+        for period in PERIOD_DAYS:
+            rankings = get_period_rankings(period)
+            self.assertEqual({row['user']: row['score'] for row in rankings},
+                             self.expected(period, self.today))
+        self.assertEqual([row['user_name'] for row in get_period_rankings('monthly')], ['player', 'rival'])
+
+    def test_bucket_and_totals_are_recorded_together(self):
+        attempt = QuizAttempt.objects.create(quiz=self.quiz, user=self.user, score=40,
+                                             total_questions=5, status='completed')
+        with mock.patch('quizhubapi.utils.period_leaderboards.record_period_score',
+                        side_effect=OperationalError):
+            with self.assertRaises(OperationalError):
+                record_daily_score(attempt)
+        self.assertFalse(DailyScore.objects.filter(user=self.user, day=self.today).exists())
+
+    def test_windows_roll_by_subtracting_expired_days(self):
+        roll_period_boards(self.today)
+        for ahead in (1, 6, 25):
+            day = self.today + timedelta(days=ahead)
+            roll_period_boards(day)
+            for period in PERIOD_DAYS:
+                self.assertEqual(self.totals(period), self.expected(period, day))
+
+class QuestionSamplingTests(QuizTestCase):
+    def draw(self, seed):
+        response = self.client.get(f'/api/quizzes/{self.quiz.id}/questions/', {'seed': seed})
+        self.assertEqual(response.status_code, 200)
+        return [question['id'] for question in response.data]
+
+    def test_sample_ids_is_distinct_and_seeded(self):
+        pool = tuple(range(1000))
+        sample = sample_ids(pool, 100, seed=7)
+        self.assertEqual(len(set(sample)), 100)
+        self.assertTrue(set(sample) <= set(pool))
+        self.assertEqual(sample, sample_ids(pool, 100, seed=7))
+        self.assertEqual(sorted(sample_ids(pool[:5], 10)), list(pool[:5]))
+
+    def test_seed_reproduces_the_draw(self):
+        self.quiz.max_questions = 10
+        self.quiz.save()
+        first = self.draw(42)
+        self.assertEqual(len(first), 10)
+        self.assertEqual(first, self.draw(42))
+        self.assertNotEqual(first, self.draw(43))
+
+    def test_unapproved_questions_leave_the_pool(self):
+        self.assertEqual(len(self.draw(1)), self.QUESTION_COUNT)
+
+        question = Question.objects.get(id=next(iter(self.answers)))
+        question.status = 'pending'
+        question.save()
+
+        drawn = self.draw(1)
+        self.assertEqual(len(drawn), self.QUESTION_COUNT - 1)
+        self.assertNotIn(question.id, drawn)
+
+    def test_play_payload_hides_correct_answers(self):
+        question = self.client.get(f'/api/quizzes/{self.quiz.id}/questions/').data[0]
+        self.assertTrue(question['answers'])
+        self.assertNotIn('is_correct', question['answers'][0])
+
+    def test_warm_draw_does_not_query_per_question(self):
+        self.draw(1)
+        counts = []
+        for size in (5, self.QUESTION_COUNT):
+            self.quiz.max_questions = size
+            self.quiz.save()
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(len(self.draw(1)), size)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_answer_edits_refresh_the_bundle(self):
+        question_id, answer = next(iter(self.answers.items()))
+        self.draw(1)
+        answer.text = 'Edited'
+        answer.save()
+
+        question = next(q for q in self.client.get(f'/api/quizzes/{self.quiz.id}/questions/').data
+                        if q['id'] == question_id)
+        self.assertEqual(question['answers'][0]['text'], 'Edited')
+
+class MatchConsumerTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.quiz.max_questions = 2
+        self.quiz.save()
+        self.rival = User.objects.create_user(username='rival', email='rival@example.com', password='pass')
+        self.match = Match.objects.create(quiz=self.quiz, created_by=self.user)
+        self.players = {
+            user.id: MatchPlayer.objects.create(match=self.match, user=user).id
+            for user in (self.user, self.rival)
+        }
+
+    async def connect(self, user):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/match/{self.match.id}/')
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        self.assertEqual((await communicator.receive_json_from())['type'], 'match_state')
+        return communicator
+
+    async def receive_until(self, communicator, event_type, check=None):
+        while True:
+            message = await communicator.receive_json_from()
+            if message['type'] == event_type and (check is None or check(message['data'])):
+                return message['data']
+
+    async def test_match_is_played_in_memory(self):
+        host, rival = await self.connect(self.user), await self.connect(self.rival)
+        await host.send_json_to({'action': 'start'})
+
+        for index in range(2):
+            opened = await self.receive_until(rival, 'question_opened')
+            await self.receive_until(host, 'question_opened')
+            correct = self.answers[opened['question']['id']].id
+
+            await host.send_json_to({'action': 'answer', 'answer_id': correct})
+            await rival.send_json_to({'action': 'answer', 'answer_id': None})
+            closed = await self.receive_until(host, 'question_closed')
+            self.assertEqual(closed['index'], index)
+            self.assertEqual(closed['correct_answer_ids'], [correct])
+
+            if index == 0:
+                await host.send_json_to({'action': 'next_question'})
+
+        standings = (await self.receive_until(rival, 'match_ended'))['standings']
+        self.assertEqual([row['player_id'] for row in standings],
+                         [self.players[self.user.id], self.players[self.rival.id]])
+        # Answered at once, so close to full points for both questions
+        self.assertAlmostEqual(standings[0]['score'], 2 * MatchState.MAX_POINTS_PER_ANSWER, delta=4)
+        self.assertEqual(standings[1]['score'], 0)
+
+        await host.disconnect()
+        await rival.disconnect()
+
+        match = await Match.objects.aget(id=self.match.id)
+        self.assertEqual(match.status, 'completed')
+        winner = await MatchPlayer.objects.aget(id=self.players[self.user.id])
+        self.assertEqual((winner.score, winner.position), (standings[0]['score'], 1))
+
+    @override_settings(MATCH_QUESTION_SECONDS=0.2, MATCH_INTERMISSION_SECONDS=0.1, MATCH_TIMER_TICK=0.02)
+    async def test_server_clock_drives_the_match(self):
+        host = await self.connect(self.user)
+        await host.send_json_to({'action': 'start'})
+
+        # Nobody answers: both questions time out and the next opens by itself
+        closed = [await self.receive_until(host, 'question_closed') for _ in range(2)]
+        self.assertEqual([result['index'] for result in closed], [0, 1])
+        standings = (await self.receive_until(host, 'match_ended'))['standings']
+        self.assertEqual([row['score'] for row in standings], [0, 0])
+        await host.disconnect()
+
+    @override_settings(MATCH_QUESTION_SECONDS=0.2, MATCH_TIMER_TICK=0.02)
+    async def test_a_failing_timer_ends_the_match(self):
+        host = await self.connect(self.user)
+        await host.send_json_to({'action': 'start'})
+        await self.receive_until(host, 'question_opened')
+
+        with mock.patch('quizhubapi.utils.match_runtime.persist_progress', side_effect=OperationalError):
+            with self.assertLogs('quizhubapi.utils.match_runtime', 'ERROR'):
+                standings = (await self.receive_until(host, 'match_ended'))['standings']
+        self.assertEqual(len(standings), 2)
+        self.assertEqual((await Match.objects.aget(id=self.match.id)).status, 'completed')
+        await host.disconnect()
+
+    async def test_only_the_host_starts(self):
+        rival = await self.connect(self.rival)
+        await rival.send_json_to({'action': 'start'})
+        self.assertEqual((await rival.receive_json_from())['type'], 'error')
+        await rival.disconnect()
+
+    async def test_membership_events_are_coalesced(self):
+        host = await self.connect(self.user)
+        publish_match_event(self.match.id, 'player_joined', {'player_id': 901, 'display_name': 'a'}, key='player:901')
+        publish_match_event(self.match.id, 'player_joined', {'player_id': 902, 'display_name': 'b'}, key='player:902')
+        publish_match_event(self.match.id, 'player_left', {'player_id': 901, 'display_name': 'a'}, key='player:901')
+
+        events = (await host.receive_json_from())['data']
+        self.assertEqual([(event['type'], event['data']['player_id']) for event in events],
+                         [('player_joined', 902), ('player_left', 901)])
+        # The worker running the match applies the batch and publishes the new count
+        count = await self.receive_until(host, 'players_count')
+        self.assertEqual(count['players_count'], 3)
+        await host.disconnect()
+
+    @override_settings(CHAT_FLUSH_SECONDS=0.05, CHAT_BURST=3, CHAT_RATE=0.01)
+    async def test_chat_is_broadcast_rate_limited_and_written_in_batches(self):
+        host, rival = await self.connect(self.user), await self.connect(self.rival)
+        for i in range(4):
+            await host.send_json_to({'action': 'chat', 'message': f' hello {i} '})
+
+        received = [await self.receive_until(rival, 'chat_message') for _ in range(3)]
+        self.assertEqual([message['message'] for message in received], ['hello 0', 'hello 1', 'hello 2'])
+        self.assertEqual(received[0]['sender'], self.user.username)
+        error = await self.receive_until(host, 'error')
+        self.assertEqual(error['message'], 'You are sending messages too fast')
+
+        # A late joiner gets the recent messages from memory
+        watcher = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/match/{self.match.id}/')
+        self.assertTrue((await watcher.connect())[0])
+        self.assertEqual((await watcher.receive_json_from())['type'], 'match_state')
+        history = await watcher.receive_json_from()
+        self.assertEqual((history['type'], len(history['data'])), ('chat_history', 3))
+
+        await asyncio.sleep(0.2)
+        self.assertEqual(await LiveChat.objects.filter(match=self.match).acount(), 3)
+        for communicator in (host, rival, watcher):
+            await communicator.disconnect()
+
+    async def test_chat_is_for_players(self):
+        outsider = await User.objects.acreate(username='outsider', email='outsider@example.com')
+        watcher = await self.connect(outsider)
+        await watcher.send_json_to({'action': 'chat', 'message': 'hi'})
+        self.assertEqual((await self.receive_until(watcher, 'error'))['message'], 'Only players can chat')
+        await watcher.disconnect()
+
+    async def test_guests_are_known_by_their_token(self):
+        guest = await Guest.objects.acreate(session_id='guest-session', display_name='Kit')
+        await MatchPlayer.objects.acreate(match=self.match, guest=guest)
+
+        # A bare guest id is anyone's to type in
+        path = f'/ws/match/{self.match.id}/'
+        impostor = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'{path}?guest_id={guest.id}')
+        self.assertTrue((await impostor.connect())[0])
+        self.assertEqual((await impostor.receive_json_from())['type'], 'match_state')
+        await impostor.send_json_to({'action': 'chat', 'message': 'hi'})
+        self.assertEqual((await self.receive_until(impostor, 'error'))['message'], 'Only players can chat')
+
+        socket = WebsocketCommunicator(URLRouter(websocket_urlpatterns),
+                                       f'{path}?guest_token={make_guest_token(guest.id)}')
+        self.assertTrue((await socket.connect())[0])
+        await socket.send_json_to({'action': 'chat', 'message': 'hi'})
+        self.assertEqual((await self.receive_until(socket, 'chat_message'))['sender'], 'Kit')
+        for communicator in (impostor, socket):
+            await communicator.disconnect()
+
+    async def test_private_matches_show_only_to_members(self):
+        await Match.objects.filter(id=self.match.id).aupdate(is_private=True)
+        outsider = await User.objects.acreate(username='outsider', email='outsider@example.com')
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/match/{self.match.id}/')
+        communicator.scope['user'] = outsider
+        self.assertTrue((await communicator.connect())[0])
+        frame = await communicator.receive_json_from()
+        self.assertEqual((frame['type'], frame['data']['message']), ('error', 'This match is private'))
+        self.assertEqual((await communicator.receive_output())['type'], 'websocket.close')
+
+        # Players, including the host, still get the match
+        host = await self.connect(self.user)
+        await host.disconnect()
+
+    @override_settings(SPECTATOR_TICK=0.05)
+    async def test_spectators_get_throttled_snapshots(self):
+        host = await self.connect(self.user)
+        spectators = []
+        for _ in range(3):
+            communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns),
+                                                 f'/ws/match/{self.match.id}/watch/')
+            self.assertTrue((await communicator.connect())[0])
+            self.assertEqual((await communicator.receive_json_from())['type'], 'spectator_snapshot')
+            spectators.append(communicator)
+
+        await host.send_json_to({'action': 'start'})
+        opened = await self.receive_until(host, 'question_opened')
+        for communicator in spectators:
+            # Only snapshots reach spectators, never the events themselves
+            while True:
+                frame = await communicator.receive_json_from()
+                self.assertEqual(frame['type'], 'spectator_snapshot')
+                if frame['data']['question_open'] and frame['data']['spectators_count'] == 3:
+                    break
+            self.assertEqual(frame['data']['question']['id'], opened['question']['id'])
+        self.assertEqual(get_spectator_count(self.match.id), 3)
+
+        for communicator in spectators:
+            await communicator.disconnect()
+        await asyncio.sleep(0.3)
+        self.assertEqual(get_spectator_count(self.match.id), 0)
+        await host.disconnect()
+
+class MatchShardingTests(MatchConsumerTests):
+    """The match runs on another worker than the one holding the sockets"""
+
+    def setUp(self):
+        super().setUp()
+        self.owner = HashRing(['a', 'b']).owner(self.match.id)
+        self.proxy = 'b' if self.owner == 'a' else 'a'
+        settings = override_settings(MATCH_WORKERS=['a', 'b'], MATCH_WORKER_ID=self.proxy,
+                                     MATCH_INTERMISSION_SECONDS=0.1, MATCH_TIMER_TICK=0.02)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    async def connect(self, user):
+        if not hasattr(self, 'owner_worker'):
+            self.owner_worker = MatchWorker(self.owner, asyncio.get_running_loop())
+            await self.owner_worker.start()
+        return await super().connect(user)
+
+    def test_ring_moves_only_the_keys_of_a_new_worker(self):
+        before, after = HashRing(['a', 'b', 'c']), HashRing(['a', 'b', 'c', 'd'])
+        moved = [key for key in range(1000) if before.owner(key) != after.owner(key)]
+        self.assertTrue(all(after.owner(key) == 'd' for key in moved))
+        self.assertLess(len(moved), 400)
+
+    async def test_match_moves_when_its_owner_stops(self):
+        host, rival = await self.connect(self.user), await self.connect(self.rival)
+        proxy = await get_local_worker()
+        await host.send_json_to({'action': 'start'})
+
+        for index in range(2):
+            opened = await self.receive_until(host, 'question_opened')
+            self.assertEqual(opened['index'], index)
+            await host.send_json_to({'action': 'answer', 'answer_id': self.answers[opened['question']['id']].id})
+            await rival.send_json_to({'action': 'answer', 'answer_id': None})
+            await self.receive_until(host, 'question_closed')
+
+            if index == 0:
+                self.assertIn(self.match.id, self.owner_worker.matches)
+                self.assertNotIn(self.match.id, proxy.matches)
+                # The owner leaves between questions; the proxy resumes from the checkpoint
+                await self.owner_worker.stop()
+
+        self.assertIn(self.match.id, proxy.matches)
+        standings = (await self.receive_until(host, 'match_ended'))['standings']
+        self.assertEqual(standings[0]['player_id'], self.players[self.user.id])
+        self.assertAlmostEqual(standings[0]['score'], 2 * MatchState.MAX_POINTS_PER_ANSWER, delta=4)
+        await host.disconnect()
+        await rival.disconnect()
+
+    @override_settings(MATCH_WORKERS=['c', 'd'])
+    async def test_two_workers_share_the_ring_and_hand_off(self):
+        # Two worker instances on one channel layer, as two processes on Redis would be
+        loop, layer = asyncio.get_running_loop(), get_channel_layer()
+        workers = {name: MatchWorker(name, loop) for name in ('c', 'd')}
+        for worker in workers.values():
+            await worker.start()
+        for worker in workers.values():
+            await worker.refresh()  # Sees the other's heartbeat
+
+        ring = HashRing(['c', 'd'])
+        for worker in workers.values():
+            self.assertEqual(worker.ring.nodes, ('c', 'd'))
+            self.assertTrue(all(worker.owner_of(key) == ring.owner(key) for key in range(100)))
+        owner = workers[ring.owner(self.match.id)]
+        other = workers['d' if owner.worker_id == 'c' else 'c']
+
+        # An action reaching the other worker runs on the owner, which replies over the layer
+        socket = await layer.new_channel()
+        await other.route(self.match.id, 'connect', socket, None, {'user_id': self.user.id})
+        reply = await asyncio.wait_for(layer.receive(socket), 1)
+        self.assertEqual((reply['type'], reply['frame']['type']), ('match.reply', 'match_state'))
+        self.assertIn(self.match.id, owner.matches)
+        self.assertNotIn(self.match.id, other.matches)
+
+        # The owner stops and hands the match, with its socket, to the other
+        await owner.stop()
+        for _ in range(50):
+            if self.match.id in other.matches:
+                break
+            await asyncio.sleep(0.02)
+        self.assertEqual(other.matches[self.match.id].sockets, {socket: self.players[self.user.id]})
+        self.assertEqual(other.owner_of(self.match.id), other.worker_id)
+        await other.stop()
+
+@override_settings(MATCHMAKING_MATCH_SIZE=2, MATCHMAKING_SKILL_BAND=100, MATCHMAKING_WIDEN_SECONDS=10)
+class MatchmakingTests(QuizTestCase):
+    def test_players_pair_within_their_band_first(self):
+        queue = MatchmakingQueue()
+        for user_id, points in [(1, 10), (2, 950), (3, 20), (4, 990), (5, 500)]:
+            queue.enqueue(user_id, 'quiz:1', points, enqueued_at=0)
+        queue.cancel(4)
+
+        groups = queue.take_groups(now=1)
+        self.assertEqual([[entry.user_id for entry in group] for _, group in groups], [[1, 3]])
+        self.assertEqual(set(queue.entries), {2, 5})
+
+        # After waiting long enough the reach grows to the other band
+        self.assertEqual(queue.take_groups(now=30), [])
+        groups = queue.take_groups(now=50)
+        self.assertEqual([[entry.user_id for entry in group] for _, group in groups], [[5, 2]])
+        self.assertEqual(len(queue), 0)
+        self.assertEqual(queue.wait_percentiles((50,)), {50: 50})
+
+    def test_failed_groups_are_returned_and_release_their_codes(self):
+        Match.objects.create(quiz=self.quiz, created_by=self.user, room_code='TAKEN1')
+        cache.set(room_code_key('TAKEN1'), 0)  # Reserved again after the cache lost the match
+        empty = Category.objects.create(name='Empty')
+        rivals = User.objects.bulk_create([
+            User(username=f'rival{i}', email=f'rival{i}@example.com') for i in range(3)
+        ])
+        queue = MatchmakingQueue()
+        for user in [self.user] + rivals[:1]:
+            queue.enqueue(user.id, pool_key(quiz_id=self.quiz.id), 0, enqueued_at=0)
+        for user in rivals[1:]:
+            queue.enqueue(user.id, pool_key(category_id=empty.id), 0, enqueued_at=0)
+
+        codes = iter(['TAKEN1', 'FRESH2'])
+        with mock.patch('quizhubapi.utils.matchmaking.allocate_room_code', lambda: next(codes)):
+            created, failed = create_quick_matches(queue.take_groups(now=1))
+
+        self.assertEqual([(match['room_code'], match['user_ids']) for match in created],
+                         [('FRESH2', [self.user.id, rivals[0].id])])
+        self.assertEqual([(pool, [entry.user_id for entry in group], reason) for pool, group, reason in failed],
+                         [(f'category:{empty.id}', [rivals[1].id, rivals[2].id], 'no_quiz')])
+        self.assertIsNone(cache.get(room_code_key('TAKEN1')))
+        self.assertFalse(Match.objects.filter(quiz__isnull=True).exists())
+        self.assertEqual(Match.objects.get(room_code='FRESH2').players.count(), 2)
+
+    @override_settings(MATCHMAKING_TICK=0.05)
+    async def test_queued_players_are_put_in_a_match(self):
+        rival = await User.objects.acreate(username='rival', email='rival@example.com')
+        sockets = []
+        for user in (self.user, rival):
+            communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns),
+                                                 f'/ws/matchmaking/?quiz_id={self.quiz.id}')
+            communicator.scope['user'] = user
+            self.assertTrue((await communicator.connect())[0])
+            self.assertEqual((await communicator.receive_json_from())['type'], 'queued')
+            sockets.append(communicator)
+
+        found = [(await communicator.receive_json_from())['data'] for communicator in sockets]
+        self.assertEqual(found[0], found[1])
+        match = await Match.objects.aget(id=found[0]['match_id'])
+        self.assertEqual((match.quiz_id, match.created_by_id, match.room_code),
+                         (self.quiz.id, self.user.id, found[0]['room_code']))
+        self.assertEqual(await match.players.acount(), 2)
+        for communicator in sockets:
+            await communicator.disconnect()
+
+class MatchJoinTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.host = User.objects.create(username='host', email='host@example.com')
+        cls.users = [User.objects.create(username=f'joiner{i}', email=f'joiner{i}@example.com')
+                     for i in range(3)]
+
+    def setUp(self):
+        self.match = Match.objects.create(created_by=self.host, max_players=2)
+        self.client = APIClient()
+
+    def join(self, user):
+        self.client.force_authenticate(user)
+        return self.client.post(f'/api/matches/{self.match.id}/join/')
+
+    def test_join_claims_a_seat_in_two_statements(self):
+        with CaptureQueriesContext(connection) as queries:
+            take_seat(self.match.id, user=self.users[0])
+        statements = [q['sql'] for q in queries.captured_queries if 'SAVEPOINT' not in q['sql']]
+        self.assertEqual([sql.split()[0] for sql in statements], ['UPDATE', 'INSERT'])
+
+    def test_full_match_and_duplicate_joins_are_refused(self):
+        self.assertEqual(self.join(self.users[0]).status_code, 200)
+        response = self.join(self.users[0])
+        self.assertEqual((response.status_code, response.data['error']), (400, 'Already in this match'))
+        self.assertEqual(self.join(self.users[1]).status_code, 200)
+        response = self.join(self.users[2])
+        self.assertEqual((response.status_code, response.data['error']), (400, 'Match is full'))
+
+        self.match.refresh_from_db()
+        self.assertEqual((self.match.player_count, self.match.players.count()), (2, 2))
+
+        self.client.force_authenticate(self.users[0])
+        self.assertEqual(self.client.post(f'/api/matches/{self.match.id}/leave/').status_code, 200)
+        self.assertEqual(self.join(self.users[2]).status_code, 200)
+        self.match.refresh_from_db()
+        self.assertEqual(self.match.player_count, 2)
+
+    def test_membership_is_published_once_committed(self):
+        with mock.patch('quizhubapi.signals.publish_match_event') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                with self.assertRaises(RuntimeError), transaction.atomic():
+                    take_seat(self.match.id, user=self.users[0])
+                    raise RuntimeError
+                take_seat(self.match.id, user=self.users[1])
+        self.assertEqual([call.args[1] for call in publish.call_args_list], ['player_joined'])
+        self.assertEqual(publish.call_args.args[2]['display_name'], self.users[1].username)
+
+    def test_unknown_match(self):
+        self.assertEqual(self.join(self.users[0]).status_code, 200)
+        with self.assertRaises(SeatError) as refused:
+            take_seat(self.match.id + 1, user=self.users[1])
+        self.assertEqual(refused.exception.status_code, 404)
+
+class RoomCodeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.host = User.objects.create(username='host', email='host@example.com')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_codes_are_short_and_resolved_without_the_database(self):
+        match = Match.objects.create(created_by=self.host)
+        self.assertEqual(len(match.room_code), 6)
+        self.assertTrue(set(match.room_code) <= set(ALPHABET))
+        with self.assertNumQueries(0):
+            self.assertEqual(lookup_room_code(f' {match.room_code.lower()} '), match.id)
+
+        # A flushed map falls back to the database once
+        cache.clear()
+        with self.assertNumQueries(1):
+            self.assertEqual(lookup_room_code(match.room_code), match.id)
+        with self.assertNumQueries(0):
+            lookup_room_code(match.room_code)
+
+    def test_a_code_held_by_a_forgotten_match_is_not_reissued(self):
+        held = Match.objects.create(created_by=self.host)
+        cache.clear()
+        codes = iter([held.room_code, 'ABCDEF'])
+        with mock.patch('quizhubapi.utils.room_codes.allocate_room_code', side_effect=lambda: next(codes)):
+            match = Match.objects.create(created_by=self.host)
+        self.assertEqual(match.room_code, 'ABCDEF')
+
+    def test_ending_a_match_frees_its_code(self):
+        match = Match.objects.create(created_by=self.host)
+        code = match.room_code
+        match.end_match()
+
+        self.assertIsNone(lookup_room_code(code))
+        self.assertIsNone(cache.get(room_code_key(code)))
+        self.assertIsNone(Match.objects.get(id=match.id).room_code)
+
+        client = APIClient()
+        client.force_authenticate(self.host)
+        response = client.post('/api/matches/join-by-code/', {'room_code': code})
+        self.assertEqual(response.status_code, 404)
+
+    def test_join_by_code(self):
+        match = Match.objects.create(created_by=self.host)
+        client = APIClient()
+        response = client.post('/api/matches/join-by-code/',
+                               {'room_code': match.room_code.lower(), 'guest_name': 'Visitor'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['match']['players_count'], 1)
+        # The token names the new guest on the match socket
+        guest = match.players.get().guest
+        self.assertEqual(read_guest_token(response.data['guest_token']), guest.id)
+        self.assertIsNone(read_guest_token(response.data['guest_token'] + 'x'))
+
+class MatchJoinStressTests(TransactionTestCase):
+    JOINERS = 24
+
+    def test_concurrent_joins_never_overfill(self):
+        host = User.objects.create(username='host', email='host@example.com')
+        users = User.objects.bulk_create([User(username=f'joiner{i}', email=f'joiner{i}@example.com')
+                                          for i in range(self.JOINERS)])
+        match = Match.objects.create(created_by=host, max_players=4)
+
+        start = threading.Barrier(self.JOINERS)
+        outcomes = []
+
+        def join(user):
+            start.wait()
+            try:
+                while True:
+                    try:
+                        take_seat(match.id, user=user)
+                        outcomes.append('joined')
+                        return
+                    except SeatError as e:
+                        outcomes.append(str(e))
+                        return
+                    except OperationalError:
+                        # The shared in-memory test database reports a table lock
+                        # instead of waiting for it like a database file does
+                        time.sleep(0.001)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=join, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        match.refresh_from_db()
+        self.assertEqual(outcomes.count('joined'), 4)
+        self.assertEqual(outcomes.count('Match is full'), self.JOINERS - 4)
+        self.assertEqual((match.player_count, match.players.count()), (4, 4))
+
+class WordFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', email='admin@example.com', role='admin')
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(invalidate_word_filter)
+
+    def test_substring_exact_and_phrase_matches(self):
+        word_filter = WordFilter([('darn', False), ('heck', True), ('oh no', True), ('he', False)])
+        self.assertEqual(word_filter.censor('Darnit, HECK! What the heckle?'), '****it, ****! What t** **ckle?')
+        self.assertTrue(word_filter.contains('well OH NO'))
+        self.assertFalse(word_filter.contains('oh none'))
+        self.assertEqual(list(WordFilter([('ab', False), ('b', False)]).spans('xab')), [(1, 3), (2, 3)])
+
+    def test_filter_is_rebuilt_when_the_table_changes(self):
+        self.assertFalse(get_word_filter().contains('frak'))
+        BannedWord.objects.create(word='frak', banned_by=self.admin)
+        self.assertTrue(get_word_filter().contains('what the frak'))
+
+    def test_content_and_usernames_are_checked(self):
+        BannedWord.objects.create(word='frak', is_exact_match=True, banned_by=self.admin)
+        response = APIClient().post('/api/auth/register/', {
+            'username': 'frak', 'email': 'frak@example.com', 'password': 'pass12345',
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('username', response.data)
+
+        topic = Topic.objects.create(category=Category.objects.create(name='Misc'), name='Misc', difficulty=1)
+        serializer = QuestionSerializer(data={
+            'text': 'Who said frak?', 'type': 'multiple_choice', 'difficulty': 1, 'topic': topic.id,
+            'created_by': self.admin.id, 'answers': [{'text': 'Frak!', 'is_correct': True, 'order': 0}],
+        })
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(set(serializer.errors), {'text', 'answers'})
+
+class QueryBudgetTests(TestCase):
+    """List endpoints run a fixed number of queries, however many rows they show"""
+
+    BUDGETS = {
+        '/api/categories/': 1,
+        '/api/topics/': 2,  # Page count and page
+        '/api/quizzes/': 2,
+        '/api/matches/': 3,  # And the players of the page
+        '/api/users/': 2,
+        '/api/users/leaderboard/': 1,
+    }
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='budget', email='budget@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.rows = 0
+
+    def add_rows(self, count):
+        first = self.rows
+        self.rows += count
+        users = User.objects.bulk_create([
+            User(username=f'budget{i}', email=f'budget{i}@example.com') for i in range(first, self.rows)
+        ])
+        categories = Category.objects.bulk_create([Category(name=f'Category {i}') for i in range(first, self.rows)])
+        topics = Topic.objects.bulk_create([
+            Topic(category=category, name=f'Topic {i}', difficulty=1, is_active=i < 2)
+            for category in categories for i in range(3)
+        ])
+        questions = Question.objects.bulk_create([
+            Question(text='Question', type='multiple_choice', difficulty=1, topic=topic, status=status,
+                     created_by=self.user)
+            for topic in topics for status in ('approved', 'pending')
+        ])
+        quizzes = Quiz.objects.bulk_create([
+            Quiz(title='Quiz', category=category, created_by=user) for category, user in zip(categories, users)
+        ])
+        Quiz.questions.through.objects.bulk_create([
+            Quiz.questions.through(quiz=quiz, question=question)
+            for quiz in quizzes for question in questions[:3]
+        ])
+        matches = Match.objects.bulk_create([Match(created_by=user, player_count=2) for user in users])
+        MatchPlayer.objects.bulk_create([
+            MatchPlayer(match=match, user=user) for match in matches for user in (self.user, match.created_by)
+        ])
+        Follow.objects.bulk_create([Follow(follower=user, following=self.user) for user in users])
+        for friendship in Friendship.objects.bulk_create([
+            Friendship(user1=self.user, user2=user, status='accepted') for user in users[::2]
+        ]):
+            sync_friend_edges(friendship)
+        reconcile_counters()  # Bulk writes skip the signals that keep counters and edges
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.data
+
+    def test_queries_do_not_grow_with_the_page(self):
+        for rows in (2, 30):  # A few rows, then more than a full page
+            self.add_rows(rows)
+            for url, budget in self.BUDGETS.items():
+                with self.subTest(url=url, rows=self.rows):
+                    self.assertEqual(self.count_queries(url)[0], budget)
+
+    def test_listed_counts_are_right(self):
+        self.add_rows(4)
+        _, data = self.count_queries('/api/users/')
+        me = next(row for row in data['results'] if row['id'] == self.user.id)
+        self.assertEqual((me['followers_count'], me['following_count'], me['friends_count']), (4, 0, 2))
+
+        _, data = self.count_queries('/api/categories/')
+        self.assertEqual({row['topics_count'] for row in data}, {2})
+        category = Category.objects.get(id=data[0]['id'])
+        self.assertEqual(CategorySerializer(category).data['topics_count'], 2)  # Counted without the annotation
+        _, data = self.count_queries('/api/topics/')
+        self.assertEqual({row['questions_count'] for row in data['results']}, {1})
+        _, data = self.count_queries('/api/quizzes/')
+        self.assertEqual({row['questions_count'] for row in data['results']}, {3})
+
+@override_settings(NOTIFICATION_QUEUE='thread', NOTIFICATION_ALLOW_THREAD=True)
+class CounterTests(TestCase):
+    def setUp(self):
+        self.user, self.other = User.objects.bulk_create([
+            User(username='counted', email='counted@example.com'),
+            User(username='counter', email='counter@example.com'),
+        ])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def counters(self, user):
+        user.refresh_from_db()
+        return user.followers_count, user.following_count, user.friends_count
+
+    def test_social_views_move_the_counters(self):
+        stale = User.objects.get(id=self.other.id)
+        self.client.post(f'/api/social/follow/{self.other.id}/')
+        self.client.post('/api/social/send-friend-request/', {'receiver_id': self.other.id})
+        self.client.force_authenticate(self.other)
+        request_id = self.other.received_requests.get().id
+        self.client.post(f'/api/social/respond-friend-request/{request_id}/', {'action': 'accept'})
+        self.assertEqual((self.counters(self.user), self.counters(self.other)), ((0, 1, 1), (1, 0, 1)))
+
+        # Saving an instance loaded before the follow leaves its counters alone
+        stale.points = 10
+        stale.save()
+        self.assertEqual(self.counters(self.other), (1, 0, 1))
+
+        self.client.force_authenticate(self.user)
+        self.client.post(f'/api/social/unfollow/{self.other.id}/')
+        self.assertEqual((self.counters(self.user), self.counters(self.other)), ((0, 0, 1), (0, 0, 1)))
+
+    def test_friendship_status_changes_move_the_counters(self):
+        friendship = Friendship.objects.create(user1=self.user, user2=self.other)
+        self.assertEqual((self.counters(self.user)[2], self.counters(self.other)[2]), (0, 0))
+
+        friendship.status = 'accepted'
+        friendship.save()
+        self.assertEqual((self.counters(self.user)[2], self.counters(self.other)[2]), (1, 1))
+        friendship.save()  # Saving again without a change
+        self.assertEqual((self.counters(self.user)[2], self.counters(self.other)[2]), (1, 1))
+
+        friendship.status = 'blocked'
+        friendship.save(update_fields=['status'])
+        self.assertEqual((self.counters(self.user)[2], self.counters(self.other)[2]), (0, 0))
+        self.assertEqual(sum(reconcile_counters(fix=False).values()), 0)
+
+    def test_quiz_question_counter_follows_the_m2m(self):
+        category = Category.objects.create(name='Counted')
+        topic = Topic.objects.create(category=category, name='Counted', difficulty=1)
+        questions = Question.objects.bulk_create([
+            Question(text=f'Question {i}', type='multiple_choice', difficulty=1, topic=topic,
+                     created_by=self.user) for i in range(4)
+        ])
+        quiz, other = [Quiz.objects.create(title=title, category=category, created_by=self.user)
+                       for title in ('Quiz', 'Other')]
+
+        def count(quiz):
+            return Quiz.objects.values_list('questions_count', flat=True).get(id=quiz.id)
+
+        quiz.questions.add(*questions[:3])
+        quiz.questions.add(questions[0])
+        self.assertEqual(count(quiz), 3)
+        quiz.questions.remove(questions[0], questions[3])  # One of them was never in the quiz
+        self.assertEqual(count(quiz), 2)
+        questions[3].quiz_set.add(quiz, other)
+        self.assertEqual((count(quiz), count(other)), (3, 1))
+        questions[3].quiz_set.clear()
+        self.assertEqual((count(quiz), count(other)), (2, 0))
+        questions[1].delete()
+        self.assertEqual(count(quiz), 1)
+        quiz.questions.clear()
+        self.assertEqual(count(quiz), 0)
+
+    def test_reconcile_repairs_drift(self):
+        Follow.objects.bulk_create([Follow(follower=self.user, following=self.other)])
+        User.objects.filter(id=self.user.id).update(friends_count=5)
+        self.assertEqual(reconcile_counters(fix=False), {
+            'User.followers_count': 1, 'User.following_count': 1, 'User.friends_count': 1,
+            'Quiz.questions_count': 0, 'Match.player_count': 0,
+        })
+
+        output = io.StringIO()
+        call_command('reconcile_counters', stdout=output)
+        self.assertIn('Repaired 3 drifted counters', output.getvalue())
+        self.assertEqual((self.counters(self.user), self.counters(self.other)), ((0, 1, 0), (1, 0, 0)))
+        self.assertEqual(sum(reconcile_counters(fix=False).values()), 0)
+
+    def test_pair_befriended_both_ways_counts_once(self):
+        Friendship.objects.bulk_create([
+            Friendship(user1=self.user, user2=self.other, status='accepted'),
+            Friendship(user1=self.other, user2=self.user, status='accepted'),
+        ])
+        # The backfill of the friend edges and counters, run over both rows
+        import_module('quizhubapi.migrations.0010_friend_edges').link_friends(django_apps, None)
+        self.assertEqual(FriendEdge.objects.count(), 2)
+        self.assertEqual((self.counters(self.user)[2], self.counters(self.other)[2]), (1, 1))
+        self.assertEqual(sum(reconcile_counters(fix=False).values()), 0)
+
+        User.objects.filter(id__in=[self.user.id, self.other.id]).update(friends_count=2)
+        self.assertEqual(reconcile_counters()['User.friends_count'], 2)
+        self.assertEqual((self.counters(self.user)[2], self.counters(self.other)[2]), (1, 1))
+
+class FriendGraphTests(TestCase):
+    def setUp(self):
+        self.a, self.b, self.c, self.d = User.objects.bulk_create([
+            User(username=name, email=f'{name}@example.com') for name in 'abcd'
+        ])
+        for user1, user2 in ((self.a, self.b), (self.c, self.a), (self.b, self.c)):
+            Friendship.objects.create(user1=user1, user2=user2, status='accepted')
+        Friendship.objects.create(user1=self.a, user2=self.d)  # Pending
+        self.client = APIClient()
+        self.client.force_authenticate(self.a)
+
+    def test_friend_list_is_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/social/friends/')
+        self.assertEqual(sorted(row['friend']['username'] for row in response.data), ['b', 'c'])
+        self.assertEqual({row['status'] for row in response.data}, {'accepted'})
+
+    def test_lookups_read_edges_from_either_side(self):
+        self.assertTrue(are_friends(self.a.id, self.c.id))
+        self.assertTrue(are_friends(self.c.id, self.a.id))
+        self.assertFalse(are_friends(self.a.id, self.d.id))
+        with self.assertNumQueries(1):
+            self.assertEqual(mutual_friends(self.a.id, self.b.id), [self.c])
+        response = self.client.get(f'/api/social/mutual-friends/{self.c.id}/')
+        self.assertEqual([row['username'] for row in response.data], ['b'])
+        self.assertNotIn('email', response.data[0])
+
+        response = self.client.post('/api/social/send-friend-request/', {'receiver_id': self.b.id})
+        self.assertEqual(response.data, {'error': 'Already friends'})
+
+    def test_edges_follow_the_friendship(self):
+        friendship = Friendship.objects.get(user1=self.a, user2=self.b)
+        friendship.status = 'blocked'
+        friendship.save()
+        self.assertFalse(are_friends(self.b.id, self.a.id))
+        Friendship.objects.filter(user1=self.c).delete()
+        self.assertEqual(list(FriendEdge.objects.values_list('user__username', 'friend__username')
+                              .order_by('user__username')), [('b', 'c'), ('c', 'b')])
+
+
+class FriendSuggestionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = {user.username: user for user in User.objects.bulk_create([
+            User(username=name, email=f'{name}@example.com') for name in 'abcdef'
+        ])}
+        for names in ('ab', 'ac', 'bd', 'cd', 'be', 'cf'):
+            Friendship.objects.create(user1=self.users[names[0]], user2=self.users[names[1]],
+                                      status='accepted')
+        category = Category.objects.create(name='Science')
+        quiz = Quiz.objects.create(title='Physics', category=category, created_by=self.users['a'])
+        for name in 'af':
+            QuizAttempt.objects.create(quiz=quiz, user=self.users[name], total_questions=1)
+        self.client = APIClient()
+        self.client.force_authenticate(self.users['a'])
+
+    def test_graph_ranks_friends_of_friends(self):
+        graph = FriendGraph([(1, 2), (1, 3), (2, 1), (2, 4), (3, 1), (3, 4), (3, 5), (4, 2), (4, 3),
+                             (5, 3)], {1: 0b11, 5: 0b10})
+        self.assertEqual(list(graph.friends(3)), [1, 4, 5])
+        self.assertEqual(list(graph.friends(99)), [])
+        self.assertEqual(graph.suggest(1), [(4, 2, 0), (5, 1, 1)])
+        self.assertEqual(graph.suggest(1, limit=1), [(4, 2, 0)])
+
+    def test_endpoint_serves_the_cached_ranking(self):
+        self.assertEqual(self.client.get('/api/social/suggestions/').data, [])
+        update_friend_suggestions()
+        response = self.client.get('/api/social/suggestions/')
+        self.assertEqual([(row['user']['username'], row['mutual_friends'], row['shared_categories'])
+                          for row in response.data], [('d', 2, 0), ('f', 1, 1), ('e', 1, 0)])
+        self.assertEqual(set(response.data[0]['user']), {'id', 'username', 'profile_image'})
+
+        # New friends drop out before the next run
+        Friendship.objects.create(user1=self.users['a'], user2=self.users['d'], status='accepted')
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/social/suggestions/')
+        self.assertEqual([row['user']['username'] for row in response.data], ['f', 'e'])
+
+
+@override_settings(NOTIFICATION_QUEUE='thread', NOTIFICATION_ALLOW_THREAD=True)
+class NotificationFanOutTests(TransactionTestCase):
+    def setUp(self):
+        self.actor = User.objects.create(username='actor', email='actor@example.com')
+        self.followers = User.objects.bulk_create([
+            User(username=f'follower{i}', email=f'follower{i}@example.com') for i in range(250)
+        ])
+        Follow.objects.bulk_create([Follow(follower=user, following=self.actor) for user in self.followers])
+
+    @override_settings(NOTIFICATION_BATCH_SIZE=100)
+    def test_requests_only_enqueue_the_fan_out(self):
+        with self.assertNumQueries(0):
+            notify_followers([self.actor.id], type='friend_playing', title='Friend Playing',
+                             message='actor is playing')
+        wait_for_notifications(timeout=10)
+        self.assertEqual(Notification.objects.filter(type='friend_playing').count(), 250)
+
+        # Pages of followers and their bulk inserts, whatever the audience size
+        event = {'audience': 'followers', 'user_ids': [self.actor.id], 'type': 'friend_playing',
+                 'title': 'Friend Playing', 'message': 'actor is playing', 'data': {}}
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(deliver_notifications(event), 250)
+        statements = [query['sql'].split()[0] for query in queries.captured_queries]
+        self.assertEqual([verb for verb in statements if verb not in ('BEGIN', 'COMMIT')],
+                         ['SELECT', 'INSERT'] * 3)
+
+    def test_views_notify_through_the_queue(self):
+        client = APIClient()
+        client.force_authenticate(self.followers[0])
+        client.post('/api/social/send-friend-request/', {'receiver_id': self.actor.id})
+        wait_for_notifications(timeout=10)
+        self.assertEqual(list(Notification.objects.values_list('user__username', 'type')),
+                         [('actor', 'friend_request')])
+
+        with override_settings(NOTIFICATION_QUEUE='celery'), \
+                mock.patch('quizhubapi.tasks.deliver_notifications_task.delay') as delay:
+            client.post(f'/api/social/follow/{self.followers[1].id}/')
+        delay.assert_called_once()
+        self.assertEqual(delay.call_args[0][0]['user_ids'], [self.followers[1].id])
+
+    @override_settings(NOTIFICATION_ALLOW_THREAD=False)
+    def test_production_refuses_the_thread_pool(self):
+        with self.assertRaises(ImproperlyConfigured):
+            notify_followers([self.actor.id], type='friend_playing', title='Friend Playing',
+                             message='actor is playing')
+        with override_settings(NOTIFICATION_QUEUE='celery'), \
+                mock.patch('quizhubapi.tasks.deliver_notifications_task.delay') as delay:
+            notify_followers([self.actor.id], type='friend_playing', title='Friend Playing',
+                             message='actor is playing')
+        delay.assert_called_once()
+
+    async def test_notifications_are_pushed_to_sockets(self):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/notifications/')
+        communicator.scope['user'] = self.followers[0]
+        self.assertTrue((await communicator.connect())[0])
+
+        event = {'audience': 'followers', 'user_ids': [self.actor.id], 'type': 'friend_playing',
+                 'title': 'Friend Playing', 'message': 'actor is playing', 'data': {'match_id': 1}}
+        await sync_to_async(deliver_notifications)(event)
+        frame = await communicator.receive_json_from()
+        self.assertEqual((frame['type'], frame['data']['message'], frame['data']['data']),
+                         ('notification', 'actor is playing', {'match_id': 1}))
+        await communicator.disconnect()
@@ -0,0 +1,86 @@
+# quizhubapi/utils/broadcast.py
+import asyncio
+import logging
+import threading
+import weakref
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+class BroadcastDispatcher:
+    """Coalesce group events and send them as one message per group.
+
+    Events published within MATCH_BROADCAST_WINDOW seconds of the first
+    pending event of a group are sent together as a ``match_events``
+    message. An event published again under the same key replaces the
+    pending one, so a burst of updates to the same thing costs one send.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.pending = {}  # group -> {key: event}
+
+    def publish(self, group, event_type, data, key=None):
+        """Queue an event; safe to call from any thread"""
+        event = {'type': event_type, 'data': data}
+        key = key or id(event)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            self._add(group, key, event)
+        else:
+            self.loop.call_soon_threadsafe(self._add, group, key, event)
+
+    def _add(self, group, key, event):
+        events = self.pending.get(group)
+        if events is None:
+            events = self.pending[group] = {}
+            self.loop.call_later(getattr(settings, 'MATCH_BROADCAST_WINDOW', 0.03), self._flush, group)
+        # Re-queued events move to the end so the batch keeps the latest order
+        events.pop(key, None)
+        events[key] = event
+
+    def _flush(self, group):
+        events = self.pending.pop(group, None)
+        if events:
+            self.loop.create_task(self._send(group, list(events.values())))
+
+    async def _send(self, group, events):
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        try:
+            await channel_layer.group_send(group, {'type': 'match_events', 'group': group, 'events': events})
+        except Exception:
+            logger.exception('Failed to broadcast %d events to %s', len(events), group)
+
+_dispatchers = weakref.WeakKeyDictionary()
+_background = None
+_background_lock = threading.Lock()
+
+def _background_dispatcher():
+    # Sync callers (views, signals) hand events to a loop in a daemon thread
+    global _background
+    with _background_lock:
+        if _background is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='match-broadcast', daemon=True).start()
+            _background = BroadcastDispatcher(loop)
+    return _background
+
+def get_dispatcher():
+    """Return the dispatcher of the running event loop, or the background one"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return _background_dispatcher()
+    dispatcher = _dispatchers.get(loop)
+    if dispatcher is None:
+        dispatcher = _dispatchers[loop] = BroadcastDispatcher(loop)
+    return dispatcher
+
+def publish_match_event(match_id, event_type, data, key=None):
+    get_dispatcher().publish(f'match_{match_id}', event_type, data, key)
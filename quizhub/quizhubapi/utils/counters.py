@@ -0,0 +1,63 @@
+# quizhubapi/utils/counters.py
+from django.db.models import F
+from ..models import User, Quiz, Match, MatchPlayer, Follow, FriendEdge
+from .counts import subquery_count
+
+# Counter columns: counts read on every profile, quiz and match, kept in the
+# row instead of counted from a growing table. They only ever move by F()
+# updates, so concurrent changes add up instead of overwriting each other
+# (models.counters.CounterFieldsMixin keeps full saves off them). Bulk
+# writes bypass the signals that drive them; ``reconcile_counters`` repairs
+# whatever drifted.
+
+def bump(model, ids, **deltas):
+    """Add ``deltas`` to counter columns of the rows ``ids`` in one UPDATE"""
+    model.objects.filter(pk__in=ids).update(**{column: F(column) + delta for column, delta in deltas.items()})
+
+def count_follow(follow, delta):
+    bump(User, [follow.follower_id], following_count=delta)
+    bump(User, [follow.following_id], followers_count=delta)
+
+def count_friendship(friendship, delta):
+    if friendship.status == 'accepted':
+        bump(User, [friendship.user1_id, friendship.user2_id], friends_count=delta)
+
+def count_friendship_status(friendship, old_status):
+    """Move friend counters when a saved friendship enters or leaves 'accepted'"""
+    was_accepted, is_accepted = old_status == 'accepted', friendship.status == 'accepted'
+    if old_status is not None and was_accepted != is_accepted:
+        bump(User, [friendship.user1_id, friendship.user2_id], friends_count=1 if is_accepted else -1)
+
+def count_question_removed(question_id):
+    """The question is leaving every quiz that holds it"""
+    bump(Quiz, Quiz.questions.through.objects.filter(question_id=question_id).values('quiz_id'),
+         questions_count=-1)
+
+# (model, counter column) -> expression of its true value
+COUNTERS = {
+    (User, 'followers_count'): lambda: subquery_count(Follow.objects.all(), 'following'),
+    (User, 'following_count'): lambda: subquery_count(Follow.objects.all(), 'follower'),
+    # One edge per friend, however many friendships the pair has
+    (User, 'friends_count'): lambda: subquery_count(FriendEdge.objects.all(), 'user'),
+    (Quiz, 'questions_count'): lambda: subquery_count(Quiz.questions.through.objects.all(), 'quiz'),
+    (Match, 'player_count'): lambda: subquery_count(MatchPlayer.objects.all(), 'match'),
+}
+
+def recount(model, column, ids):
+    """Set a counter of the rows ``ids`` from its table, for changes of unknown size"""
+    model.objects.filter(pk__in=ids).update(**{column: COUNTERS[model, column]()})
+
+def reconcile_counters(fix=True, batch_size=500):
+    """Find rows whose counters disagree with their tables and, with ``fix``, rewrite them.
+
+    Returns the number of drifted rows per ``Model.column``.
+    """
+    drifted = {}
+    for (model, column), actual in COUNTERS.items():
+        ids = list(model.objects.annotate(actual=actual()).exclude(**{column: F('actual')})
+                   .values_list('pk', flat=True))
+        drifted[f'{model.__name__}.{column}'] = len(ids)
+        if fix:
+            for start in range(0, len(ids), batch_size):
+                model.objects.filter(pk__in=ids[start:start + batch_size]).update(**{column: actual()})
+    return drifted
@@ -0,0 +1,30 @@
+# quizhubapi/utils/counts.py
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from ..models import Topic, Question
+
+# List endpoints annotate the counts their serializers show, so a page costs
+# the same number of queries whatever its size. Each count is a correlated
+# subquery rather than a JOIN + GROUP BY, so several counts on one row don't
+# multiply each other and select_related columns need no grouping.
+# Serializers read them through ``annotated_count``, which only counts per
+# object for rows fetched without the annotation. Counts shown on every
+# profile, quiz and match are counter columns instead (utils/counters.py).
+
+def subquery_count(queryset, field):
+    """Rows of ``queryset`` whose ``field`` points at the outer row"""
+    counted = queryset.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(
+        count=Count('pk')
+    ).values('count')
+    return Coalesce(Subquery(counted, output_field=IntegerField()), Value(0))
+
+def annotated_count(obj, name, count):
+    """The ``name`` annotation of ``obj``, or ``count()`` when it was fetched without it"""
+    value = getattr(obj, name, None)
+    return count() if value is None else value
+
+def with_topic_counts(categories):
+    return categories.annotate(topics_count=subquery_count(Topic.objects.filter(is_active=True), 'category'))
+
+def with_question_counts(topics):
+    return topics.annotate(questions_count=subquery_count(Question.objects.filter(status='approved'), 'topic'))
@@ -0,0 +1,99 @@
+# quizhubapi/utils/friend_suggestions.py
+import heapq
+from array import array
+from collections import Counter
+from django.conf import settings
+from django.core.cache import cache
+from ..models import FriendEdge, QuizAttempt
+
+def suggestions_key(user_id):
+    return f'friend_suggestions:{user_id}'
+
+class FriendGraph:
+    """The friend graph as compressed sparse rows of user ids.
+
+    The friends of user ``u`` are ``neighbors[offsets[u]:offsets[u + 1]]``,
+    sorted; a million edges take 8 MB. Mutual friends of ``u`` with everyone
+    two hops away come from one Counter pass over its friends' rows, which
+    runs in C, instead of a join per candidate. ``categories`` maps a user to
+    a bitmask of the quiz categories they played.
+    """
+
+    def __init__(self, edges, categories=None):
+        # ``edges`` are (user id, friend id) pairs sorted by user id, as the
+        # (user, friend) index returns them
+        self.neighbors = array('q')
+        degrees = Counter()
+        for user_id, friend_id in edges:
+            self.neighbors.append(friend_id)
+            degrees[user_id] += 1
+
+        size = max(degrees, default=-1) + 2
+        self.offsets = array('q', bytes(8 * size))
+        for user_id in range(1, size):
+            self.offsets[user_id] = self.offsets[user_id - 1] + degrees.get(user_id - 1, 0)
+        self.users = sorted(degrees)
+        self.categories = categories or {}
+
+    def __len__(self):
+        return len(self.neighbors)
+
+    def friends(self, user_id):
+        if user_id + 1 >= len(self.offsets):
+            return array('q')
+        return self.neighbors[self.offsets[user_id]:self.offsets[user_id + 1]]
+
+    def shared_categories(self, user_id, other_id):
+        return bin(self.categories.get(user_id, 0) & self.categories.get(other_id, 0)).count('1')
+
+    def suggest(self, user_id, limit=20, category_weight=0.5):
+        """Return up to ``limit`` (user id, mutual friends, shared categories), best first.
+
+        Candidates are friends of friends, shortlisted by mutual friends and
+        then ranked by mutual friends plus ``category_weight`` per quiz
+        category both played.
+        """
+        friends = self.friends(user_id)
+        mutual = Counter()
+        for friend_id in friends:
+            mutual.update(self.friends(friend_id))
+        del mutual[user_id]
+        for friend_id in friends:
+            del mutual[friend_id]
+
+        mine = self.categories.get(user_id, 0)
+        categories = self.categories
+        scored = []
+        for other_id, count in mutual.most_common(limit * 4):
+            shared = bin(mine & categories.get(other_id, 0)).count('1') if mine else 0
+            scored.append((count + category_weight * shared, -other_id, count, shared))
+        return [(-negated_id, count, shared)
+                for _, negated_id, count, shared in heapq.nlargest(limit, scored)]
+
+def load_friend_graph():
+    edges = FriendEdge.objects.order_by('user_id', 'friend_id').values_list('user_id', 'friend_id')
+    categories = {}
+    played = QuizAttempt.objects.filter(user__isnull=False).values_list('user_id', 'quiz__category_id').distinct()
+    for user_id, category_id in played.iterator(chunk_size=10000):
+        categories[user_id] = categories.get(user_id, 0) | 1 << category_id
+    return FriendGraph(edges.iterator(chunk_size=10000), categories)
+
+def update_friend_suggestions(graph=None):
+    """Rank suggestions for every user with friends and cache them; returns the graph"""
+    graph = graph or load_friend_graph()
+    limit = getattr(settings, 'FRIEND_SUGGESTIONS_LIMIT', 20)
+    weight = getattr(settings, 'FRIEND_SUGGESTION_CATEGORY_WEIGHT', 0.5)
+    timeout = getattr(settings, 'FRIEND_SUGGESTIONS_TIMEOUT', 172800)
+
+    batch = {}
+    for user_id in graph.users:
+        batch[suggestions_key(user_id)] = graph.suggest(user_id, limit, weight)
+        if len(batch) >= 1000:
+            cache.set_many(batch, timeout)
+            batch = {}
+    if batch:
+        cache.set_many(batch, timeout)
+    return graph
+
+def get_friend_suggestions(user_id):
+    return cache.get(suggestions_key(user_id), [])
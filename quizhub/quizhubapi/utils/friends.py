@@ -0,0 +1,30 @@
+# quizhubapi/utils/friends.py
+from ..models import FriendEdge
+
+def sync_friend_edges(friendship):
+    """Give an accepted friendship its two edges, and take them away otherwise"""
+    if friendship.status != 'accepted':
+        FriendEdge.objects.filter(friendship=friendship).delete()
+        return
+    FriendEdge.objects.bulk_create([
+        FriendEdge(user_id=user_id, friend_id=friend_id, friendship=friendship,
+                   created_at=friendship.created_at)
+        for user_id, friend_id in ((friendship.user1_id, friendship.user2_id),
+                                   (friendship.user2_id, friendship.user1_id))
+    ], ignore_conflicts=True)
+
+def are_friends(user_id, other_id):
+    return FriendEdge.objects.filter(user_id=user_id, friend_id=other_id).exists()
+
+def friend_edges(user_id):
+    """A user's friends, with the friend rows, in one query"""
+    return FriendEdge.objects.filter(user_id=user_id).select_related('friend', 'friendship').order_by(
+        '-created_at'
+    )
+
+def mutual_friends(user_id, other_id):
+    """Friends two users share, in one query over the edge index"""
+    shared = FriendEdge.objects.filter(user_id=other_id).values('friend_id')
+    return [edge.friend for edge in FriendEdge.objects.filter(
+        user_id=user_id, friend_id__in=shared
+    ).select_related('friend').order_by('friend__username')]
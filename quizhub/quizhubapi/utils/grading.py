@@ -0,0 +1,57 @@
+# quizhubapi/utils/grading.py
+from django.conf import settings
+from django.core.cache import cache
+from ..models import Answer, Quiz
+
+def _answer_key_cache_key(quiz_id):
+    return f'answer_key:{quiz_id}'
+
+def build_answer_key(quiz_id):
+    """Map each question of the quiz to (answer ids, bitmask of the correct ones)"""
+    answer_ids = {question_id: [] for question_id in Quiz.questions.through.objects.filter(
+        quiz_id=quiz_id
+    ).values_list('question_id', flat=True)}
+    masks = dict.fromkeys(answer_ids, 0)
+
+    rows = Answer.objects.filter(question_id__in=answer_ids).order_by(
+        'question_id', 'id'
+    ).values_list('question_id', 'id', 'is_correct')
+    for question_id, answer_id, is_correct in rows:
+        if is_correct:
+            masks[question_id] |= 1 << len(answer_ids[question_id])
+        answer_ids[question_id].append(answer_id)
+
+    return {
+        question_id: (tuple(ids), masks[question_id])
+        for question_id, ids in answer_ids.items()
+    }
+
+def get_answer_key(quiz_id):
+    """Return the quiz's answer key, building it on a cache miss"""
+    key = cache.get(_answer_key_cache_key(quiz_id))
+    if key is None:
+        key = build_answer_key(quiz_id)
+        cache.set(_answer_key_cache_key(quiz_id), key, getattr(settings, 'ANSWER_KEY_CACHE_TIMEOUT', 3600))
+    return key
+
+def invalidate_answer_keys(quiz_ids):
+    cache.delete_many([_answer_key_cache_key(quiz_id) for quiz_id in quiz_ids])
+
+def invalidate_question_answer_keys(question_id):
+    """Drop the answer keys of every quiz that uses the question"""
+    invalidate_answer_keys(Quiz.questions.through.objects.filter(
+        question_id=question_id
+    ).values_list('quiz_id', flat=True))
+
+def is_valid_answer(answer_key, question_id, answer_id):
+    return answer_id in answer_key[question_id][0]
+
+def is_correct_answer(answer_key, question_id, answer_id):
+    """Grade one selection against the key; no selection counts as wrong"""
+    if answer_id is None:
+        return False
+    answer_ids, correct_mask = answer_key[question_id]
+    try:
+        return bool(correct_mask >> answer_ids.index(answer_id) & 1)
+    except ValueError:
+        return False
@@ -0,0 +1,21 @@
+# quizhubapi/utils/guest_tokens.py
+from django.conf import settings
+from django.core import signing
+
+SALT = 'quizhubapi.guest'
+
+def make_guest_token(guest_id):
+    """Sign a guest id for the client that created the guest.
+
+    Guests have no login, so sockets name their guest with this token;
+    a bare id could be anyone's.
+    """
+    return signing.dumps(guest_id, salt=SALT)
+
+def read_guest_token(token):
+    """Return the guest id ``token`` was issued for, or None when it is forged or expired"""
+    try:
+        return int(signing.loads(token, salt=SALT,
+                                 max_age=getattr(settings, 'GUEST_TOKEN_MAX_AGE', 86400)))
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
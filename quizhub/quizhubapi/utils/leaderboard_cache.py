@@ -0,0 +1,38 @@
+# quizhubapi/utils/leaderboard_cache.py
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+
+def _version_key(board_key):
+    return f'leaderboard:{board_key}:version'
+
+def _new_version():
+    # Time-based so a version evicted from the cache never comes back as a
+    # value whose stale payloads might still be stored
+    return int(time.time() * 1000)
+
+def get_board_version(board_key):
+    version = cache.get(_version_key(board_key))
+    if version is None:
+        cache.add(_version_key(board_key), _new_version(), timeout=None)
+        version = cache.get(_version_key(board_key))
+    return version
+
+def invalidate_boards(*board_keys):
+    """Bump board versions so every cached page of those boards is skipped"""
+    for board_key in board_keys:
+        try:
+            cache.incr(_version_key(board_key))
+        except ValueError:
+            cache.set(_version_key(board_key), _new_version(), timeout=None)
+
+def cached_board_response(board_key, page, build):
+    """Serve a pre-rendered leaderboard page, rendering it with ``build`` on a miss"""
+    payload_key = f'leaderboard:{board_key}:v{get_board_version(board_key)}:page{page}'
+    payload = cache.get(payload_key)
+    if payload is None:
+        payload = JSONRenderer().render(build())
+        cache.set(payload_key, payload, getattr(settings, 'LEADERBOARD_CACHE_TIMEOUT', 300))
+    return HttpResponse(payload, content_type='application/json')
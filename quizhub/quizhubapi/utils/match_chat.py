@@ -0,0 +1,88 @@
+# quizhubapi/utils/match_chat.py
+import logging
+import time
+from collections import deque
+from channels.db import database_sync_to_async
+from django.conf import settings
+from ..models import LiveChat
+
+logger = logging.getLogger(__name__)
+
+class ChatRoom:
+    """Recent chat of one match and how fast each sender is posting.
+
+    Late joiners are sent ``history`` instead of reading LiveChat. Senders
+    get a token bucket: CHAT_BURST messages at once, refilled at CHAT_RATE
+    per second.
+    """
+
+    def __init__(self, history=()):
+        self.history = deque(history, maxlen=getattr(settings, 'CHAT_HISTORY_SIZE', 50))
+        self.buckets = {}  # sender -> (tokens, refilled at)
+
+    def allow(self, sender, now=None):
+        now = time.monotonic() if now is None else now
+        rate = getattr(settings, 'CHAT_RATE', 1)
+        burst = getattr(settings, 'CHAT_BURST', 5)
+        tokens, refilled_at = self.buckets.get(sender, (burst, now))
+        tokens = min(burst, tokens + (now - refilled_at) * rate)
+        if tokens < 1:
+            self.buckets[sender] = (tokens, now)
+            return False
+        self.buckets[sender] = (tokens - 1, now)
+        return True
+
+    def add(self, message):
+        self.history.append(message)
+
+def chat_message(row):
+    """The broadcast form of a LiveChat row"""
+    return {
+        'sender': row.sender_name,
+        'user_id': row.user_id,
+        'guest_id': row.guest_id,
+        'message': row.message,
+        'sent_at': row.created_at.isoformat(),
+    }
+
+def load_chat_history(match_id):
+    size = getattr(settings, 'CHAT_HISTORY_SIZE', 50)
+    rows = LiveChat.objects.filter(match_id=match_id, is_deleted=False).select_related(
+        'user', 'guest'
+    ).order_by('-created_at', '-id')[:size]
+    return [chat_message(row) for row in reversed(rows)]
+
+def persist_chat(rows):
+    LiveChat.objects.bulk_create([LiveChat(**row) for row in rows])
+
+class ChatWriter:
+    """Buffer chat rows and write them with one bulk_create per flush.
+
+    A flush runs CHAT_FLUSH_SECONDS after the first buffered row, or as soon
+    as CHAT_FLUSH_SIZE rows are waiting.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.pending = []
+        self._timer = None
+
+    def add(self, row):
+        self.pending.append(row)
+        if len(self.pending) >= getattr(settings, 'CHAT_FLUSH_SIZE', 200):
+            self.loop.create_task(self.flush())
+        elif self._timer is None:
+            self._timer = self.loop.call_later(getattr(settings, 'CHAT_FLUSH_SECONDS', 1),
+                                               lambda: self.loop.create_task(self.flush()))
+
+    async def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        rows, self.pending = self.pending, []
+        if not rows:
+            return
+        try:
+            await database_sync_to_async(persist_chat)(rows)
+        except Exception:
+            logger.exception('Failed to save %d chat messages', len(rows))
@@ -0,0 +1,111 @@
+# quizhubapi/utils/match_runtime.py
+import logging
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from .match_state import MatchStateError, prepare_match_questions, persist_progress, persist_final
+from .timer_wheel import get_timer_wheel
+
+logger = logging.getLogger(__name__)
+
+# The question lifecycle of a live match. Questions close when every player
+# has answered or when their timer runs out, and the next one opens after
+# MATCH_INTERMISSION_SECONDS, so a match plays through without any client
+# driving it.
+
+async def broadcast(state, event_type, data):
+    await get_channel_layer().group_send(f'match_{state.match_id}', {'type': event_type, 'data': data})
+
+def _schedule(state, delay, callback, *args):
+    if state.timer is not None:
+        state.timer.cancel()
+    state.timer = get_timer_wheel().schedule(delay, _run_timer, callback, state, *args)
+
+async def _run_timer(callback, state, *args):
+    # Nobody awaits a timer: if it fails, end the match rather than leave it hanging
+    try:
+        await callback(state, *args)
+    except Exception:
+        logger.exception('Timer %s of match %s failed', callback.__name__, state.match_id)
+        await abort_match(state)
+
+async def start_match(state, announce=True):
+    """Draw the questions of a match claimed with ``begin_start`` and open the first"""
+    if state.quiz_id is None:
+        state.status = 'waiting'
+        raise MatchStateError('Match has no quiz')
+
+    questions, answer_key = await database_sync_to_async(prepare_match_questions)(
+        state.match_id, state.quiz_id
+    )
+    state.start(questions, answer_key)
+    if announce:
+        await broadcast(state, 'match_started', state.snapshot())
+    await open_question(state)
+
+async def open_question(state):
+    question = state.open_next_question()
+    _schedule(state, question['seconds'], close_question, question['index'])
+    await broadcast(state, 'question_opened', question)
+
+async def open_question_after(state, index):
+    """Intermission timer: open question ``index`` unless the host already did"""
+    if state.status == 'in_progress' and not state.question_open and state.current == index - 1:
+        await open_question(state)
+
+async def close_question(state, index):
+    """Close question ``index`` if it is still open; the last answer and its timer both call this"""
+    if not state.question_open or state.current != index:
+        return
+    if state.timer is not None:
+        state.timer.cancel()
+        state.timer = None
+
+    result = state.close_question()
+    await database_sync_to_async(persist_progress)(state.match_id, state.scores(), index + 1)
+    await broadcast(state, 'question_closed', result)
+
+    if state.has_next_question():
+        if not state.question_open and state.current == index:
+            _schedule(state, getattr(settings, 'MATCH_INTERMISSION_SECONDS', 5),
+                      open_question_after, index + 1)
+    else:
+        await finish_match(state)
+
+async def finish_match(state):
+    standings = state.finish()
+    await database_sync_to_async(persist_final)(state.match_id, standings, state.room_code)
+    await broadcast(state, 'match_ended', {'standings': standings})
+
+async def abort_match(state):
+    """End a match whose question lifecycle failed, with the scores it has"""
+    if state.timer is not None:
+        state.timer.cancel()
+        state.timer = None
+    if state.status == 'completed':
+        return
+    state.question_open = False
+    standings = state.finish()
+    try:
+        await database_sync_to_async(persist_final)(state.match_id, standings, state.room_code)
+    except Exception:
+        logger.exception('Failed to save the standings of match %s', state.match_id)
+    await broadcast(state, 'match_ended', {'standings': standings})
+
+async def resume_match(state):
+    """Carry on a match restored from its checkpoint after an intermission"""
+    if state.has_next_question():
+        _schedule(state, getattr(settings, 'MATCH_INTERMISSION_SECONDS', 5),
+                  open_question_after, state.current + 1)
+    else:
+        await finish_match(state)
+
+def suspend_match(state):
+    """Stop the match's timers and return the question to resume from elsewhere"""
+    if state.timer is not None:
+        state.timer.cancel()
+        state.timer = None
+    next_index = state.next_index()
+    state.question_open = False
+    state.status = 'suspended'
+    return next_index
@@ -0,0 +1,43 @@
+# quizhubapi/utils/match_seats.py
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from ..models import Match, MatchPlayer
+
+class SeatError(Exception):
+    """A join the match refuses, with the HTTP status to answer it with"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+def take_seat(match_id, user=None, guest=None):
+    """Add a player to a waiting match without ever overfilling it.
+
+    The seat is claimed with a conditional UPDATE of ``player_count`` and
+    the player row inserted in the same transaction: two statements, no
+    row locks held between them, and a duplicate join gives its seat back.
+    """
+    try:
+        with transaction.atomic():
+            claimed = Match.objects.filter(
+                id=match_id, status='waiting', player_count__lt=F('max_players')
+            ).update(player_count=F('player_count') + 1)
+            if not claimed:
+                raise refusal(match_id)
+            return MatchPlayer.objects.create(match_id=match_id, user=user, guest=guest)
+    except IntegrityError:
+        raise SeatError('Already in this match')
+
+def refusal(match_id):
+    """Work out why a seat could not be claimed; only runs on the failure path"""
+    match = Match.objects.filter(id=match_id).values('status').first()
+    if match is None:
+        return SeatError('Match not found', 404)
+    if match['status'] != 'waiting':
+        return SeatError('Match is not accepting players')
+    return SeatError('Match is full')
+
+@transaction.atomic
+def release_seat(player):
+    player.delete()
+    Match.objects.filter(id=player.match_id).update(player_count=F('player_count') - 1)
@@ -0,0 +1,40 @@
+# quizhubapi/utils/match_sharding.py
+import hashlib
+import os
+import socket
+from bisect import bisect
+from django.conf import settings
+
+class HashRing:
+    """Consistent hash ring mapping match ids to workers.
+
+    Each worker gets ``replicas`` points on the ring, so adding or removing
+    one worker only moves the matches between it and its neighbours.
+    """
+
+    def __init__(self, nodes, replicas=100):
+        self.nodes = tuple(sorted(nodes))
+        points = sorted(
+            (self._hash(f'{node}#{i}'), node) for node in self.nodes for i in range(replicas)
+        )
+        self._points = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    @staticmethod
+    def _hash(value):
+        return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], 'big')
+
+    def owner(self, key):
+        if not self._points:
+            return None
+        return self._owners[bisect(self._points, self._hash(str(key))) % len(self._points)]
+
+def get_worker_id():
+    return getattr(settings, 'MATCH_WORKER_ID', None) or f'{socket.gethostname()}-{os.getpid()}'
+
+def get_configured_workers():
+    """Workers matches are sharded across; empty means this process runs every match"""
+    return list(getattr(settings, 'MATCH_WORKERS', []))
+
+def worker_channel(worker_id):
+    return f'match-worker.{worker_id}'
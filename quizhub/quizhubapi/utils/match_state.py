@@ -0,0 +1,305 @@
+# quizhubapi/utils/match_state.py
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from ..models import Match, MatchPlayer
+from .grading import get_answer_key, is_correct_answer
+from .match_chat import ChatRoom, load_chat_history
+from .notifications import notify_friends
+from .question_bundles import get_question_bundles
+from .question_sampling import sample_question_ids
+from .room_codes import release_room_code
+
+class MatchStateError(Exception):
+    """A client action the match cannot accept in its current state"""
+
+class PlayerState:
+    __slots__ = ('player_id', 'user_id', 'guest_id', 'display_name', 'score', 'answers')
+
+    def __init__(self, player_id, display_name, user_id=None, guest_id=None, score=0):
+        self.player_id = player_id
+        self.user_id = user_id
+        self.guest_id = guest_id
+        self.display_name = display_name
+        self.score = score
+        self.answers = {}  # question index -> (answer id, seconds taken)
+
+    def as_dict(self):
+        return {
+            'player_id': self.player_id,
+            'display_name': self.display_name,
+            'score': self.score,
+        }
+
+class MatchState:
+    """In-memory state of one live match.
+
+    Answers are checked and recorded here without touching the database;
+    scores are written at question boundaries and standings at match end.
+    """
+
+    # A correct answer earns the full points when instant, half at the deadline
+    MAX_POINTS_PER_ANSWER = 100
+
+    def __init__(self, match_id, created_by_id, quiz_id, status='waiting', max_players=2, room_code=None,
+                 is_private=False):
+        self.match_id = match_id
+        self.room_code = room_code
+        self.created_by_id = created_by_id
+        self.is_private = is_private
+        self.quiz_id = quiz_id
+        self.status = status
+        self.max_players = max_players
+        self.players = {}
+        self.questions = []
+        self.answer_key = {}
+        self.current = -1
+        self.question_open = False
+        self.opened_at = None
+        self.deadline = None
+        self.question_seconds = None
+        self.timer = None  # Next scheduled close or open
+        self.sockets = {}  # channel name -> player id, None for watchers
+        self.chat = ChatRoom()
+        self.finished_at = None
+        self.spectators = {}  # worker id -> spectator sockets it holds
+        self.spectator_frame = None  # Last frame sent to spectators
+        self.published_spectators = 0  # Spectator count last written to the cache
+
+    # Players
+
+    def join(self, player_id, display_name, user_id=None, guest_id=None, score=0):
+        """Add a player; returns False if it was already known"""
+        player = self.players.get(player_id)
+        if player is not None:
+            if user_id is not None:
+                player.user_id = user_id
+            if guest_id is not None:
+                player.guest_id = guest_id
+            return False
+        self.players[player_id] = PlayerState(player_id, display_name, user_id, guest_id, score)
+        return True
+
+    def leave(self, player_id):
+        return self.players.pop(player_id, None) is not None
+
+    def find_player(self, user_id=None, guest_id=None):
+        for player in self.players.values():
+            if (user_id is not None and player.user_id == user_id) or \
+               (guest_id is not None and player.guest_id == guest_id):
+                return player
+        return None
+
+    # Lifecycle
+
+    def begin_start(self):
+        """Claim the start of the match; only the first caller gets True"""
+        if self.status != 'waiting':
+            return False
+        self.status = 'starting'
+        return True
+
+    def start(self, questions, answer_key):
+        self.questions = questions
+        self.answer_key = answer_key
+        self.status = 'in_progress'
+
+    def has_next_question(self):
+        return self.current + 1 < len(self.questions)
+
+    def open_next_question(self, now=None):
+        if self.status != 'in_progress':
+            raise MatchStateError('Match is not in progress')
+        if self.question_open:
+            raise MatchStateError('A question is already open')
+        if not self.has_next_question():
+            raise MatchStateError('No questions left')
+
+        self.current += 1
+        question = self.questions[self.current]
+        seconds = question.get('duration') or getattr(settings, 'MATCH_QUESTION_SECONDS', 20)
+        self.opened_at = time.monotonic() if now is None else now
+        self.deadline = self.opened_at + seconds
+        self.question_seconds = seconds
+        self.question_open = True
+        return {
+            'index': self.current,
+            'total': len(self.questions),
+            'seconds': seconds,
+            'question': question,
+        }
+
+    def submit_answer(self, player_id, answer_id, now=None):
+        """Record a player's answer to the open question"""
+        now = time.monotonic() if now is None else now
+        player = self.players.get(player_id)
+        if player is None:
+            raise MatchStateError('Not a player in this match')
+        if not self.question_open:
+            raise MatchStateError('No open question')
+        if now > self.deadline:
+            raise MatchStateError('Time is up')
+        if self.current in player.answers:
+            raise MatchStateError('Already answered')
+
+        player.answers[self.current] = (answer_id, now - self.opened_at)
+        return sum(1 for p in self.players.values() if self.current in p.answers)
+
+    def all_answered(self):
+        return all(self.current in player.answers for player in self.players.values())
+
+    def is_expired(self, now=None):
+        return self.question_open and (time.monotonic() if now is None else now) > self.deadline
+
+    def close_question(self):
+        """Score the open question and return what every client should see"""
+        if not self.question_open:
+            raise MatchStateError('No open question')
+
+        question_id = self.questions[self.current]['id']
+        answer_ids, correct_mask = self.answer_key[question_id]
+        correct = [answer_id for i, answer_id in enumerate(answer_ids) if correct_mask >> i & 1]
+
+        results = []
+        for player in self.players.values():
+            answer_id, seconds_taken = player.answers.get(self.current, (None, None))
+            is_correct = is_correct_answer(self.answer_key, question_id, answer_id)
+            points = self.score_answer(seconds_taken) if is_correct else 0
+            player.score += points
+            results.append({
+                'player_id': player.player_id,
+                'answer_id': answer_id,
+                'is_correct': is_correct,
+                'points': points,
+                'score': player.score,
+            })
+
+        self.question_open = False
+        return {
+            'index': self.current,
+            'question_id': question_id,
+            'correct_answer_ids': correct,
+            'results': results,
+        }
+
+    def score_answer(self, seconds_taken):
+        speed = 1 - min(seconds_taken / self.question_seconds, 1.0)
+        return round(self.MAX_POINTS_PER_ANSWER * (1 + speed) / 2)
+
+    def scores(self):
+        return [(player.player_id, player.score) for player in self.players.values()]
+
+    def finish(self):
+        self.status = 'completed'
+        self.finished_at = time.monotonic()
+        return self.standings()
+
+    def standings(self):
+        ranked = sorted(self.players.values(), key=lambda p: (-p.score, p.player_id))
+        return [dict(player.as_dict(), position=position) for position, player in enumerate(ranked, 1)]
+
+    def next_index(self):
+        """The question to resume from: the open one is replayed"""
+        return self.current if self.question_open else self.current + 1
+
+    def snapshot(self):
+        return {
+            'match_id': self.match_id,
+            'status': self.status,
+            'players': [player.as_dict() for player in self.players.values()],
+            'players_count': len(self.players),
+            'question_index': self.current,
+            'question_open': self.question_open,
+            'total_questions': len(self.questions),
+        }
+
+    def spectator_count(self):
+        return sum(self.spectators.values())
+
+    def spectator_snapshot(self):
+        """The scoreboard and the question in play, as spectators see them"""
+        question, answered = None, 0
+        if self.question_open:
+            question = self.questions[self.current]
+            answered = sum(1 for player in self.players.values() if self.current in player.answers)
+        return dict(self.snapshot(), players=self.standings(), spectators_count=self.spectator_count(),
+                    question=question, answered_count=answered)
+
+# Persistence: the only database work a live match does. These run in a
+# worker thread, so they take and return plain data rather than touching
+# the state the event loop owns.
+
+def checkpoint_key(match_id):
+    return f'match_checkpoint:{match_id}'
+
+def load_match_state(match_id):
+    match = Match.objects.filter(id=match_id).first()
+    if match is None:
+        return None
+
+    state = MatchState(match.id, match.created_by_id, match.quiz_id, status=match.status,
+                       max_players=match.max_players, room_code=match.room_code,
+                       is_private=match.is_private)
+    for player in match.players.select_related('user', 'guest'):
+        state.join(player.id, player.display_name, player.user_id, player.guest_id, player.score)
+    state.chat = ChatRoom(load_chat_history(match.id))
+
+    if match.status == 'in_progress':
+        # Taken over from another worker: the seeded draw gives the same
+        # questions, and scores were written at the checkpointed boundary
+        questions, answer_key = prepare_match_questions(match.id, match.quiz_id)
+        state.start(questions, answer_key)
+        state.current = cache.get(checkpoint_key(match.id), 0) - 1
+    return state
+
+def load_player(match_id, user_id=None, guest_id=None):
+    """Fetch a player who joined through the REST API after the state was loaded"""
+    lookup = {'user_id': user_id} if user_id is not None else {'guest_id': guest_id}
+    player = MatchPlayer.objects.filter(match_id=match_id, **lookup).select_related(
+        'user', 'guest'
+    ).first()
+    if player is None:
+        return None
+    return player.id, player.display_name, player.user_id, player.guest_id, player.score
+
+def prepare_match_questions(match_id, quiz_id):
+    """Draw the match's questions and answer key and mark the match started"""
+    count, title = Match.objects.filter(id=match_id).values_list('quiz__max_questions', 'quiz__title').get()
+    # Seeding with the match id gives every worker the same draw
+    question_ids = sample_question_ids(quiz_id=quiz_id, count=count, seed=match_id)
+    questions = get_question_bundles(question_ids)
+
+    started = Match.objects.filter(id=match_id, status='waiting').update(
+        status='in_progress', started_at=timezone.now()
+    )
+    if started:
+        # Friends of each player hear about it from the notification workers
+        players = MatchPlayer.objects.filter(match_id=match_id, user__isnull=False)
+        for user_id, username in players.values_list('user_id', 'user__username'):
+            notify_friends([user_id], type='friend_playing', title='Friend Playing',
+                           message=f'{username} is playing {title}', data={'match_id': match_id})
+    return questions, get_answer_key(quiz_id)
+
+def persist_progress(match_id, scores, next_index):
+    """Write (player id, score) pairs in one bulk UPDATE and checkpoint the next question"""
+    MatchPlayer.objects.bulk_update(
+        [MatchPlayer(id=player_id, score=score) for player_id, score in scores],
+        ['score']
+    )
+    cache.set(checkpoint_key(match_id), next_index,
+              getattr(settings, 'MATCH_CHECKPOINT_TIMEOUT', 86400))
+
+def persist_final(match_id, standings, room_code=None):
+    MatchPlayer.objects.bulk_update(
+        [MatchPlayer(id=row['player_id'], score=row['score'], position=row['position'])
+         for row in standings],
+        ['score', 'position']
+    )
+    # The room code goes back to the pool along with the match
+    Match.objects.filter(id=match_id).update(status='completed', ended_at=timezone.now(), room_code=None)
+    cache.delete(checkpoint_key(match_id))
+    release_room_code(room_code)
+
+def in_progress_match_ids():
+    return list(Match.objects.filter(status='in_progress').values_list('id', flat=True))
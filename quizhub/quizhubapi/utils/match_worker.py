@@ -0,0 +1,591 @@
+# quizhubapi/utils/match_worker.py
+import asyncio
+import logging
+import time
+import weakref
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from . import match_runtime
+from .broadcast import publish_match_event
+from .match_chat import ChatWriter
+from .match_sharding import HashRing, get_worker_id, get_configured_workers, worker_channel
+from .match_state import (MatchStateError, load_match_state, load_player, persist_progress,
+                          in_progress_match_ids)
+from .matchmaking import MatchmakingQueue, create_quick_matches
+from .spectators import SpectatorHub, encode_frame, spectator_count_key, spectator_group
+from .word_filter import current_word_filter, get_word_filter
+
+logger = logging.getLogger(__name__)
+
+# Seconds a finished match stays in memory for sockets that never disconnected
+FINISHED_MATCH_GRACE = 60
+
+def heartbeat_key(worker_id):
+    return f'match_worker:{worker_id}'
+
+class MatchWorker:
+    """Runs the live matches this process owns.
+
+    With MATCH_WORKERS set, match ids are spread over the live workers with a
+    consistent hash ring. A socket can land on any worker: actions for a
+    match owned elsewhere are sent to the owner's ``match-worker.<id>``
+    channel, and its replies come back to the socket over the channel layer.
+
+    Workers heartbeat through the cache. When the ring changes, a worker
+    checkpoints the matches it no longer owns and hands them to their new
+    owner, which resumes them from the last question boundary. Matches of a
+    worker that died without handing off are adopted from the database once
+    the ring has settled.
+
+    Quick-play pools are placed on the ring the same way, so each pool's
+    queue lives on one worker, which pairs its players every MATCHMAKING_TICK.
+
+    Spectator sockets stay on the worker they connected to. Every
+    SPECTATOR_TICK the owner sends each changed match's snapshot once to
+    the workers holding its spectators, and those workers tell the owner
+    how many spectators they hold (``utils.spectators``).
+    """
+
+    def __init__(self, worker_id, loop):
+        self.worker_id = worker_id
+        self.loop = loop
+        self.channel = worker_channel(worker_id)
+        self.channel_layer = get_channel_layer()
+        self.workers = get_configured_workers()
+        self.ring = None
+        self.settled_ring = None
+        self.matches = {}
+        self.queue = MatchmakingQueue()
+        self.chat_writer = ChatWriter(loop)
+        self.spectators = SpectatorHub()
+        self._loading = {}
+        self._queues = {}
+        self._tasks = []
+        self.ready = None
+
+    async def start(self):
+        await self.refresh()
+        self._tasks = [self.loop.create_task(self._read()), self.loop.create_task(self._heartbeat()),
+                       self.loop.create_task(self._matchmake()), self.loop.create_task(self._spectate())]
+
+    async def stop(self):
+        """Hand every match to the remaining workers and stop serving"""
+        for task in self._tasks:
+            task.cancel()
+        await cache.adelete(heartbeat_key(self.worker_id))
+        self.workers = [worker for worker in self.workers if worker != self.worker_id]
+        ring = HashRing(await self.live_workers())
+        for state in list(self.matches.values()):
+            await self.release(state, ring.owner(state.match_id))
+        await self.rehome_queue(ring)
+        await self.chat_writer.flush()
+
+    # Ownership
+
+    def owner_of(self, match_id):
+        if self.ring is None:
+            return self.worker_id
+        return self.ring.owner(match_id)
+
+    async def refresh(self):
+        """Heartbeat, rebuild the ring from the live workers and move matches accordingly"""
+        if not self.workers:
+            await self.sweep()
+            return
+
+        interval = getattr(settings, 'MATCH_WORKER_HEARTBEAT', 2)
+        await cache.aset(heartbeat_key(self.worker_id), time.time(), interval * 3)
+        live = await self.live_workers()
+
+        if self.ring is None or tuple(live) != self.ring.nodes:
+            self.ring = HashRing(live)
+            for state in list(self.matches.values()):
+                owner = self.owner_of(state.match_id)
+                if owner != self.worker_id and state.status != 'starting':
+                    await self.release(state, owner)
+                else:
+                    # Spectators of workers that left went with them
+                    state.spectators = {worker: count for worker, count in state.spectators.items()
+                                        if worker in live}
+            await self.rehome_queue(self.ring)
+            # Matches may have new owners, which need this worker's spectator counts
+            self.spectators.dirty.update(self.spectators.watchers)
+        elif self.settled_ring != self.ring.nodes:
+            # Unchanged since the last heartbeat, so every worker has had the
+            # chance to hand off: whatever is left unowned belonged to a dead one
+            self.settled_ring = self.ring.nodes
+            for match_id in await database_sync_to_async(in_progress_match_ids)():
+                if match_id not in self.matches and self.owner_of(match_id) == self.worker_id:
+                    await self.get_state(match_id)
+        await self.sweep()
+
+    async def live_workers(self):
+        beats = await cache.aget_many([heartbeat_key(worker) for worker in self.workers])
+        return sorted(worker for worker in self.workers
+                      if worker == self.worker_id or heartbeat_key(worker) in beats)
+
+    async def release(self, state, owner):
+        """Checkpoint a match and pass it, with its sockets, to ``owner``"""
+        if state.status == 'in_progress':
+            next_index = match_runtime.suspend_match(state)
+            await database_sync_to_async(persist_progress)(state.match_id, state.scores(), next_index)
+        # The new owner reads recent chat from the database
+        await self.chat_writer.flush()
+        await self.discard(state)
+        if owner is not None:
+            await self.channel_layer.send(worker_channel(owner), {
+                'type': 'match.adopt',
+                'match_id': state.match_id,
+                'sockets': state.sockets,
+            })
+
+    async def sweep(self):
+        now = time.monotonic()
+        for state in list(self.matches.values()):
+            if state.status == 'completed' and \
+                    (not (state.sockets or state.spectators) or now - state.finished_at > FINISHED_MATCH_GRACE):
+                await self.discard(state)
+
+    # Match registry
+
+    async def get_state(self, match_id):
+        """Return the live state of a match, loading it from the database once"""
+        state = self.matches.get(match_id)
+        if state is not None:
+            return state
+
+        pending = self._loading.get(match_id)
+        if pending is None:
+            pending = self._loading[match_id] = self.loop.create_task(self._load(match_id))
+            pending.add_done_callback(lambda _: self._loading.pop(match_id, None))
+        return await asyncio.shield(pending)
+
+    async def _load(self, match_id):
+        # Join the group first so no membership event slips past the load
+        await self.channel_layer.group_add(f'match_{match_id}', self.channel)
+        state = await database_sync_to_async(load_match_state)(match_id)
+        if state is None:
+            await self.channel_layer.group_discard(f'match_{match_id}', self.channel)
+            return None
+
+        self.matches[match_id] = state
+        if state.status == 'in_progress':
+            await match_runtime.resume_match(state)
+        return state
+
+    async def discard(self, state):
+        if self.matches.pop(state.match_id, None) is not None:
+            await self.channel_layer.group_discard(f'match_{state.match_id}', self.channel)
+            if state.published_spectators:
+                await cache.adelete(spectator_count_key(state.match_id))
+
+    # Routing
+
+    async def route(self, match_id, action, reply_channel, reply, content, hops=0):
+        """Run a socket action on the match's owner; ``reply`` answers a local socket"""
+        owner = self.owner_of(match_id)
+        if owner == self.worker_id or match_id in self.matches or hops > 1:
+            await self.perform(match_id, action, reply_channel, reply, content)
+            return
+        await self.channel_layer.send(worker_channel(owner), {
+            'type': 'match.action',
+            'match_id': match_id,
+            'action': action,
+            'reply_channel': reply_channel,
+            'content': content,
+            'hops': hops + 1,
+        })
+
+    def remote_reply(self, channel):
+        async def reply(frame, close=False, ready=False):
+            await self.channel_layer.send(channel, {'type': 'match.reply', 'frame': frame, 'close': close,
+                                                    'ready': ready})
+        return reply
+
+    async def perform(self, match_id, action, reply_channel, reply, content):
+        if action == 'disconnect':
+            state = self.matches.get(match_id)
+            if state is not None:
+                await self.do_disconnect(state, reply_channel)
+            return
+
+        state = await self.get_state(match_id)
+        if state is None:
+            await reply({'type': 'error', 'data': {'message': 'Match not found'}}, close=True)
+            return
+
+        handler = getattr(self, f'do_{action}', None)
+        try:
+            if handler is None:
+                raise MatchStateError('Unknown action')
+            await handler(state, reply_channel, reply, content)
+        except MatchStateError as e:
+            await reply({'type': 'error', 'data': {'message': str(e)}})
+
+    # Actions
+
+    async def find_player(self, state, content):
+        user_id, guest_id = content.get('user_id'), content.get('guest_id')
+        if user_id is None and guest_id is None:
+            return None  # Sockets without a player only watch
+
+        player = state.find_player(user_id=user_id, guest_id=guest_id)
+        if player is None:
+            row = await database_sync_to_async(load_player)(state.match_id, user_id, guest_id)
+            if row is not None:
+                state.join(*row)
+                player = state.players[row[0]]
+        return player
+
+    def check_host(self, state, content, message):
+        if content.get('user_id') is None or content['user_id'] != state.created_by_id:
+            raise MatchStateError(message)
+
+    def may_view(self, state, player, content):
+        """Private matches show only to their players, their host and staff, as in the REST API"""
+        if not state.is_private or player is not None:
+            return True
+        user_id = content.get('user_id')
+        return user_id is not None and (
+            user_id == state.created_by_id or content.get('role') in ('admin', 'moderator')
+        )
+
+    async def do_connect(self, state, reply_channel, reply, content):
+        player = await self.find_player(state, content)
+        if not self.may_view(state, player, content):
+            await reply({'type': 'error', 'data': {'message': 'This match is private'}}, close=True)
+            return
+        state.sockets[reply_channel] = player.player_id if player is not None else None
+        # ``ready`` on the last frame lets the socket release the events it held back
+        history = list(state.chat.history)
+        await reply({'type': 'match_state', 'data': state.snapshot()}, ready=not history)
+        if history:
+            await reply({'type': 'chat_history', 'data': history}, ready=True)
+
+    async def do_chat(self, state, reply_channel, reply, content):
+        """Broadcast a chat message now and queue it for the next bulk write"""
+        text = (content.get('message') or '').strip()
+        if not text:
+            raise MatchStateError('Message is empty')
+        if len(text) > getattr(settings, 'CHAT_MAX_LENGTH', 500):
+            raise MatchStateError('Message is too long')
+
+        player = await self.find_player(state, content)
+        if player is None:
+            raise MatchStateError('Only players can chat')
+        user_id, guest_id = player.user_id, player.guest_id
+        if not state.chat.allow(('user', user_id) if user_id is not None else ('guest', guest_id)):
+            raise MatchStateError('You are sending messages too fast')
+        word_filter = current_word_filter() or await database_sync_to_async(get_word_filter)()
+        text = word_filter.censor(text)
+
+        message = {
+            'sender': player.display_name,
+            'user_id': user_id,
+            'guest_id': guest_id,
+            'message': text,
+            'sent_at': timezone.now().isoformat(),
+        }
+        state.chat.add(message)
+        self.chat_writer.add({'match_id': state.match_id, 'user_id': user_id, 'guest_id': guest_id,
+                              'message': text})
+        await match_runtime.broadcast(state, 'chat_message', message)
+
+    async def do_disconnect(self, state, reply_channel):
+        state.sockets.pop(reply_channel, None)
+        # Keep running matches in memory so players can reconnect
+        if state.status != 'in_progress' and not state.sockets and not state.spectators:
+            await self.discard(state)
+
+    async def do_start(self, state, reply_channel, reply, content):
+        self.check_host(state, content, 'Only match creator can start the match')
+        if not state.begin_start():
+            raise MatchStateError('Match is not in waiting state')
+        await match_runtime.start_match(state)
+
+    async def do_answer(self, state, reply_channel, reply, content):
+        player = await self.find_player(state, content)
+        if player is None:
+            raise MatchStateError('Not a player in this match')
+
+        answered = state.submit_answer(player.player_id, content.get('answer_id'))
+        # Decided before any await so only the last answer closes the question
+        index = state.current
+        last = state.all_answered()
+
+        await reply({'type': 'answer_accepted', 'data': {'index': index}})
+        # Only the latest count per question needs to reach the clients
+        publish_match_event(state.match_id, 'answer_received', {
+            'index': index,
+            'answered_count': answered,
+        }, key=f'answers:{index}')
+
+        if last:
+            await match_runtime.close_question(state, index)
+
+    async def do_next_question(self, state, reply_channel, reply, content):
+        """Let the host skip the rest of the intermission"""
+        self.check_host(state, content, 'Only match creator can advance the match')
+        if state.question_open:
+            if not state.is_expired():
+                raise MatchStateError('Question is still open')
+            await match_runtime.close_question(state, state.current)
+        if state.status == 'in_progress':
+            await match_runtime.open_question(state)
+
+    async def do_watch(self, state, reply_channel, reply, content):
+        """Count a worker's spectators and show the match to the one that just connected"""
+        self.set_spectators(state, content['worker'], content['count'])
+        await reply({'type': 'spectator_snapshot', 'data': state.spectator_snapshot()})
+
+    # Spectators
+
+    async def watch(self, match_id, channel, send, reply):
+        """Add a local spectator socket; ``send`` writes a frame's text to it"""
+        if self.spectators.add(match_id, channel, send):
+            await self.channel_layer.group_add(spectator_group(match_id), self.channel)
+        frame = self.spectators.frames.get(match_id)
+        if frame is not None:
+            await send(frame)
+            return
+        await self.route(match_id, 'watch', channel, reply,
+                         {'worker': self.worker_id, 'count': self.spectators.count(match_id)})
+
+    async def unwatch(self, match_id, channel):
+        if self.spectators.remove(match_id, channel):
+            await self.channel_layer.group_discard(spectator_group(match_id), self.channel)
+
+    def set_spectators(self, state, worker, count):
+        if count:
+            state.spectators[worker] = count
+        else:
+            state.spectators.pop(worker, None)
+
+    async def publish_spectator_frames(self):
+        """Send each watched match's snapshot, encoded once, if it changed since the last tick"""
+        for state in list(self.matches.values()):
+            count = state.spectator_count()
+            if count != state.published_spectators:
+                state.published_spectators = count
+                await cache.aset(spectator_count_key(state.match_id), count, None)
+            if not count:
+                state.spectator_frame = None
+                continue
+
+            frame = encode_frame(state)
+            if frame == state.spectator_frame:
+                continue
+            state.spectator_frame = frame
+            await self.channel_layer.group_send(spectator_group(state.match_id), {
+                'type': 'spectator.frame',
+                'match_id': state.match_id,
+                'text': frame,
+            })
+
+    async def send_spectator_counts(self):
+        for match_id, count in self.spectators.take_dirty():
+            owner = self.owner_of(match_id)
+            if owner == self.worker_id:
+                await self.on_spectator_count({'match_id': match_id, 'worker': self.worker_id, 'count': count})
+            else:
+                await self.channel_layer.send(worker_channel(owner), {
+                    'type': 'spectator.count',
+                    'match_id': match_id,
+                    'worker': self.worker_id,
+                    'count': count,
+                })
+
+    async def _spectate(self):
+        while True:
+            await asyncio.sleep(getattr(settings, 'SPECTATOR_TICK', 1))
+            try:
+                await self.send_spectator_counts()
+                await self.publish_spectator_frames()
+            except Exception:
+                logger.exception('Match worker %s failed to update spectators', self.worker_id)
+
+    # Matchmaking
+
+    async def matchmaking(self, action, pool, user_id, points=0, enqueued_at=None):
+        """Enqueue or cancel a player on the worker that owns the pool"""
+        owner = self.owner_of(pool)
+        if owner == self.worker_id:
+            self.apply_queue_action(action, pool, user_id, points, enqueued_at)
+            return
+        await self.channel_layer.send(worker_channel(owner), {
+            'type': 'matchmaking.queue',
+            'action': action,
+            'pool': pool,
+            'user_id': user_id,
+            'points': points,
+            'enqueued_at': enqueued_at,
+        })
+
+    def apply_queue_action(self, action, pool, user_id, points=0, enqueued_at=None):
+        if action == 'enqueue':
+            self.queue.enqueue(user_id, pool, points, enqueued_at)
+            return
+        entry = self.queue.entries.get(user_id)
+        if entry is not None and entry.pool == pool:
+            self.queue.cancel(user_id)
+
+    async def rehome_queue(self, ring):
+        """Pass queued players of pools this worker no longer owns to their new owner"""
+        for entry in list(self.queue.entries.values()):
+            owner = ring.owner(entry.pool)
+            if owner != self.worker_id:
+                self.queue.cancel(entry.user_id)
+                if owner is not None:
+                    await self.channel_layer.send(worker_channel(owner), {
+                        'type': 'matchmaking.queue',
+                        'action': 'enqueue',
+                        'pool': entry.pool,
+                        'user_id': entry.user_id,
+                        'points': entry.points,
+                        'enqueued_at': entry.enqueued_at,
+                    })
+
+    async def _matchmake(self):
+        while True:
+            await asyncio.sleep(getattr(settings, 'MATCHMAKING_TICK', 1))
+            groups = self.queue.take_groups()
+            if not groups:
+                continue
+            try:
+                created, failed = await database_sync_to_async(create_quick_matches)(groups)
+            except Exception:
+                logger.exception('Match worker %s failed to create %d matches', self.worker_id, len(groups))
+                created, failed = [], [(pool, group, 'error') for pool, group in groups]
+
+            for pool, group, reason in failed:
+                for entry in group:
+                    if reason == 'error':
+                        # Put the player back at their original place in the queue
+                        self.queue.enqueue(entry.user_id, pool, entry.points, entry.enqueued_at)
+                    else:
+                        await self.channel_layer.group_send(f'matchmaking_{entry.user_id}', {
+                            'type': 'match_unavailable', 'data': {'pool': pool, 'reason': reason}
+                        })
+
+            for match in created:
+                data = {key: match[key] for key in ('match_id', 'room_code', 'quiz_id')}
+                for user_id in match['user_ids']:
+                    await self.channel_layer.group_send(f'matchmaking_{user_id}',
+                                                        {'type': 'match_found', 'data': data})
+
+    # Messages on the worker channel
+
+    async def _read(self):
+        handlers = {
+            'match.action': self.on_action,
+            'match.adopt': self.on_adopt,
+            'match_events': self.on_match_events,
+            'matchmaking.queue': self.on_matchmaking,
+            'spectator.frame': self.on_spectator_frame,
+            'spectator.count': self.on_spectator_count,
+        }
+        while True:
+            message = await self.channel_layer.receive(self.channel)
+            handler = handlers.get(message['type'])
+            if handler is not None:
+                # Group events such as question_opened are for sockets only
+                self._enqueue(self._message_key(message), handler(message))
+
+    def _message_key(self, message):
+        if 'match_id' in message:
+            return message['match_id']
+        if 'pool' in message:
+            return message['pool']
+        return int(message['group'].rpartition('_')[2])
+
+    def _enqueue(self, match_id, coroutine):
+        # Messages of one match run in arrival order, other matches don't wait
+        previous = self._queues.get(match_id)
+        task = self.loop.create_task(self._run_after(previous, coroutine))
+        self._queues[match_id] = task
+
+        def done(_):
+            if self._queues.get(match_id) is task:
+                del self._queues[match_id]
+        task.add_done_callback(done)
+
+    async def _run_after(self, previous, coroutine):
+        if previous is not None:
+            await asyncio.wait([previous])
+        try:
+            await coroutine
+        except Exception:
+            logger.exception('Match worker %s failed to handle a message', self.worker_id)
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(getattr(settings, 'MATCH_WORKER_HEARTBEAT', 2))
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception('Match worker %s failed to refresh', self.worker_id)
+
+    async def on_action(self, message):
+        await self.route(message['match_id'], message['action'], message['reply_channel'],
+                         self.remote_reply(message['reply_channel']), message['content'], message['hops'])
+
+    async def on_matchmaking(self, message):
+        # Applied even if this worker's ring disagrees; the next refresh rehomes it
+        self.apply_queue_action(message['action'], message['pool'], message['user_id'],
+                                message['points'], message['enqueued_at'])
+
+    async def on_spectator_frame(self, message):
+        await self.spectators.write(message['match_id'], message['text'])
+
+    async def on_spectator_count(self, message):
+        state = self.matches.get(message['match_id'])
+        if state is None and message['count']:
+            state = await self.get_state(message['match_id'])
+        if state is not None:
+            self.set_spectators(state, message['worker'], message['count'])
+
+    async def on_adopt(self, message):
+        # The sender has left the ring, so drop it before forwarding anything
+        await self.refresh()
+        state = await self.get_state(message['match_id'])
+        if state is not None:
+            state.sockets.update(message['sockets'])
+
+    async def on_match_events(self, message):
+        """Apply membership changes published by the REST API"""
+        state = self.matches.get(int(message['group'].rpartition('_')[2]))
+        if state is None:
+            return
+
+        players = len(state.players)
+        for event in message['events']:
+            data = event['data']
+            if event['type'] == 'player_joined':
+                state.join(data['player_id'], data['display_name'])
+            elif event['type'] == 'player_left':
+                state.leave(data['player_id'])
+            elif event['type'] == 'match_started' and state.begin_start():
+                try:
+                    await match_runtime.start_match(state, announce=False)
+                except MatchStateError:
+                    logger.warning('Match %s was started without a quiz', state.match_id)
+
+        if len(state.players) != players:
+            publish_match_event(state.match_id, 'players_count', {
+                'players_count': len(state.players),
+            }, key='players_count')
+
+_workers = weakref.WeakKeyDictionary()
+
+async def get_local_worker():
+    """Return the match worker of the running event loop, starting it on first use"""
+    loop = asyncio.get_running_loop()
+    worker = _workers.get(loop)
+    if worker is None:
+        worker = _workers[loop] = MatchWorker(get_worker_id(), loop)
+        worker.ready = loop.create_task(worker.start())
+    await asyncio.shield(worker.ready)
+    return worker
@@ -0,0 +1,171 @@
+# quizhubapi/utils/matchmaking.py
+import random
+import time
+from collections import deque
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from ..models import Match, MatchPlayer, Quiz
+from .room_codes import allocate_room_code, bind_room_codes, release_room_code
+
+class QueueEntry:
+    __slots__ = ('user_id', 'pool', 'band', 'points', 'enqueued_at')
+
+    def __init__(self, user_id, pool, points, enqueued_at):
+        self.user_id = user_id
+        self.pool = pool
+        self.points = points
+        self.band = points // getattr(settings, 'MATCHMAKING_SKILL_BAND', 500)
+        self.enqueued_at = enqueued_at
+
+class MatchmakingQueue:
+    """Quick-play queue bucketed by pool (``quiz:<id>`` or ``category:<id>``) and skill band.
+
+    Players are grouped first-come first-served within their band. A player
+    who has waited MATCHMAKING_WIDEN_SECONDS may also be grouped one band
+    further out, two bands after twice that, and so on. Enqueue and cancel
+    are O(1); ``take_groups`` is linear in the number of waiting players.
+    """
+
+    def __init__(self, size=None):
+        self.size = size or getattr(settings, 'MATCHMAKING_MATCH_SIZE', 2)
+        self.pools = {}  # pool -> {band -> {user id -> entry}}, insertion ordered
+        self.entries = {}  # user id -> entry
+        self.waits = deque(maxlen=10000)  # Seconds waited by recently matched players
+
+    def __len__(self):
+        return len(self.entries)
+
+    def enqueue(self, user_id, pool, points, enqueued_at=None):
+        """Queue a player; queueing again moves them to the new pool, at the back"""
+        self.cancel(user_id)
+        entry = QueueEntry(user_id, pool, points, time.time() if enqueued_at is None else enqueued_at)
+        self.entries[user_id] = entry
+        self.pools.setdefault(pool, {}).setdefault(entry.band, {})[user_id] = entry
+        return entry
+
+    def cancel(self, user_id):
+        entry = self.entries.pop(user_id, None)
+        if entry is None:
+            return None
+        bands = self.pools[entry.pool]
+        band = bands[entry.band]
+        del band[user_id]
+        if not band:
+            del bands[entry.band]
+            if not bands:
+                del self.pools[entry.pool]
+        return entry
+
+    def take_groups(self, now=None):
+        """Remove and return (pool, entries) for every group that can play now"""
+        now = time.time() if now is None else now
+        groups = []
+        for pool, bands in list(self.pools.items()):
+            leftovers = []
+            for band in sorted(bands):
+                waiting = list(bands[band].values())
+                full = len(waiting) - len(waiting) % self.size
+                groups.extend((pool, waiting[i:i + self.size]) for i in range(0, full, self.size))
+                leftovers.extend(waiting[full:])
+            groups.extend((pool, group) for group in self._widen(leftovers, now))
+
+        for _, group in groups:
+            for entry in group:
+                self.cancel(entry.user_id)
+                self.waits.append(now - entry.enqueued_at)
+        return groups
+
+    def _widen(self, leftovers, now):
+        # Leftovers are in band order; group neighbours the longest waiter can reach
+        widen = getattr(settings, 'MATCHMAKING_WIDEN_SECONDS', 10)
+        group = []
+        for entry in leftovers:
+            reach = int(max(now - e.enqueued_at for e in group + [entry]) // widen)
+            group = [e for e in group if entry.band - e.band <= reach] + [entry]
+            if len(group) == self.size:
+                yield group
+                group = []
+
+    def wait_percentiles(self, percentiles=(50, 95, 99)):
+        waits = sorted(self.waits)
+        if not waits:
+            return {}
+        return {p: waits[min(len(waits) - 1, len(waits) * p // 100)] for p in percentiles}
+
+def pool_key(quiz_id=None, category_id=None):
+    return f'quiz:{quiz_id}' if quiz_id is not None else f'category:{category_id}'
+
+def create_quick_matches(groups):
+    """Create a waiting match with its players for every group.
+
+    Returns (created, failed), where failed holds (pool, group, reason).
+    Groups of a category without a public quiz fail with 'no_quiz'. All
+    matches are inserted in one batch; if that hits an IntegrityError
+    (usually a room code the cache lost track of) they are saved one by
+    one with fresh codes, and a group that still cannot be saved fails
+    with 'error' after its code is released, so its players can queue again.
+    """
+    categories = {int(pool.split(':')[1]) for pool, _ in groups if pool.startswith('category:')}
+    quiz_ids = {}
+    for category_id in categories:
+        quiz_ids[category_id] = list(
+            Quiz.objects.filter(category_id=category_id, is_public=True).values_list('id', flat=True)
+        )
+
+    placed = []
+    failed = []
+    for pool, group in groups:
+        kind, value = pool.split(':')
+        if kind == 'quiz':
+            quiz_id = int(value)
+        else:
+            choices = quiz_ids[int(value)]
+            if not choices:
+                failed.append((pool, group, 'no_quiz'))
+                continue
+            quiz_id = random.choice(choices)
+        match = Match(quiz_id=quiz_id, created_by_id=group[0].user_id, max_players=len(group),
+                      player_count=len(group), room_code=allocate_room_code())
+        placed.append((pool, match, group))
+
+    try:
+        with transaction.atomic():
+            Match.objects.bulk_create([match for _, match, _ in placed])
+            MatchPlayer.objects.bulk_create([
+                MatchPlayer(match=match, user_id=entry.user_id)
+                for _, match, group in placed for entry in group
+            ])
+    except IntegrityError:
+        saved = []
+        for pool, match, group in placed:
+            if _save_quick_match(match, group):
+                saved.append((pool, match, group))
+            else:
+                failed.append((pool, group, 'error'))
+        placed = saved
+
+    bind_room_codes([match for _, match, _ in placed])
+    created = [
+        {'match_id': match.id, 'room_code': match.room_code, 'quiz_id': match.quiz_id,
+         'user_ids': [entry.user_id for entry in group]}
+        for _, match, group in placed
+    ]
+    return created, failed
+
+def _save_quick_match(match, group, attempts=3):
+    for attempt in range(attempts):
+        if attempt:
+            match.room_code = allocate_room_code()
+        # The rolled back batch may have assigned a primary key
+        match.pk = None
+        match._state.adding = True
+        try:
+            with transaction.atomic():
+                match.save()
+                MatchPlayer.objects.bulk_create([
+                    MatchPlayer(match=match, user_id=entry.user_id) for entry in group
+                ])
+            return True
+        except IntegrityError:
+            release_room_code(match.room_code)
+    return False
@@ -0,0 +1,129 @@
+# quizhubapi/utils/notifications.py
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import close_old_connections, transaction
+from ..models import Follow, FriendEdge, Notification
+
+logger = logging.getLogger(__name__)
+
+# Notifications are written off the request path. A view enqueues one event
+# naming its audience - some users, or the followers or friends of some
+# users - once its transaction commits, and a worker expands the audience,
+# writes the rows NOTIFICATION_BATCH_SIZE at a time with bulk_create and
+# pushes each one to its recipient's notification sockets. Events go to
+# Celery when NOTIFICATION_QUEUE is 'celery', the default once a broker is
+# configured, and to a thread pool in this process otherwise. The thread pool
+# is refused unless NOTIFICATION_ALLOW_THREAD is set (DEBUG and tests).
+
+AUDIENCES = ('users', 'followers', 'friends')
+
+def notification_group(user_id):
+    return f'notifications_{user_id}'
+
+def notify(user_ids, type, title, message, data=None, audience='users'):
+    """Queue a notification for ``user_ids``, or for their followers or friends"""
+    if audience not in AUDIENCES:
+        raise ValueError(f'Unknown audience {audience!r}')
+    if _queue() == 'thread' and not getattr(settings, 'NOTIFICATION_ALLOW_THREAD', False):
+        raise ImproperlyConfigured('NOTIFICATION_QUEUE "thread" is only for DEBUG and tests; set CELERY_BROKER_URL')
+    event = {'audience': audience, 'user_ids': list(user_ids), 'type': type, 'title': title,
+             'message': message, 'data': data or {}}
+    transaction.on_commit(lambda: enqueue(event))
+
+def notify_followers(user_ids, type, title, message, data=None):
+    notify(user_ids, type, title, message, data, audience='followers')
+
+def notify_friends(user_ids, type, title, message, data=None):
+    notify(user_ids, type, title, message, data, audience='friends')
+
+def _queue():
+    return getattr(settings, 'NOTIFICATION_QUEUE', 'thread')
+
+def enqueue(event):
+    if _queue() == 'celery':
+        from ..tasks import deliver_notifications_task
+        deliver_notifications_task.delay(event)
+    else:
+        _submit(event)
+
+def recipient_batches(audience, user_ids, batch_size):
+    """Yield lists of recipient ids, paging followers and friends by id rather than loading them all"""
+    if audience == 'users':
+        for start in range(0, len(user_ids), batch_size):
+            yield user_ids[start:start + batch_size]
+        return
+
+    if audience == 'followers':
+        rows, column = Follow.objects.filter(following_id__in=user_ids), 'follower_id'
+    else:
+        rows, column = FriendEdge.objects.filter(user_id__in=user_ids), 'friend_id'
+    last = 0
+    while True:
+        batch = list(rows.filter(**{f'{column}__gt': last}).order_by(column)
+                     .values_list(column, flat=True).distinct()[:batch_size])
+        if batch:
+            yield batch
+        if len(batch) < batch_size:
+            return
+        last = batch[-1]
+
+def deliver_notifications(event):
+    """Write the rows of a queued event and push them; returns how many were written"""
+    from ..serializers import NotificationSerializer
+
+    batch_size = getattr(settings, 'NOTIFICATION_BATCH_SIZE', 500)
+    delivered = 0
+    for recipients in recipient_batches(event['audience'], event['user_ids'], batch_size):
+        notifications = Notification.objects.bulk_create([
+            Notification(user_id=user_id, type=event['type'], title=event['title'],
+                         message=event['message'], data=event['data'])
+            for user_id in recipients
+        ])
+        async_to_sync(push_notifications)([
+            (notification.user_id, NotificationSerializer(notification).data)
+            for notification in notifications
+        ])
+        delivered += len(notifications)
+    return delivered
+
+async def push_notifications(rows):
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    for user_id, data in rows:
+        try:
+            await channel_layer.group_send(notification_group(user_id), {'type': 'notification', 'data': data})
+        except Exception:
+            logger.exception('Failed to push a notification to user %s', user_id)
+
+_pool = None
+_pool_lock = threading.Lock()
+_pending = set()
+
+def _run(event):
+    try:
+        deliver_notifications(event)
+    except Exception:
+        logger.exception('Failed to deliver %s notifications', event['type'])
+    finally:
+        close_old_connections()
+
+def _submit(event):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(getattr(settings, 'NOTIFICATION_WORKERS', 2),
+                                       thread_name_prefix='notifications')
+        future = _pool.submit(_run, event)
+        _pending.add(future)
+    future.add_done_callback(_pending.discard)
+
+def wait_for_notifications(timeout=None):
+    """Block until the events queued to this process's thread pool are delivered"""
+    for future in list(_pending):
+        future.result(timeout)
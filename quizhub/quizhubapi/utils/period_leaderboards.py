@@ -0,0 +1,167 @@
+# quizhubapi/utils/period_leaderboards.py
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.utils import timezone
+from ..models import DailyScore, Leaderboard, LeaderboardEntry
+from .leaderboard_cache import invalidate_boards
+
+# Number of daily buckets each rolling board sums
+PERIOD_DAYS = {
+    'daily': 1,
+    'weekly': 7,
+    'monthly': 30,
+}
+
+ROLLED_DAY_KEY = 'period-leaderboards:rolled-day'
+
+def get_period_boards():
+    """Return {period: board id} for the rolling boards, creating missing ones"""
+    return {
+        period: Leaderboard.objects.get_or_create(
+            type=period, defaults={'name': f'{period.title()} Leaderboard'}
+        )[0].id
+        for period in PERIOD_DAYS
+    }
+
+def _add_to_bucket(rows, score):
+    return rows.update(score=F('score') + score, quizzes_completed=F('quizzes_completed') + 1)
+
+def record_daily_score(attempt):
+    """Fold a completed attempt into its user's bucket for the day and the period totals.
+
+    Both happen in one transaction holding the rolling boards' rows, which
+    ``roll_period_boards`` locks too, so a roll never sees a bucket whose
+    score is missing from the totals or the other way round.
+    """
+    if not attempt.user_id or attempt.status != 'completed':
+        return
+
+    day = timezone.localdate(attempt.completed_at or timezone.now())
+    bucket = DailyScore.objects.filter(user_id=attempt.user_id, day=day)
+    board_ids = get_period_boards()
+
+    with transaction.atomic():
+        list(Leaderboard.objects.select_for_update().filter(id__in=board_ids.values()).order_by('id'))
+        if not _add_to_bucket(bucket, attempt.score):
+            try:
+                with transaction.atomic():
+                    DailyScore.objects.create(
+                        user_id=attempt.user_id, day=day,
+                        score=attempt.score, quizzes_completed=1
+                    )
+            except IntegrityError:
+                # Another submission created today's bucket first
+                _add_to_bucket(bucket, attempt.score)
+
+        record_period_score(attempt.user_id, attempt.score, board_ids)
+
+def record_period_score(user_id, score, board_ids=None):
+    """Add a score to the user's entry on every rolling board in one UPDATE"""
+    entries = LeaderboardEntry.objects.filter(
+        leaderboard__type__in=PERIOD_DAYS, generation=0, user_id=user_id
+    )
+    increment = {'score': F('score') + score, 'total_quizzes': F('total_quizzes') + 1}
+
+    if entries.update(**increment) == len(PERIOD_DAYS):
+        return
+
+    # First score of the user in some window
+    present = set(entries.values_list('leaderboard_id', flat=True))
+    for board_id in (board_ids or get_period_boards()).values():
+        if board_id in present:
+            continue
+        try:
+            with transaction.atomic():
+                LeaderboardEntry.objects.create(
+                    leaderboard_id=board_id, user_id=user_id, rank=0, score=score, total_quizzes=1
+                )
+        except IntegrityError:
+            entries.filter(leaderboard_id=board_id).update(**increment)
+
+def roll_period_boards(today=None):
+    """Move each rolling window up to ``today``.
+
+    Buckets that left a window are subtracted from its totals, so the work
+    is proportional to the days that dropped out, not to the window. A
+    board seen for the first time, or not rolled for more than a window
+    (whose buckets may be expired), is rebuilt from the buckets instead.
+    """
+    today = today or timezone.localdate()
+    board_ids = get_period_boards()
+
+    for period, days in PERIOD_DAYS.items():
+        start = today - timedelta(days=days - 1)
+        with transaction.atomic():
+            board = Leaderboard.objects.select_for_update().get(id=board_ids[period])
+            if board.window_start == start:
+                continue
+
+            if board.window_start is None or start - board.window_start > timedelta(days=days):
+                _rebuild_period_board(board, start, today)
+            elif start > board.window_start:
+                _subtract_buckets(board, board.window_start, start)
+            else:
+                continue
+
+            board.window_start = start
+            board.save(update_fields=['window_start', 'last_updated'])
+        invalidate_boards(period)
+
+    cache.set(ROLLED_DAY_KEY, today.isoformat(), timeout=86400)
+
+def _rebuild_period_board(board, start, end):
+    rows = DailyScore.objects.filter(day__gte=start, day__lte=end).values('user_id').annotate(
+        total_score=Sum('score'), total_quizzes=Sum('quizzes_completed')
+    )
+    board.entries.all().delete()
+    LeaderboardEntry.objects.bulk_create([
+        LeaderboardEntry(leaderboard=board, user_id=row['user_id'], rank=0,
+                         score=row['total_score'], total_quizzes=row['total_quizzes'])
+        for row in rows.iterator(chunk_size=5000)
+    ], batch_size=1000)
+
+def _subtract_buckets(board, start, end):
+    """Take the buckets of days ``start`` up to (not including) ``end`` off the board"""
+    leaving = DailyScore.objects.filter(day__gte=start, day__lt=end)
+    per_user = leaving.filter(user_id=OuterRef('user_id')).values('user_id')
+
+    board.entries.filter(user_id__in=leaving.values('user_id')).update(
+        score=F('score') - Subquery(per_user.annotate(total=Sum('score')).values('total')),
+        total_quizzes=F('total_quizzes') - Subquery(
+            per_user.annotate(total=Sum('quizzes_completed')).values('total')
+        ),
+    )
+    board.entries.filter(total_quizzes__lte=0).delete()
+
+def get_period_rankings(period, limit=50, offset=0):
+    """Rank users by their running total in the rolling ``period`` window"""
+    if cache.get(ROLLED_DAY_KEY) != timezone.localdate().isoformat():
+        roll_period_boards()
+
+    entries = LeaderboardEntry.objects.filter(
+        leaderboard__type=period, generation=0
+    ).select_related('user').order_by('-score', 'user_id')[offset:offset + limit]
+
+    return [
+        {
+            'rank': rank,
+            'user': entry.user_id,
+            'user_name': entry.user.username,
+            'score': entry.score,
+            'total_quizzes': entry.total_quizzes,
+        }
+        for rank, entry in enumerate(entries, offset + 1)
+    ]
+
+def expire_daily_scores():
+    """Delete buckets that fell out of the longest rolling window"""
+    # Windows must have subtracted a bucket before it is deleted
+    roll_period_boards()
+
+    retain_days = getattr(settings, 'DAILY_SCORE_RETENTION_DAYS', max(PERIOD_DAYS.values()))
+    cutoff = timezone.localdate() - timedelta(days=retain_days)
+    deleted, _ = DailyScore.objects.filter(day__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,49 @@
+# quizhubapi/utils/question_bundles.py
+from django.conf import settings
+from django.core.cache import cache
+from ..models import Question
+from ..serializers import PlayQuestionSerializer
+
+# Bump when PlayQuestionSerializer's output changes so old payloads are skipped
+BUNDLE_VERSION = 1
+
+def _bundle_key(question_id):
+    return f'question_bundle:v{BUNDLE_VERSION}:{question_id}'
+
+def get_question_bundles(question_ids):
+    """Return play payloads for the questions, in order, from one cache multi-get.
+
+    Misses are serialized in a single prefetching query and written back.
+    Questions that no longer exist or are not approved are left out.
+    """
+    keys = {question_id: _bundle_key(question_id) for question_id in question_ids}
+    cached = cache.get_many(keys.values())
+    bundles = {
+        question_id: cached[key] for question_id, key in keys.items() if key in cached
+    }
+
+    missing = [question_id for question_id in question_ids if question_id not in bundles]
+    if missing:
+        questions = Question.objects.filter(
+            id__in=missing, status='approved'
+        ).select_related('topic__category').prefetch_related('answers')
+        fresh = {
+            question['id']: question
+            for question in PlayQuestionSerializer(questions, many=True).data
+        }
+        cache.set_many(
+            {keys[question_id]: bundle for question_id, bundle in fresh.items()},
+            getattr(settings, 'QUESTION_BUNDLE_CACHE_TIMEOUT', 3600)
+        )
+        bundles.update(fresh)
+
+    return [bundles[question_id] for question_id in question_ids if question_id in bundles]
+
+def invalidate_question_bundles(question_ids):
+    cache.delete_many([_bundle_key(question_id) for question_id in question_ids])
+
+def invalidate_topic_bundles(topic_ids):
+    """Drop bundles carrying a renamed topic or category name"""
+    invalidate_question_bundles(
+        Question.objects.filter(topic_id__in=topic_ids).values_list('id', flat=True)
+    )
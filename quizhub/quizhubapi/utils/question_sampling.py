@@ -0,0 +1,59 @@
+# quizhubapi/utils/question_sampling.py
+import random
+from django.conf import settings
+from django.core.cache import cache
+from ..models import Question, Quiz
+
+def _pool_key(kind, object_id):
+    return f'question_pool:{kind}:{object_id}'
+
+def get_question_pool(quiz_id=None, topic_id=None):
+    """Return the cached ids of approved questions for a quiz or a topic"""
+    if quiz_id is not None:
+        key = _pool_key('quiz', quiz_id)
+        queryset = Question.objects.filter(quiz__id=quiz_id)
+    else:
+        key = _pool_key('topic', topic_id)
+        queryset = Question.objects.filter(topic_id=topic_id)
+
+    pool = cache.get(key)
+    if pool is None:
+        pool = tuple(queryset.filter(status='approved').order_by('id').values_list('id', flat=True))
+        cache.set(key, pool, getattr(settings, 'QUESTION_POOL_CACHE_TIMEOUT', 3600))
+    return pool
+
+def invalidate_question_pools(quiz_ids=(), topic_ids=()):
+    cache.delete_many(
+        [_pool_key('quiz', quiz_id) for quiz_id in quiz_ids] +
+        [_pool_key('topic', topic_id) for topic_id in topic_ids]
+    )
+
+def invalidate_question_pools_for(question):
+    """Drop the pools of the question's topic and of every quiz that uses it"""
+    invalidate_question_pools(
+        quiz_ids=Quiz.questions.through.objects.filter(
+            question_id=question.id
+        ).values_list('quiz_id', flat=True),
+        topic_ids=[question.topic_id]
+    )
+
+def sample_ids(pool, k, seed=None):
+    """Draw ``k`` distinct ids with a partial Fisher-Yates shuffle.
+
+    Swaps are kept in a dict instead of a copy of the pool, so a draw costs
+    O(k) whatever the pool size. The same seed and pool give the same draw.
+    """
+    rng = random.Random(seed)
+    n = len(pool)
+    k = min(k, n)
+    swapped = {}
+    sample = []
+    for i in range(k):
+        j = rng.randrange(i, n)
+        sample.append(swapped.get(j, pool[j]))
+        swapped[j] = swapped.get(i, pool[i])
+    return sample
+
+def sample_question_ids(quiz_id=None, topic_id=None, count=10, seed=None):
+    """Draw ``count`` approved question ids from a quiz's or a topic's pool"""
+    return sample_ids(get_question_pool(quiz_id=quiz_id, topic_id=topic_id), count, seed)
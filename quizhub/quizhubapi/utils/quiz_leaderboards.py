@@ -0,0 +1,116 @@
+# quizhubapi/utils/quiz_leaderboards.py
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from ..models import Quiz, QuizAttempt, Leaderboard, LeaderboardEntry
+
+BOARD_ORDER = ('-score', '-average_percentage', 'id')
+
+def get_board_size():
+    return getattr(settings, 'QUIZ_LEADERBOARD_SIZE', 50)
+
+def get_quiz_leaderboard(quiz_id):
+    """Return the quiz's board, backfilling it from past attempts on first use"""
+    board = Leaderboard.objects.filter(type='quiz', quiz_id=quiz_id).first()
+    if board is not None:
+        return board
+
+    quiz = Quiz.objects.filter(id=quiz_id).first()
+    if quiz is None:
+        return None
+
+    with transaction.atomic():
+        board, created = Leaderboard.objects.get_or_create(
+            type='quiz',
+            quiz=quiz,
+            defaults={'name': f'{quiz.title} Leaderboard'}
+        )
+        if created:
+            rebuild_quiz_leaderboard(board)
+    return board
+
+def rebuild_quiz_leaderboard(board):
+    """Fill a quiz board with each user's best completed attempt"""
+    best_attempts = QuizAttempt.objects.filter(
+        quiz_id=board.quiz_id, status='completed', user__isnull=False
+    ).annotate(
+        user_best=Window(
+            RowNumber(),
+            partition_by=[F('user_id')],
+            order_by=[F('score').desc(), F('percentage').desc(), F('id').asc()],
+        )
+    ).filter(user_best=1).order_by('-score', '-percentage', 'id')[:get_board_size()]
+
+    board.active_entries.delete()
+    LeaderboardEntry.objects.bulk_create([
+        LeaderboardEntry(
+            leaderboard=board,
+            generation=board.active_generation,
+            user_id=attempt.user_id,
+            attempt=attempt,
+            rank=rank,
+            score=attempt.score,
+            average_percentage=attempt.percentage
+        )
+        for rank, attempt in enumerate(best_attempts, 1)
+    ])
+
+def record_quiz_attempt(attempt):
+    """Fold a completed attempt into its quiz's bounded top-N board.
+
+    Only a user's best attempt is kept. A newcomer that beats the last
+    place evicts it once the board is full, so the board never holds more
+    than QUIZ_LEADERBOARD_SIZE rows however many attempts the quiz gets.
+    """
+    if not attempt.user_id or attempt.status != 'completed':
+        return
+
+    board = Leaderboard.objects.filter(type='quiz', quiz_id=attempt.quiz_id).first()
+    if board is None:
+        # Backfilling already picks up this attempt
+        get_quiz_leaderboard(attempt.quiz_id)
+        return
+
+    candidate = (attempt.score, attempt.percentage)
+
+    with transaction.atomic():
+        entries = list(
+            board.active_entries.select_for_update().order_by(*BOARD_ORDER)
+        )
+        existing = next((e for e in entries if e.user_id == attempt.user_id), None)
+
+        if existing is not None:
+            if candidate <= (existing.score, existing.average_percentage):
+                return
+            entry = existing
+        elif len(entries) >= get_board_size():
+            last = entries[-1]
+            if candidate <= (last.score, last.average_percentage):
+                return
+            entries.pop()
+            last.delete()
+            entry = LeaderboardEntry(
+                leaderboard=board, generation=board.active_generation,
+                user_id=attempt.user_id, rank=0
+            )
+            entries.append(entry)
+        else:
+            entry = LeaderboardEntry(
+                leaderboard=board, generation=board.active_generation,
+                user_id=attempt.user_id, rank=0
+            )
+            entries.append(entry)
+
+        entry.attempt = attempt
+        entry.score = attempt.score
+        entry.average_percentage = attempt.percentage
+        entry.save()
+
+        entries.sort(key=lambda e: (-e.score, -e.average_percentage, e.id))
+        moved = []
+        for rank, e in enumerate(entries, 1):
+            if e.rank != rank:
+                e.rank = rank
+                moved.append(e)
+        LeaderboardEntry.objects.bulk_update(moved, ['rank'])
@@ -0,0 +1,297 @@
+# quizhubapi/utils/rank_index.py
+import threading
+import time
+from bisect import bisect_left, insort
+from django.conf import settings
+from django.core.cache import cache
+
+class RankIndex:
+    """Order-statistic index over (sort key, member) pairs.
+
+    Items live in sorted blocks of bounded size, with a Fenwick tree over the
+    block lengths, so insert/remove/rank/select are all O(log n). Smaller keys
+    rank first; ties are broken by member.
+    """
+
+    LOAD = 500
+
+    def __init__(self, items=()):
+        self._keys = dict(items)
+        ordered = sorted((key, member) for member, key in self._keys.items())
+        self._blocks = [ordered[i:i + self.LOAD] for i in range(0, len(ordered), self.LOAD)]
+        self._maxes = [block[-1] for block in self._blocks]
+        self._rebuild_tree()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, member):
+        return member in self._keys
+
+    def _rebuild_tree(self):
+        tree = [0] + [len(block) for block in self._blocks]
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, pos, delta):
+        i = pos + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _tree_prefix(self, pos):
+        """Number of items in blocks before ``pos``."""
+        total = 0
+        i = pos
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def _tree_locate(self, index):
+        """Return (block, offset) holding the item at 0-based ``index``."""
+        pos = 0
+        step = 1 << (len(self._tree).bit_length() - 1)
+        while step:
+            nxt = pos + step
+            if nxt < len(self._tree) and self._tree[nxt] <= index:
+                pos = nxt
+                index -= self._tree[nxt]
+            step >>= 1
+        return pos, index
+
+    def _insert(self, item):
+        if not self._blocks:
+            self._blocks.append([item])
+            self._maxes.append(item)
+            self._rebuild_tree()
+            return
+
+        pos = bisect_left(self._maxes, item)
+        if pos == len(self._maxes):
+            pos -= 1
+            self._blocks[pos].append(item)
+            self._maxes[pos] = item
+        else:
+            insort(self._blocks[pos], item)
+        self._tree_add(pos, 1)
+
+        block = self._blocks[pos]
+        if len(block) > 2 * self.LOAD:
+            self._blocks[pos:pos + 1] = [block[:self.LOAD], block[self.LOAD:]]
+            self._maxes[pos:pos + 1] = [block[self.LOAD - 1], block[-1]]
+            self._rebuild_tree()
+
+    def _remove(self, item):
+        pos = bisect_left(self._maxes, item)
+        block = self._blocks[pos]
+        del block[bisect_left(block, item)]
+        if block:
+            self._maxes[pos] = block[-1]
+            self._tree_add(pos, -1)
+        else:
+            del self._blocks[pos]
+            del self._maxes[pos]
+            self._rebuild_tree()
+
+    def update(self, member, key):
+        """Insert or move ``member`` to ``key`` and return its 1-based rank."""
+        old_key = self._keys.get(member)
+        if old_key is not None:
+            self._remove((old_key, member))
+        self._keys[member] = key
+        self._insert((key, member))
+        return self.rank(member)
+
+    def discard(self, member):
+        key = self._keys.pop(member, None)
+        if key is not None:
+            self._remove((key, member))
+
+    def rank(self, member):
+        """Return the 1-based rank of ``member`` or None if it is not indexed."""
+        key = self._keys.get(member)
+        if key is None:
+            return None
+        item = (key, member)
+        pos = bisect_left(self._maxes, item)
+        return self._tree_prefix(pos) + bisect_left(self._blocks[pos], item) + 1
+
+    def members(self, start=0, stop=None):
+        """Return members ranked ``start + 1`` to ``stop`` (a 0-based slice)."""
+        stop = len(self) if stop is None else min(stop, len(self))
+        if start >= stop:
+            return []
+
+        pos, offset = self._tree_locate(start)
+        result = []
+        remaining = stop - start
+        while remaining > 0:
+            chunk = self._blocks[pos][offset:offset + remaining]
+            result.extend(member for _, member in chunk)
+            remaining -= len(chunk)
+            pos, offset = pos + 1, 0
+        return result
+
+    def top(self, n):
+        return self.members(0, n)
+
+def entry_sort_key(score, average_percentage):
+    """Sort key matching the board ordering of ('-score', '-average_percentage')."""
+    return (-score, -(average_percentage or 0.0))
+
+def _version_key(leaderboard_id):
+    return f'leaderboard-index:{leaderboard_id}:version'
+
+def _change_key(leaderboard_id, version):
+    return f'leaderboard-index:{leaderboard_id}:change:{version}'
+
+def _get_version(leaderboard_id):
+    version = cache.get(_version_key(leaderboard_id))
+    if version is None:
+        # Time-based so a version evicted from the cache always reads as a
+        # jump too large to replay, never as one a worker has already seen
+        cache.add(_version_key(leaderboard_id), int(time.time() * 1000), timeout=None)
+        version = cache.get(_version_key(leaderboard_id))
+    return version
+
+def _bump_version(leaderboard_id):
+    try:
+        return cache.incr(_version_key(leaderboard_id))
+    except ValueError:
+        version = int(time.time() * 1000)
+        cache.set(_version_key(leaderboard_id), version, timeout=None)
+        return version
+
+def _publish_change(leaderboard_id, entry_id, key):
+    """Record a moved entry in the shared change log so other workers replay it"""
+    version = _bump_version(leaderboard_id)
+    cache.set(_change_key(leaderboard_id, version), (entry_id, key),
+              getattr(settings, 'LEADERBOARD_INDEX_TTL', 300))
+    return version
+
+class _BoardIndex:
+    def __init__(self, leaderboard_id, generation, version):
+        from ..models import LeaderboardEntry
+
+        rows = LeaderboardEntry.objects.filter(
+            leaderboard_id=leaderboard_id, generation=generation
+        ).values_list('id', 'score', 'average_percentage')
+
+        self.index = RankIndex(
+            (entry_id, entry_sort_key(score, average))
+            for entry_id, score, average in rows.iterator(chunk_size=5000)
+        )
+        self.leaderboard_id = leaderboard_id
+        self.generation = generation
+        # Version read before loading: changes published while the rows were
+        # read are replayed on top, which is harmless as updates are idempotent
+        self.version = version
+        self.lock = threading.Lock()
+        self.loaded_at = time.monotonic()
+
+    def is_current(self, generation, ttl):
+        return self.generation == generation and time.monotonic() - self.loaded_at <= ttl
+
+    def sync(self, version):
+        """Replay changes other workers published since this index was loaded.
+
+        Returns False when the log cannot bring the index up to ``version``
+        (a gap too large or a change already expired), so it must be reloaded.
+        """
+        with self.lock:
+            if version == self.version:
+                return True
+            limit = getattr(settings, 'LEADERBOARD_INDEX_SYNC_LIMIT', 1000)
+            if version < self.version or version - self.version > limit:
+                return False
+
+            keys = [_change_key(self.leaderboard_id, v) for v in range(self.version + 1, version + 1)]
+            changes = cache.get_many(keys)
+            if len(changes) != len(keys):
+                return False
+
+            for key in keys:
+                entry_id, sort_key = changes[key]
+                self.index.update(entry_id, tuple(sort_key))
+            self.version = version
+            return True
+
+_board_indexes = {}
+_board_locks = {}
+_registry_lock = threading.Lock()
+
+def _get_board_lock(leaderboard_id):
+    with _registry_lock:
+        return _board_locks.setdefault(leaderboard_id, threading.Lock())
+
+def _get_board_index(leaderboard_id, generation):
+    """Return the worker's index for a board, brought up to the shared version.
+
+    A reload only holds that board's lock, so other boards keep serving
+    while one is read back from the database.
+    """
+    ttl = getattr(settings, 'LEADERBOARD_INDEX_TTL', 300)
+    board = _board_indexes.get(leaderboard_id)
+    if board is not None and board.is_current(generation, ttl) and board.sync(_get_version(leaderboard_id)):
+        return board
+
+    lock = _get_board_lock(leaderboard_id)
+    if board is not None and board.generation == generation and not lock.acquire(blocking=False):
+        # Another thread is reloading this board; keep serving the old copy
+        # while it can still be synced instead of queueing behind the load
+        if board.sync(_get_version(leaderboard_id)):
+            return board
+        lock.acquire()
+    elif board is None or board.generation != generation:
+        lock.acquire()
+
+    try:
+        version = _get_version(leaderboard_id)
+        board = _board_indexes.get(leaderboard_id)
+        if board is None or not board.is_current(generation, ttl) or not board.sync(version):
+            board = _BoardIndex(leaderboard_id, generation, version)
+            _board_indexes[leaderboard_id] = board
+    finally:
+        lock.release()
+    return board
+
+def update_entry_rank(entry):
+    """Reposition a single LeaderboardEntry and return its new rank.
+
+    Only the moved entry is touched; ranks of the entries it passed are
+    materialized later by the bulk pass in ``utils.rankings``. The move is
+    published to the shared change log so every worker's index agrees.
+    """
+    board = _get_board_index(entry.leaderboard_id, entry.generation)
+    key = entry_sort_key(entry.score, entry.average_percentage)
+    _publish_change(entry.leaderboard_id, entry.id, key)
+    with board.lock:
+        return board.index.update(entry.id, key)
+
+def get_entry_rank(entry):
+    board = _get_board_index(entry.leaderboard_id, entry.generation)
+    with board.lock:
+        return board.index.rank(entry.id)
+
+def get_top_entry_ids(leaderboard, limit=50, offset=0):
+    board = _get_board_index(leaderboard.id, leaderboard.active_generation)
+    with board.lock:
+        return board.index.members(offset, offset + limit)
+
+def invalidate_leaderboard_index(leaderboard_id=None):
+    """Drop cached indexes so the next access reloads them from the database.
+
+    Dropping a single board also bumps its shared version without a change
+    record, so the other workers reload it too.
+    """
+    with _registry_lock:
+        if leaderboard_id is None:
+            _board_indexes.clear()
+        else:
+            _board_indexes.pop(leaderboard_id, None)
+    if leaderboard_id is not None:
+        _bump_version(leaderboard_id)
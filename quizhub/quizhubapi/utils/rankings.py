@@ -1,12 +1,88 @@
 # quizhubapi/utils/rankings.py
-from django.db.models import Count, Q
-from ..models import User, LeaderboardEntry, Leaderboard
+from django.db import connection, transaction
+from django.db.models import Avg, Count, F, Q, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+from ..models import User, QuizAttempt, LeaderboardEntry, Leaderboard
+from .rank_index import invalidate_leaderboard_index
+from .leaderboard_cache import invalidate_boards
+from .period_leaderboards import expire_daily_scores
 
-def update_user_rankings():
+RANKING_ORDER = [F('points').desc(), F('streak_days').desc(), F('id').asc()]
+
+RANK_UPDATE_BATCH_SIZE = 1000
+
+def update_user_rankings(bulk=True):
     """Update country and global rankings for all users"""
     
+    if bulk:
+        bulk_update_user_rankings()
+    else:
+        update_user_rankings_row_by_row()
+    
+    # Update leaderboard entries
+    update_leaderboard_rankings()
+
+def bulk_update_user_rankings():
+    """Compute global and per-country ranks for all active users in one pass"""
+    if connection.vendor == 'postgresql':
+        _update_user_rankings_sql(distinct='IS DISTINCT FROM')
+    elif connection.vendor == 'sqlite' and connection.Database.sqlite_version_info >= (3, 33):
+        # UPDATE ... FROM is available from SQLite 3.33
+        _update_user_rankings_sql(distinct='IS NOT')
+    else:
+        _update_user_rankings_batched()
+
+def _update_user_rankings_sql(distinct):
+    """Rank every active user with a single UPDATE ... FROM over window functions"""
+    table = connection.ops.quote_name(User._meta.db_table)
+    order = 'points DESC, streak_days DESC, id'
+    
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            UPDATE {table} AS u
+            SET global_rank = r.global_rank, country_rank = r.country_rank
+            FROM (
+                SELECT id,
+                       ROW_NUMBER() OVER (ORDER BY {order}) AS global_rank,
+                       CASE WHEN country IS NULL THEN NULL
+                            ELSE ROW_NUMBER() OVER (PARTITION BY country ORDER BY {order})
+                       END AS country_rank
+                FROM {table}
+                WHERE status = %s
+            ) AS r
+            WHERE u.id = r.id
+              AND (u.global_rank {distinct} r.global_rank
+                   OR u.country_rank {distinct} r.country_rank)
+        """, ['active'])
+
+def _update_user_rankings_batched():
+    """Rank users with one windowed SELECT and write changed rows in chunks"""
+    ranked = User.objects.filter(status='active').annotate(
+        new_global_rank=Window(RowNumber(), order_by=RANKING_ORDER),
+        new_country_rank=Window(RowNumber(), partition_by=[F('country')], order_by=RANKING_ORDER),
+    ).values_list('id', 'country', 'global_rank', 'country_rank',
+                  'new_global_rank', 'new_country_rank')
+    
+    changed = []
+    with transaction.atomic():
+        for user_id, country, global_rank, country_rank, new_global, new_country in ranked.iterator(chunk_size=5000):
+            if country is None:
+                new_country = None
+            if (global_rank, country_rank) != (new_global, new_country):
+                changed.append(User(id=user_id, global_rank=new_global, country_rank=new_country))
+            
+            if len(changed) >= RANK_UPDATE_BATCH_SIZE:
+                User.objects.bulk_update(changed, ['global_rank', 'country_rank'])
+                changed = []
+        
+        User.objects.bulk_update(changed, ['global_rank', 'country_rank'])
+
+def update_user_rankings_row_by_row():
+    """Rank users with one UPDATE per user (kept for comparison benchmarks)"""
+    
     # Update global rankings
-    users = User.objects.filter(status='active').order_by('-points', '-streak_days')
+    users = User.objects.filter(status='active').order_by('-points', '-streak_days', 'id')
     for rank, user in enumerate(users, 1):
         user.global_rank = rank
         user.save(update_fields=['global_rank'])
@@ -21,14 +97,11 @@ def update_user_rankings():
         country_users = User.objects.filter(
             status='active',
             country=country
-        ).order_by('-points', '-streak_days')
+        ).order_by('-points', '-streak_days', 'id')
         
         for rank, user in enumerate(country_users, 1):
             user.country_rank = rank
             user.save(update_fields=['country_rank'])
-    
-    # Update leaderboard entries
-    update_leaderboard_rankings()
 
 def update_leaderboard_rankings():
     """Update all leaderboard entries with current rankings"""
@@ -39,21 +112,12 @@ def update_leaderboard_rankings():
         defaults={'name': 'Global Leaderboard'}
     )
     
-    # Clear and rebuild
-    global_board.entries.all().delete()
-    
-    top_users = User.objects.filter(
+    top_users = with_quiz_totals(User.objects.filter(
         status='active'
-    ).order_by('-points', '-streak_days')[:100]
-    
-    for rank, user in enumerate(top_users, 1):
-        LeaderboardEntry.objects.create(
-            leaderboard=global_board,
-            user=user,
-            rank=rank,
-            score=user.points,
-            best_streak=user.streak_days
-        )
+    )).order_by('-points', '-streak_days')[:100]
+    
+    swap_leaderboard_entries(global_board, top_users)
+    invalidate_boards('global')
     
     # Country leaderboards
     countries = User.objects.filter(
@@ -68,21 +132,95 @@ def update_leaderboard_rankings():
             defaults={'name': f'{country_name} Leaderboard'}
         )
         
-        country_board.entries.all().delete()
-        
-        country_users = User.objects.filter(
+        country_users = with_quiz_totals(User.objects.filter(
             status='active',
             country=country_code
-        ).order_by('-points', '-streak_days')[:50]
+        )).order_by('-points', '-streak_days')[:50]
         
-        for rank, user in enumerate(country_users, 1):
-            LeaderboardEntry.objects.create(
-                leaderboard=country_board,
+        swap_leaderboard_entries(country_board, country_users)
+    
+    # Category boards are maintained incrementally on submission, so only
+    # their stored ranks need catching up
+    for category_board in Leaderboard.objects.filter(type='category'):
+        materialize_leaderboard_ranks(category_board)
+    
+    collect_leaderboard_generations()
+    expire_daily_scores()
+
+def with_quiz_totals(users):
+    """Annotate users with the completed-attempt totals their entries start from"""
+    completed = Q(quiz_attempts__status='completed')
+    return users.annotate(
+        total_quizzes=Count('quiz_attempts', filter=completed),
+        average_percentage=Avg('quiz_attempts__percentage', filter=completed),
+    )
+
+def get_quiz_totals(user, category_id=None):
+    """Completed-attempt totals for a single user, optionally within one category"""
+    attempts = QuizAttempt.objects.filter(user=user, status='completed')
+    if category_id is not None:
+        attempts = attempts.filter(quiz__category_id=category_id)
+    totals = attempts.aggregate(total_quizzes=Count('id'), average_percentage=Avg('percentage'))
+    totals['average_percentage'] = totals['average_percentage'] or 0.0
+    return totals
+
+def swap_leaderboard_entries(leaderboard, users):
+    """Publish freshly ranked entries for a board as its new active generation.
+    
+    The entries are bulk-inserted under the next generation and made visible
+    by a single UPDATE of active_generation, so readers see either the old
+    board or the complete new one, never a partial rebuild.
+    """
+    with transaction.atomic():
+        board = Leaderboard.objects.select_for_update().get(pk=leaderboard.pk)
+        generation = board.active_generation + 1
+        
+        LeaderboardEntry.objects.bulk_create([
+            LeaderboardEntry(
+                leaderboard=board,
+                generation=generation,
                 user=user,
                 rank=rank,
                 score=user.points,
+                total_quizzes=getattr(user, 'total_quizzes', 0),
+                average_percentage=getattr(user, 'average_percentage', None) or 0.0,
                 best_streak=user.streak_days
             )
+            for rank, user in enumerate(users, 1)
+        ])
+        
+        Leaderboard.objects.filter(pk=board.pk).update(
+            active_generation=generation, last_updated=timezone.now()
+        )
+    
+    leaderboard.active_generation = generation
+    invalidate_leaderboard_index(leaderboard.id)
+    return generation
+
+def collect_leaderboard_generations(keep=1):
+    """Delete entries of replaced generations, keeping the last ``keep`` for in-flight readers"""
+    deleted, _ = LeaderboardEntry.objects.filter(
+        generation__lt=F('leaderboard__active_generation') - keep
+    ).delete()
+    return deleted
+
+def materialize_leaderboard_ranks(leaderboard):
+    """Write stored ranks for a board in one ordered pass, touching only changed rows"""
+    entries = leaderboard.active_entries.order_by(
+        '-score', '-average_percentage', 'id'
+    ).only('id', 'rank')
+    
+    changed = []
+    for rank, entry in enumerate(entries.iterator(chunk_size=5000), 1):
+        if entry.rank != rank:
+            entry.rank = rank
+            changed.append(entry)
+    
+    LeaderboardEntry.objects.bulk_update(changed, ['rank'], batch_size=1000)
+    invalidate_leaderboard_index(leaderboard.id)
+    if leaderboard.type == 'category':
+        invalidate_boards(f'category:{leaderboard.category_id}')
+    return len(changed)
 
 def get_user_ranking_display(user):
     """Get formatted ranking display for a user"""
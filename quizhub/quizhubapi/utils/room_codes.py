@@ -0,0 +1,69 @@
+# quizhubapi/utils/room_codes.py
+import random
+from django.conf import settings
+from django.core.cache import cache
+from ..models import Match
+
+# Room codes are typed in by players: no 0/O or 1/I/L lookalikes
+ALPHABET = 'ABCDEFGHJKMNPQRSTUVWXYZ23456789'
+ACTIVE_STATUSES = ('waiting', 'in_progress')
+PENDING = 0  # Reserved by a match that is not saved yet
+
+_random = random.SystemRandom()
+
+def room_code_key(code):
+    return f'room_code:{code}'
+
+def _timeout():
+    return getattr(settings, 'ROOM_CODE_CACHE_TIMEOUT', 86400)
+
+def allocate_room_code():
+    """Reserve a code no active match holds.
+
+    Codes live in the cache map from the moment they are drawn until the
+    match ends, and ``cache.add`` only succeeds for one caller, so two
+    matches can never be handed the same code. Released codes go back to
+    the pool.
+    """
+    length = getattr(settings, 'ROOM_CODE_LENGTH', 6)
+    while True:
+        code = ''.join(_random.choice(ALPHABET) for _ in range(length))
+        if cache.add(room_code_key(code), PENDING, _timeout()):
+            return code
+
+def bind_room_code(code, match_id):
+    cache.set(room_code_key(code), match_id, _timeout())
+
+def bind_room_codes(matches):
+    cache.set_many({room_code_key(match.room_code): match.id for match in matches}, _timeout())
+
+def release_room_code(code):
+    if code:
+        cache.delete(room_code_key(code))
+
+def normalize_room_code(code):
+    code = (code or '').strip().upper()
+    if not code or len(code) > 8 or not code.isalnum():
+        return None
+    return code
+
+def lookup_room_code(code):
+    """Return the id of the active match holding ``code``, or None.
+
+    Served from the cache map; the database is only asked when the map has
+    not seen the code, e.g. after the cache was flushed.
+    """
+    code = normalize_room_code(code)
+    if code is None:
+        return None
+
+    match_id = cache.get(room_code_key(code))
+    if match_id:
+        return match_id
+
+    match_id = Match.objects.filter(room_code=code, status__in=ACTIVE_STATUSES).values_list(
+        'id', flat=True
+    ).first()
+    if match_id is not None:
+        bind_room_code(code, match_id)
+    return match_id
@@ -0,0 +1,77 @@
+# quizhubapi/utils/spectators.py
+import json
+from django.core.cache import cache
+
+# The spectator tier of a live match. Players get every event as it
+# happens; spectators get a snapshot of the match at most once per
+# SPECTATOR_TICK, encoded once by the worker running the match and sent
+# once to each worker holding spectator sockets, which writes the same text
+# to all of them. Channel-layer traffic per tick follows the number of
+# workers, not the number of viewers.
+
+def spectator_group(match_id):
+    """Group of the worker channels, not the sockets, that hold spectators of a match"""
+    return f'match_{match_id}_spectators'
+
+def spectator_count_key(match_id):
+    return f'match_spectators:{match_id}'
+
+def get_spectator_count(match_id):
+    """Spectators of a match as last published by the worker running it"""
+    return cache.get(spectator_count_key(match_id), 0)
+
+def get_spectator_counts(match_ids):
+    counts = cache.get_many([spectator_count_key(match_id) for match_id in match_ids])
+    return {match_id: counts.get(spectator_count_key(match_id), 0) for match_id in match_ids}
+
+def encode_frame(state):
+    return json.dumps({'type': 'spectator_snapshot', 'data': state.spectator_snapshot()})
+
+class SpectatorHub:
+    """The spectator sockets connected to this process, by match.
+
+    Keeps the last frame of every watched match so a new spectator sees the
+    match at once, without asking the worker running it.
+    """
+
+    def __init__(self):
+        self.watchers = {}  # match id -> {channel name -> send(text)}
+        self.frames = {}  # match id -> last frame text
+        self.dirty = set()  # Matches whose count the running worker has not been told
+
+    def count(self, match_id):
+        return len(self.watchers.get(match_id, ()))
+
+    def add(self, match_id, channel, send):
+        """Register a socket; True for the first spectator of the match here"""
+        sockets = self.watchers.setdefault(match_id, {})
+        sockets[channel] = send
+        self.dirty.add(match_id)
+        return len(sockets) == 1
+
+    def remove(self, match_id, channel):
+        """Forget a socket; True when it was the last spectator of the match here"""
+        sockets = self.watchers.get(match_id)
+        if sockets is None or sockets.pop(channel, None) is None:
+            return False
+        self.dirty.add(match_id)
+        if sockets:
+            return False
+        del self.watchers[match_id]
+        self.frames.pop(match_id, None)
+        return True
+
+    def take_dirty(self):
+        dirty, self.dirty = self.dirty, set()
+        return [(match_id, self.count(match_id)) for match_id in dirty]
+
+    async def write(self, match_id, text):
+        sockets = self.watchers.get(match_id)
+        if not sockets:
+            return
+        self.frames[match_id] = text
+        for send in list(sockets.values()):
+            try:
+                await send(text)
+            except Exception:
+                pass  # A socket closing mid-write; its disconnect removes it
@@ -0,0 +1,118 @@
+# quizhubapi/utils/timer_wheel.py
+import asyncio
+import logging
+import math
+import weakref
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+class Timer:
+    __slots__ = ('tick', 'when', 'callback', 'args', 'cancelled')
+
+    def __init__(self, tick, when, callback, args):
+        self.tick = tick
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+class TimerWheel:
+    """Hashed timer wheel driven by a single task on the event loop.
+
+    Timers are bucketed by the tick they fall due in, so scheduling and
+    cancelling are O(1) and each tick only looks at one slot, however many
+    matches are running. Ticks are counted from a fixed start time, so
+    lateness does not accumulate. Coroutine callbacks are started as tasks
+    whose failures are logged; callers that must recover wrap them.
+
+    A timer never fires early: it fires on the first tick the loop gets to
+    at or after its deadline, so on an idle loop it is at most one tick
+    late. That is the only bound the wheel gives. Callbacks share the loop
+    with everything else, and a timer also waits for every callback fired
+    ahead of it: benchmark_timers with a 50 ms tick measures p99 skew of
+    about 50 ms at 1,000 matches per loop but 240-290 ms (max about 340 ms)
+    at 10,000. Size MATCH_WORKERS so each loop stays near the first figure.
+    """
+
+    def __init__(self, loop, tick=None, slots=512):
+        self.loop = loop
+        self.tick = tick or getattr(settings, 'MATCH_TIMER_TICK', 0.05)
+        self.slots = [[] for _ in range(slots)]
+        self.started_at = loop.time()
+        self.current_tick = 0
+        self.pending = 0
+        self._task = None
+        self._callbacks = set()  # The loop only holds weak references to tasks
+
+    def schedule(self, delay, callback, *args):
+        now = self.loop.time()
+        idle = self._task is None or self._task.done()
+        if idle:
+            # Skip the ticks that passed while nothing was scheduled
+            self.current_tick = int((now - self.started_at) / self.tick)
+
+        when = now + delay
+        tick = max(math.ceil((when - self.started_at) / self.tick), self.current_tick + 1)
+        timer = Timer(tick, when, callback, args)
+        self.slots[tick % len(self.slots)].append(timer)
+        self.pending += 1
+
+        if idle:
+            self._task = self.loop.create_task(self._run())
+        return timer
+
+    async def _run(self):
+        while self.pending:
+            next_at = self.started_at + (self.current_tick + 1) * self.tick
+            await asyncio.sleep(max(0.0, next_at - self.loop.time()))
+
+            # Catch up on every tick that passed, not just the next one
+            now_tick = int((self.loop.time() - self.started_at) / self.tick)
+            while self.current_tick < now_tick:
+                self.current_tick += 1
+                self._fire_slot(self.current_tick)
+
+    def _fire_slot(self, tick):
+        index = tick % len(self.slots)
+        slot = self.slots[index]
+        if not slot:
+            return
+
+        due = [timer for timer in slot if timer.tick <= tick]
+        if len(due) < len(slot):
+            # Timers a full rotation or more away stay in the slot
+            self.slots[index] = [timer for timer in slot if timer.tick > tick]
+        else:
+            self.slots[index] = []
+        self.pending -= len(due)
+
+        for timer in due:
+            if timer.cancelled:
+                continue
+            try:
+                result = timer.callback(*timer.args)
+                if asyncio.iscoroutine(result):
+                    task = self.loop.create_task(result)
+                    self._callbacks.add(task)
+                    task.add_done_callback(self._callback_done)
+            except Exception:
+                logger.exception('Timer callback %r failed', timer.callback)
+
+    def _callback_done(self, task):
+        self._callbacks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error('Timer callback %r failed', task.get_coro(), exc_info=task.exception())
+
+_wheels = weakref.WeakKeyDictionary()
+
+def get_timer_wheel():
+    """Return the timer wheel of the running event loop"""
+    loop = asyncio.get_running_loop()
+    wheel = _wheels.get(loop)
+    if wheel is None:
+        wheel = _wheels[loop] = TimerWheel(loop)
+    return wheel
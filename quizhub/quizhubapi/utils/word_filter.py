@@ -0,0 +1,143 @@
+# quizhubapi/utils/word_filter.py
+import re
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from ..models import BannedWord
+
+WORD = re.compile(r'\w+')
+VERSION_KEY = 'banned_words_version'
+
+def _is_word_char(char):
+    return char.isalnum() or char == '_'
+
+class WordFilter:
+    """All banned words compiled for one linear pass over a text.
+
+    Substring words go into an Aho-Corasick automaton, so a scan costs the
+    same with ten words or ten thousand. Exact single words are looked up
+    token by token in a set; exact phrases ride the automaton and only count
+    on word boundaries. Matching is case-insensitive.
+    """
+
+    def __init__(self, words=()):
+        self.exact = set()
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [()]  # (length, exact) of every word ending at the node
+        for word, is_exact in words:
+            word = word.strip().lower()
+            if not word:
+                continue
+            if is_exact and WORD.fullmatch(word):
+                self.exact.add(word)
+            else:
+                self._add(word, is_exact)
+        self._link()
+
+    def _add(self, word, is_exact):
+        node = 0
+        for char in word:
+            nxt = self.goto[node].get(char)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][char] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append(())
+            node = nxt
+        self.out[node] += ((len(word), is_exact),)
+
+    def _link(self):
+        # Breadth-first, so every fail target is final before it is used
+        queue = list(self.goto[0].values())
+        for node in queue:
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[child] = target if target != child else 0
+                self.out[child] += self.out[self.fail[child]]
+
+    @staticmethod
+    def _fold(text):
+        lowered = text.lower()
+        if len(lowered) == len(text):
+            return lowered
+        # A few characters lower to two; keep offsets aligned with the original
+        return ''.join(c.lower() if len(c.lower()) == 1 else c for c in text)
+
+    def spans(self, text):
+        """Yield (start, end) of every banned word in ``text``"""
+        text = self._fold(text)
+        if self.exact:
+            for token in WORD.finditer(text):
+                if token.group() in self.exact:
+                    yield token.start(), token.end()
+
+        if len(self.goto) == 1:
+            return
+        goto, fail, out = self.goto, self.fail, self.out
+        node = 0
+        for end, char in enumerate(text, 1):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for length, is_exact in out[node]:
+                start = end - length
+                if is_exact and ((start and _is_word_char(text[start - 1])) or
+                                 (end < len(text) and _is_word_char(text[end]))):
+                    continue
+                yield start, end
+
+    def contains(self, text):
+        return next(self.spans(text), None) is not None
+
+    def censor(self, text, mask='*'):
+        masked = None
+        for start, end in self.spans(text):
+            if masked is None:
+                masked = list(text)
+            masked[start:end] = mask * (end - start)
+        return text if masked is None else ''.join(masked)
+
+_compiled = None
+_version = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+def current_word_filter():
+    """The compiled filter if it was checked recently, without any I/O; else None"""
+    if _compiled is not None and \
+            time.monotonic() - _checked_at < getattr(settings, 'BANNED_WORDS_CHECK_SECONDS', 5):
+        return _compiled
+    return None
+
+def get_word_filter():
+    """Return this process's compiled filter, rebuilding it after the table changed.
+
+    Other processes learn about changes through a version number in the
+    cache, read at most every BANNED_WORDS_CHECK_SECONDS.
+    """
+    global _compiled, _version, _checked_at
+    word_filter = current_word_filter()
+    if word_filter is not None:
+        return word_filter
+
+    with _lock:
+        version = cache.get(VERSION_KEY, 0)
+        if _compiled is None or version != _version:
+            _compiled = WordFilter(BannedWord.objects.values_list('word', 'is_exact_match'))
+            _version = version
+        _checked_at = time.monotonic()
+        return _compiled
+
+def invalidate_word_filter():
+    global _compiled
+    with _lock:
+        _compiled = None
+    if not cache.add(VERSION_KEY, 1, None):
+        cache.incr(VERSION_KEY)
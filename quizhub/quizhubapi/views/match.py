@@ -5,11 +5,13 @@ from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from django.db import models
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from django.db import models, transaction
 from ..models import Match, MatchPlayer, Guest, MatchInvite
 from ..serializers import MatchSerializer, GuestSerializer
+from ..utils.broadcast import publish_match_event
+from ..utils.guest_tokens import make_guest_token
+from ..utils.match_seats import SeatError, take_seat, release_seat
+from ..utils.room_codes import lookup_room_code
 
 class MatchViewSet(viewsets.ModelViewSet):
     queryset = Match.objects.all()
@@ -17,7 +19,9 @@ class MatchViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().select_related('created_by', 'quiz').prefetch_related(
+            models.Prefetch('players', MatchPlayer.objects.select_related('user', 'guest'))
+        )
         status_filter = self.request.query_params.get('status')
         if status_filter:
             queryset = queryset.filter(status=status_filter)
@@ -48,14 +52,7 @@ class MatchViewSet(viewsets.ModelViewSet):
         match.start_match()
         
         # Notify via WebSocket
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            f'match_{match.id}',
-            {
-                'type': 'match_started',
-                'data': MatchSerializer(match).data
-            }
-        )
+        publish_match_event(match.id, 'match_started', MatchSerializer(match).data)
         
         return Response({'message': 'Match started'})
     
@@ -73,40 +70,11 @@ class JoinMatchView(APIView):
     permission_classes = [IsAuthenticated]
     
     def post(self, request, match_id):
-        match = get_object_or_404(Match, id=match_id)
-        
-        if match.status != 'waiting':
-            return Response({'error': 'Match is not accepting players'}, 
-                          status=status.HTTP_400_BAD_REQUEST)
-        
-        if match.players.count() >= match.max_players:
-            return Response({'error': 'Match is full'}, 
-                          status=status.HTTP_400_BAD_REQUEST)
-        
-        # Check if user is already in match
-        if match.players.filter(user=request.user).exists():
-            return Response({'error': 'Already in this match'}, 
-                          status=status.HTTP_400_BAD_REQUEST)
-        
-        # Add player to match
-        player = MatchPlayer.objects.create(
-            match=match,
-            user=request.user
-        )
-        
-        # Notify via WebSocket
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            f'match_{match.id}',
-            {
-                'type': 'player_joined',
-                'data': {
-                    'player_id': player.id,
-                    'display_name': player.display_name,
-                    'players_count': match.players.count()
-                }
-            }
-        )
+        # Claims a seat atomically; the post_save signal notifies the match
+        try:
+            take_seat(match_id, user=request.user)
+        except SeatError as e:
+            return Response({'error': str(e)}, status=e.status_code)
         
         return Response({'message': 'Joined match successfully'})
 
@@ -117,22 +85,9 @@ class LeaveMatchView(APIView):
         match = get_object_or_404(Match, id=match_id)
         
         try:
-            player = match.players.get(user=request.user)
-            player.delete()
-            
-            # Notify via WebSocket
-            channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.group_send)(
-                f'match_{match.id}',
-                {
-                    'type': 'player_left',
-                    'data': {
-                        'user_id': request.user.id,
-                        'display_name': request.user.username,
-                        'players_count': match.players.count()
-                    }
-                }
-            )
+            # The post_delete signal notifies the match
+            player = match.players.select_related('user').get(user=request.user)
+            release_seat(player)
             
             return Response({'message': 'Left match successfully'})
         except MatchPlayer.DoesNotExist:
@@ -150,55 +105,44 @@ class JoinMatchByCodeView(APIView):
             return Response({'error': 'Room code is required'}, 
                           status=status.HTTP_400_BAD_REQUEST)
         
-        try:
-            match = Match.objects.get(room_code=room_code.upper())
-        except Match.DoesNotExist:
+        match_id = lookup_room_code(room_code)
+        match = Match.objects.filter(id=match_id).first() if match_id is not None else None
+        if match is None:
             return Response({'error': 'Invalid room code'}, 
                           status=status.HTTP_404_NOT_FOUND)
         
-        if match.status != 'waiting':
-            return Response({'error': 'Match is not accepting players'}, 
-                          status=status.HTTP_400_BAD_REQUEST)
-        
-        if match.players.count() >= match.max_players:
-            return Response({'error': 'Match is full'}, 
-                          status=status.HTTP_400_BAD_REQUEST)
-        
         # Handle guest or authenticated user
-        if request.user.is_authenticated:
-            # Check if user is already in match
-            if match.players.filter(user=request.user).exists():
-                return Response({'error': 'Already in this match'}, 
-                              status=status.HTTP_400_BAD_REQUEST)
-            
-            player = MatchPlayer.objects.create(
-                match=match,
-                user=request.user
-            )
-        else:
-            if not match.allow_guests:
-                return Response({'error': 'Guests not allowed in this match'}, 
-                              status=status.HTTP_403_FORBIDDEN)
-            
-            if not guest_name:
-                return Response({'error': 'Guest name is required'}, 
-                              status=status.HTTP_400_BAD_REQUEST)
-            
-            # Create guest
-            guest = Guest.objects.create(
-                session_id=request.session.session_key or 'anonymous',
-                display_name=guest_name
-            )
-            
-            player = MatchPlayer.objects.create(
-                match=match,
-                guest=guest
-            )
-        
-        return Response({
+        try:
+            if request.user.is_authenticated:
+                take_seat(match.id, user=request.user)
+            else:
+                if not match.allow_guests:
+                    return Response({'error': 'Guests not allowed in this match'}, 
+                                  status=status.HTTP_403_FORBIDDEN)
+                
+                if not guest_name:
+                    return Response({'error': 'Guest name is required'}, 
+                                  status=status.HTTP_400_BAD_REQUEST)
+                
+                # A refused join must not leave its guest behind
+                with transaction.atomic():
+                    guest = Guest.objects.create(
+                        session_id=request.session.session_key or 'anonymous',
+                        display_name=guest_name
+                    )
+                    take_seat(match.id, guest=guest)
+        except SeatError as e:
+            return Response({'error': str(e)}, status=e.status_code)
+        
+        match.refresh_from_db(fields=['player_count'])
+        data = {
             'message': 'Joined match successfully',
             'match': MatchSerializer(match).data
-        })
+        }
+        if not request.user.is_authenticated:
+            # The match socket takes this instead of the guest id
+            data['guest_token'] = make_guest_token(guest.id)
+        return Response(data)
 
 class SupportPlayerView(APIView):
     permission_classes = [AllowAny]
@@ -251,4 +195,5 @@ class CreateGuestView(APIView):
         )
         
         serializer = GuestSerializer(guest)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
\ No newline at end of file
+        return Response(dict(serializer.data, token=make_guest_token(guest.id)),
+                        status=status.HTTP_201_CREATED)
\ No newline at end of file
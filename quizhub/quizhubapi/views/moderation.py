@@ -7,6 +7,7 @@ from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from ..models import Report, ModeratorAction, BannedWord, Notification
 from ..serializers import ReportSerializer, NotificationSerializer
+from ..utils.notifications import notify
 
 class ReportViewSet(viewsets.ModelViewSet):
     queryset = Report.objects.all()
@@ -55,8 +56,8 @@ class ReportViewSet(viewsets.ModelViewSet):
         )
         
         # Notify reporter
-        Notification.objects.create(
-            user=report.reporter,
+        notify(
+            [report.reporter_id],
             type='moderation_action',
             title='Report Updated',
             message=f'Your report has been {action}d by a moderator'
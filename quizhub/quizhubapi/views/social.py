@@ -3,25 +3,45 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
-from django.db.models import Q
-from ..models import User, Follow, Friendship, FriendRequest, Notification
-from ..serializers import (UserProfileSerializer, FriendRequestSerializer, 
-                          FriendshipSerializer)
+from ..models import User, Follow, Friendship, FriendEdge, FriendRequest
+from ..serializers import PublicUserSerializer, FriendRequestSerializer, FriendSerializer
+from ..utils.friend_suggestions import get_friend_suggestions
+from ..utils.friends import are_friends, friend_edges, mutual_friends
+from ..utils.notifications import notify
 
 class FriendListView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        friendships = Friendship.objects.filter(
-            (Q(user1=request.user) | Q(user2=request.user)) & 
-            Q(status='accepted')
-        )
-        
-        serializer = FriendshipSerializer(
-            friendships, many=True, context={'request': request}
-        )
+        serializer = FriendSerializer(friend_edges(request.user.id), many=True)
+        return Response(serializer.data)
+
+class MutualFriendsView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, user_id):
+        other = get_object_or_404(User, id=user_id)
+        serializer = PublicUserSerializer(mutual_friends(request.user.id, other.id), many=True)
         return Response(serializer.data)
 
+class FriendSuggestionsView(APIView):
+    """People you may know, ranked by the update_friend_suggestions batch job"""
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        suggestions = get_friend_suggestions(request.user.id)
+        ids = [user_id for user_id, _, _ in suggestions]
+        # Leave out anyone befriended since the last run
+        befriended = set(FriendEdge.objects.filter(user=request.user, friend_id__in=ids)
+                         .values_list('friend_id', flat=True))
+        users = User.objects.filter(status='active').in_bulk(ids)
+        return Response([
+            {'user': PublicUserSerializer(users[user_id]).data, 'mutual_friends': mutual,
+             'shared_categories': shared}
+            for user_id, mutual, shared in suggestions
+            if user_id in users and user_id not in befriended
+        ])
+
 class FriendRequestListView(APIView):
     permission_classes = [IsAuthenticated]
     
@@ -66,11 +86,7 @@ class SendFriendRequestView(APIView):
                           status=status.HTTP_400_BAD_REQUEST)
         
         # Check if already friends
-        if Friendship.objects.filter(
-            (Q(user1=request.user, user2=receiver) | 
-             Q(user1=receiver, user2=request.user)) &
-            Q(status='accepted')
-        ).exists():
+        if are_friends(request.user.id, receiver.id):
             return Response({'error': 'Already friends'}, 
                           status=status.HTTP_400_BAD_REQUEST)
         
@@ -82,8 +98,8 @@ class SendFriendRequestView(APIView):
         )
         
         # Create notification
-        Notification.objects.create(
-            user=receiver,
+        notify(
+            [receiver.id],
             type='friend_request',
             title='New Friend Request',
             message=f'{request.user.username} sent you a friend request',
@@ -109,7 +125,8 @@ class RespondFriendRequestView(APIView):
         friend_request.status = 'accepted' if action == 'accept' else 'rejected'
         friend_request.save()
         
-        if action == 'accept':
+        # Requests sent both ways must not make a second friendship
+        if action == 'accept' and not are_friends(friend_request.sender_id, friend_request.receiver_id):
             # Create friendship
             Friendship.objects.create(
                 user1=friend_request.sender,
@@ -118,8 +135,8 @@ class RespondFriendRequestView(APIView):
             )
             
             # Create notification for sender
-            Notification.objects.create(
-                user=friend_request.sender,
+            notify(
+                [friend_request.sender_id],
                 type='friend_request',
                 title='Friend Request Accepted',
                 message=f'{request.user.username} accepted your friend request'
@@ -144,8 +161,8 @@ class FollowUserView(APIView):
         
         if created:
             # Create notification
-            Notification.objects.create(
-                user=user_to_follow,
+            notify(
+                [user_to_follow.id],
                 type='friend_playing',
                 title='New Follower',
                 message=f'{request.user.username} started following you'
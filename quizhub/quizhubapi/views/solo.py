@@ -2,11 +2,18 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import AllowAny
 from django.utils import timezone
-from django.db.models import Count, Avg, Max, Q
-from ..models import QuizAttempt, QuizAnswer, Leaderboard, LeaderboardEntry, User, Guest
+from django.db.models import Avg, Max, F
+from ..models import QuizAttempt, Leaderboard, LeaderboardEntry
 from ..serializers import QuizAttemptSerializer, QuizAttemptCreateSerializer, LeaderboardSerializer
+from ..utils.rank_index import update_entry_rank, get_entry_rank, get_top_entry_ids
+from ..utils.leaderboard_cache import cached_board_response, invalidate_boards
+from ..utils.quiz_leaderboards import get_quiz_leaderboard, record_quiz_attempt
+from ..utils.rankings import get_quiz_totals
+from ..utils.period_leaderboards import PERIOD_DAYS, record_daily_score, get_period_rankings
+
+LEADERBOARD_PAGE_SIZE = 50
 
 class QuizAttemptViewSet(viewsets.ModelViewSet):
     """Handle solo quiz attempts and scoring"""
@@ -28,16 +35,17 @@ class QuizAttemptViewSet(viewsets.ModelViewSet):
         """Create a new quiz attempt (submit quiz results)"""
         serializer = self.get_serializer(data=request.data, context={'request': request})
         if serializer.is_valid():
+            # Points and streak are applied by the serializer
             attempt = serializer.save()
             
-            # Update user points and streak
-            if attempt.user:
-                attempt.user.points += attempt.score
-                attempt.user.update_streak()
-                attempt.user.save()
-            
             # Update leaderboards
             self.update_leaderboards(attempt)
+            record_quiz_attempt(attempt)
+            record_daily_score(attempt)
+            invalidate_boards(
+                'global', f'category:{attempt.quiz.category_id}', f'quiz:{attempt.quiz_id}',
+                *PERIOD_DAYS
+            )
             
             return Response(QuizAttemptSerializer(attempt).data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -53,75 +61,72 @@ class QuizAttemptViewSet(viewsets.ModelViewSet):
             type='global',
             defaults={'name': 'Global Leaderboard'}
         )
-        
-        entry, created = LeaderboardEntry.objects.get_or_create(
-            leaderboard=global_board,
-            user=user,
-            defaults={
-                'score': user.points,
-                'rank': 1,
-                'total_quizzes': 1,
-                'average_percentage': attempt.percentage,
-                'best_streak': user.streak_days
-            }
-        )
-        
-        if not created:
-            # Update existing entry
-            entry.score = user.points
-            entry.total_quizzes = QuizAttempt.objects.filter(
-                user=user, status='completed'
-            ).count()
-            entry.average_percentage = QuizAttempt.objects.filter(
-                user=user, status='completed'
-            ).aggregate(avg=Avg('percentage'))['avg'] or 0
-            entry.best_streak = user.streak_days
-            entry.save()
-        
-        # Recalculate ranks
-        self.recalculate_ranks(global_board)
+        self.record_entry(global_board, user, attempt)
         
         # Update category leaderboard
-        if attempt.quiz and attempt.quiz.category:
+        if attempt.quiz.category_id:
             category_board, created = Leaderboard.objects.get_or_create(
                 type='category',
-                category=attempt.quiz.category,
+                category_id=attempt.quiz.category_id,
                 defaults={'name': f'{attempt.quiz.category.name} Leaderboard'}
             )
-            
-            # Similar logic for category leaderboard
-            cat_entry, created = LeaderboardEntry.objects.get_or_create(
-                leaderboard=category_board,
-                user=user,
+            self.record_entry(category_board, user, attempt)
+    
+    def record_entry(self, board, user, attempt):
+        """Fold one attempt into the user's entry on ``board``.
+        
+        Totals and the running average are advanced with F() expressions
+        instead of re-aggregating every past attempt of the user. Only a
+        missing entry (a new player, or one left out of the last rebuilt
+        generation) is seeded from the user's completed-attempt totals.
+        """
+        lookup = {'leaderboard': board, 'generation': board.active_generation, 'user': user}
+        entry = LeaderboardEntry.objects.filter(**lookup).first()
+        created = False
+        
+        if entry is None:
+            # The attempt is already saved, so the totals include it
+            totals = get_quiz_totals(user, board.category_id if board.type == 'category' else None)
+            entry, created = LeaderboardEntry.objects.get_or_create(
+                **lookup,
                 defaults={
                     'score': user.points,
                     'rank': 1,
-                    'total_quizzes': 1,
-                    'average_percentage': attempt.percentage,
+                    'total_quizzes': totals['total_quizzes'],
+                    'average_percentage': totals['average_percentage'],
                     'best_streak': user.streak_days
                 }
             )
-            
-            if not created:
-                cat_entry.score = user.points
-                cat_entry.total_quizzes = QuizAttempt.objects.filter(
-                    user=user, status='completed', quiz__category=attempt.quiz.category
-                ).count()
-                cat_entry.average_percentage = QuizAttempt.objects.filter(
-                    user=user, status='completed', quiz__category=attempt.quiz.category
-                ).aggregate(avg=Avg('percentage'))['avg'] or 0
-                cat_entry.best_streak = user.streak_days
-                cat_entry.save()
-            
-            self.recalculate_ranks(category_board)
+        
+        if not created:
+            LeaderboardEntry.objects.filter(pk=entry.pk).update(
+                score=user.points,
+                total_quizzes=F('total_quizzes') + 1,
+                average_percentage=(
+                    F('average_percentage') * F('total_quizzes') + attempt.percentage
+                ) / (F('total_quizzes') + 1),
+                best_streak=user.streak_days,
+                updated_at=timezone.now()
+            )
+            # Mirror the update in memory for the rank index
+            entry.average_percentage = (
+                entry.average_percentage * entry.total_quizzes + attempt.percentage
+            ) / (entry.total_quizzes + 1)
+            entry.total_quizzes += 1
+            entry.score = user.points
+            entry.best_streak = user.streak_days
+        
+        # Reposition only this entry
+        self.update_rank(entry)
     
-    def recalculate_ranks(self, leaderboard):
-        """Recalculate ranks for a leaderboard"""
-        entries = LeaderboardEntry.objects.filter(
-            leaderboard=leaderboard
-        ).order_by('-score', '-average_percentage')
+    def update_rank(self, entry):
+        """Move a single entry in its board's rank index and store its new rank.
         
-        for rank, entry in enumerate(entries, 1):
+        Entries it overtook keep their stored rank until the bulk pass in
+        utils.rankings materializes the whole board.
+        """
+        rank = update_entry_rank(entry)
+        if rank != entry.rank:
             entry.rank = rank
             entry.save(update_fields=['rank'])
     
@@ -164,84 +169,144 @@ class LeaderboardViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = LeaderboardSerializer
     permission_classes = [AllowAny]
     
+    def get_page(self, request):
+        try:
+            return max(int(request.query_params.get('page', 1)), 1)
+        except (TypeError, ValueError):
+            return 1
+    
+    def serialize_board(self, leaderboard, page=1):
+        """Serialize one page of a board in rank-index order"""
+        offset = (page - 1) * LEADERBOARD_PAGE_SIZE
+        entry_ids = get_top_entry_ids(leaderboard, limit=LEADERBOARD_PAGE_SIZE, offset=offset)
+        entries = LeaderboardEntry.objects.select_related('user').in_bulk(entry_ids)
+        
+        data = []
+        for entry_id in entry_ids:
+            entry = entries.get(entry_id)
+            if entry is None:
+                continue
+            data.append({
+                'rank': offset + len(data) + 1,
+                'user': entry.user.id if entry.user else None,
+                'user_name': entry.user.username if entry.user else None,
+                'score': entry.score,
+                'total_quizzes': entry.total_quizzes,
+                'average_percentage': entry.average_percentage,
+                'best_streak': entry.best_streak
+            })
+        return data
+    
+    def board_rankings(self, page, **lookup):
+        try:
+            board = Leaderboard.objects.get(**lookup)
+        except Leaderboard.DoesNotExist:
+            return {'entries': []}
+        return {'entries': self.serialize_board(board, page)}
+    
     @action(detail=False, methods=['get'])
     def global_rankings(self, request):
         """Get global leaderboard rankings"""
-        try:
-            global_board = Leaderboard.objects.get(type='global')
-            entries = LeaderboardEntry.objects.filter(
-                leaderboard=global_board
-            ).select_related('user').order_by('rank')[:50]
-            
-            data = []
-            for entry in entries:
-                data.append({
-                    'rank': entry.rank,
-                    'user': entry.user.id if entry.user else None,
-                    'user_name': entry.user.username if entry.user else None,
-                    'score': entry.score,
-                    'total_quizzes': entry.total_quizzes,
-                    'average_percentage': entry.average_percentage,
-                    'best_streak': entry.best_streak
-                })
-            
-            return Response({'entries': data})
-        except Leaderboard.DoesNotExist:
-            return Response({'entries': []})
+        page = self.get_page(request)
+        return cached_board_response(
+            'global', page, lambda: self.board_rankings(page, type='global')
+        )
     
     @action(detail=False, methods=['get'])
     def category_rankings(self, request):
         """Get category-specific leaderboard rankings"""
-        category_id = request.query_params.get('category')
-        if not category_id:
+        try:
+            category_id = int(request.query_params.get('category'))
+        except (TypeError, ValueError):
             return Response({'error': 'Category ID required'}, status=400)
         
-        try:
-            category_board = Leaderboard.objects.get(
-                type='category', category_id=category_id
-            )
-            entries = LeaderboardEntry.objects.filter(
-                leaderboard=category_board
-            ).select_related('user').order_by('rank')[:50]
-            
-            data = []
-            for entry in entries:
-                data.append({
-                    'rank': entry.rank,
-                    'user': entry.user.id if entry.user else None,
-                    'user_name': entry.user.username if entry.user else None,
-                    'score': entry.score,
-                    'total_quizzes': entry.total_quizzes,
-                    'average_percentage': entry.average_percentage,
-                    'best_streak': entry.best_streak
-                })
-            
-            return Response({'entries': data})
-        except Leaderboard.DoesNotExist:
-            return Response({'entries': []})
+        page = self.get_page(request)
+        return cached_board_response(
+            f'category:{category_id}', page,
+            lambda: self.board_rankings(page, type='category', category_id=category_id)
+        )
+    
+    def period_rankings(self, request, period):
+        page = self.get_page(request)
+        offset = (page - 1) * LEADERBOARD_PAGE_SIZE
+        return cached_board_response(
+            period, page,
+            lambda: {'entries': get_period_rankings(period, LEADERBOARD_PAGE_SIZE, offset)}
+        )
+    
+    @action(detail=False, methods=['get'])
+    def daily_rankings(self, request):
+        """Get today's leaderboard rankings"""
+        return self.period_rankings(request, 'daily')
+    
+    @action(detail=False, methods=['get'])
+    def weekly_rankings(self, request):
+        """Get leaderboard rankings for the last 7 days"""
+        return self.period_rankings(request, 'weekly')
+    
+    @action(detail=False, methods=['get'])
+    def monthly_rankings(self, request):
+        """Get leaderboard rankings for the last 30 days"""
+        return self.period_rankings(request, 'monthly')
+    
+    @action(detail=False, methods=['get'])
+    def my_rank(self, request):
+        """Get the current user's rank on the global or a category board"""
+        if not request.user.is_authenticated:
+            return Response({'error': 'Authentication required'}, status=401)
+        
+        category_id = request.query_params.get('category')
+        entries = LeaderboardEntry.objects.filter(
+            user=request.user, generation=F('leaderboard__active_generation')
+        )
+        if category_id:
+            entries = entries.filter(leaderboard__type='category', leaderboard__category_id=category_id)
+        else:
+            entries = entries.filter(leaderboard__type='global')
+        
+        entry = entries.first()
+        if entry is None:
+            return Response({'rank': None})
+        
+        return Response({
+            'rank': get_entry_rank(entry),
+            'score': entry.score,
+            'average_percentage': entry.average_percentage
+        })
     
     @action(detail=False, methods=['get'])
     def quiz_rankings(self, request):
         """Get quiz-specific leaderboard rankings"""
-        quiz_id = request.query_params.get('quiz')
-        if not quiz_id:
+        try:
+            quiz_id = int(request.query_params.get('quiz'))
+        except (TypeError, ValueError):
             return Response({'error': 'Quiz ID required'}, status=400)
         
-        # Get top attempts for this specific quiz
-        attempts = QuizAttempt.objects.filter(
-            quiz_id=quiz_id, status='completed'
-        ).select_related('user').order_by('-score', '-percentage')[:50]
+        page = self.get_page(request)
+        return cached_board_response(
+            f'quiz:{quiz_id}', page, lambda: self.quiz_board_rankings(quiz_id, page)
+        )
+    
+    def quiz_board_rankings(self, quiz_id, page):
+        board = get_quiz_leaderboard(quiz_id)
+        if board is None:
+            return {'entries': []}
+        
+        offset = (page - 1) * LEADERBOARD_PAGE_SIZE
+        entries = board.active_entries.select_related(
+            'user', 'attempt'
+        ).order_by('rank')[offset:offset + LEADERBOARD_PAGE_SIZE]
         
         data = []
-        for rank, attempt in enumerate(attempts, 1):
+        for entry in entries:
             data.append({
-                'rank': rank,
-                'user': attempt.user.id if attempt.user else None,
-                'user_name': attempt.user.username if attempt.user else None,
-                'score': attempt.score,
-                'percentage': attempt.percentage,
-                'time_taken': attempt.time_taken,
-                'completed_at': attempt.completed_at
+                'rank': entry.rank,
+                'user': entry.user.id if entry.user else None,
+                'user_name': entry.user.username if entry.user else None,
+                'score': entry.score,
+                'percentage': entry.average_percentage,
+                'time_taken': entry.attempt.time_taken if entry.attempt else None,
+                'completed_at': entry.attempt.completed_at if entry.attempt else None
             })
         
-        return Response({'entries': data})
\ No newline at end of file
+        return {'entries': data}